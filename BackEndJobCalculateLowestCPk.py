@@ -1,43 +1,82 @@
 import pandas as pd
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from backend import load_data,get_CTQ_SpecNo,get_inspection_data
-from helper import calculate_ppk,insert_data_into_csv
+from backend import load_data,get_inspection_data_bulk
+from helper import calculate_ppk,split_inspection_data_by_spec
+from config_loader import load_config
+from ppk_state import PpkStateStore
+from results_store import get_results_store
 
+config = load_config()
+BACKEND_JOB_CONFIG = config.get('backend_job', {})
+# keep at or below db_pool.max_size, extra workers would only queue for a connection
+MAX_WORKERS = BACKEND_JOB_CONFIG.get('max_workers', 4)
+PPK_STATE_PATH = BACKEND_JOB_CONFIG.get('state_path', './data/PpkState.db')
+PPK_WINDOW = BACKEND_JOB_CONFIG.get('ppk_window', 30)
+# full (non-incremental) refetch per material, picks up spec changes and late-entered measurements
+FULL_REFRESH_HOURS = BACKEND_JOB_CONFIG.get('full_refresh_hours', 24)
+
+
+def FetchInspectionDataByMaterial(materialcodes, state, max_workers=MAX_WORKERS):
+    '''
+    Fetch inspection data (all specs, one query per material) over a bounded worker pool,
+    so the run takes as long as the slowest query instead of the sum of all queries.
+    Only measurements newer than each characteristic's watermark in `state` are fetched, unless a full refresh is due.
+    Returns {materialcode: (full, df_inspection_bulk)}
+    '''
+    def fetch(materialcode):
+        full = state.needs_full_refresh(materialcode, FULL_REFRESH_HOURS)
+        since = None if full else state.get_watermarks(materialcode)
+        return full, get_inspection_data_bulk(materialcode, since=since, window=PPK_WINDOW)
+
+    inspectionData = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch, materialcode): materialcode for materialcode in materialcodes}
+        for future in as_completed(futures):
+            materialcode = futures[future]
+            try:
+                inspectionData[materialcode] = future.result()
+            except Exception as e:
+                print(f"Error fetching inspection data for {materialcode}: {e}")
+    return inspectionData
+
+
+def CalculateLowestPpk(df_inspection_bulk):
+    ppkList = []
+    for _, df_inspection_data in split_inspection_data_by_spec(df_inspection_bulk):
+        # Calculate ppk
+        ppk = calculate_ppk(df_inspection_data['MeasVal'],df_inspection_data['USL'].iloc[0],df_inspection_data['LSL'].iloc[0])
+        if not np.isnan(float(ppk)):
+            ppkList.append(ppk)
+
+    if ppkList:
+        return min(ppkList, key=float)
+    return None
 
 
 def GetLowestCPK():
     df_tool_data = load_data()
-    filtered_df = df_tool_data.copy()
-    LowestCpkdataFrame =  pd.DataFrame(columns=["MachineID", "ToolNoID","Value"])
-    for index, row in filtered_df.iterrows():
-        materialcode = row['MaterialCode']
-        
-        specnoList = get_CTQ_SpecNo(materialcode)
-        ppkList = []
-        for specno in specnoList['BalloonNo'].unique():
-            df_inspection_data = get_inspection_data(materialcode, specno)
-
-            if not df_inspection_data.empty:
-                # Calculate ppk
-                df_inspection_data['LSL'] = pd.to_numeric(df_inspection_data['LSL'], errors='coerce')
-
-                df_inspection_data['USL'] = pd.to_numeric(df_inspection_data['USL'], errors='coerce')
-
-                ppk = calculate_ppk(df_inspection_data['MeasVal'],df_inspection_data['USL'].iloc[0],df_inspection_data['LSL'].iloc[0])
-                ppkList.append(ppk)
-                
-        if ppkList:
-            min_ppk = min(ppkList)
-        else:
-            min_ppk = None
-            
-        LowestCpkdataFrame.loc[len(LowestCpkdataFrame)] = {
-            "MachineID": row['MachineID'],
-            "ToolNoID": '',
-            "Value": min_ppk
-        }
-    # Save the results to a CSV file
-    insert_data_into_csv(LowestCpkdataFrame, "LowestCPK.csv")
+
+    # machines running the same material share the same inspection data, fetch it once per material
+    materialcodes = df_tool_data['MaterialCode'].dropna().unique().tolist()
+    state = PpkStateStore(PPK_STATE_PATH, window=PPK_WINDOW)
+    inspectionData = FetchInspectionDataByMaterial(materialcodes, state)
+    for materialcode, (full, df_inspection_bulk) in inspectionData.items():
+        state.apply(materialcode, df_inspection_bulk, full=full)
+
+    # materials whose fetch failed keep their last known window
+    lowestPpkByMaterial = {materialcode: CalculateLowestPpk(state.load_window(materialcode)) for materialcode in materialcodes}
+
+    LowestCpkdataFrame = pd.DataFrame({
+        "MachineID": df_tool_data['MachineID'],
+        "ToolNoID": '',
+        "MaterialCode": df_tool_data['MaterialCode'],
+        "Value": pd.to_numeric(df_tool_data['MaterialCode'].map(lowestPpkByMaterial), errors='coerce'),
+    })
+    # Save the results (atomic swap + history)
+    version = get_results_store().write_lowest_ppk(LowestCpkdataFrame)
+    print(f"Lowest Ppk results stored (version {version}, {len(LowestCpkdataFrame)} machines)")
 
 if __name__ == "__main__":
-    GetLowestCPK()
\ No newline at end of file
+    GetLowestCPK()
@@ -0,0 +1,114 @@
+import io
+import json
+import zipfile
+from datetime import date, datetime
+from urllib.parse import quote, urlencode
+from urllib.request import Request, urlopen
+
+import pandas as pd
+
+from config_loader import load_config
+
+config = load_config()
+API_CONFIG = config.get('api', {})
+# dashboard in client mode: every data call goes to api_server.py instead of the databases
+API_ENABLED = API_CONFIG.get('enabled', False)
+API_URL = API_CONFIG.get('url', 'http://127.0.0.1:8600').rstrip('/')
+API_TIMEOUT = API_CONFIG.get('timeout', 180)
+
+PARQUET_CONTENT_TYPE = 'application/vnd.apache.parquet'
+ZIP_CONTENT_TYPE = 'application/zip'
+
+
+# ---- Payloads (shared with api_server.py) ----
+def _frame_to_parquet(df):
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+def encode_frames(result):
+    '''DataFrame -> Parquet, tuple/dict of DataFrames -> zip of Parquet files (one per frame). Returns (content type, bytes).'''
+    if isinstance(result, pd.DataFrame):
+        return PARQUET_CONTENT_TYPE, _frame_to_parquet(result)
+    frames = result if isinstance(result, dict) else dict(enumerate(result))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:  # Parquet is compressed already
+        for name, df in frames.items():
+            archive.writestr(f'{name}.parquet', _frame_to_parquet(df))
+    return ZIP_CONTENT_TYPE, buffer.getvalue()
+
+def decode_frames(content_type, payload):
+    '''Inverse of encode_frames: DataFrame, or {member name: DataFrame} for a zip.'''
+    if content_type.startswith(PARQUET_CONTENT_TYPE):
+        return pd.read_parquet(io.BytesIO(payload))
+    with zipfile.ZipFile(io.BytesIO(payload)) as archive:
+        return {name[:-len('.parquet')]: pd.read_parquet(io.BytesIO(archive.read(name))) for name in archive.namelist()}
+
+
+# ---- HTTP ----
+def _param(value):
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+def _segment(value):
+    '''value as one URL path segment ("/", "?", "#" and spaces escaped).'''
+    return quote(str(value), safe='')
+
+def _request(path, params=None, body=None):
+    '''(decoded frames, response headers).'''
+    params = {key: _param(value) for key, value in (params or {}).items() if value is not None}
+    url = f"{API_URL}{path}" + (f"?{urlencode(params)}" if params else '')
+    data = None
+    headers = {}
+    if body is not None:
+        data = json.dumps(body, default=_param).encode()
+        headers['Content-Type'] = 'application/json'
+    with urlopen(Request(url, data=data, headers=headers), timeout=API_TIMEOUT) as response:
+        return decode_frames(response.headers.get('Content-Type', ''), response.read()), response.headers
+
+def _call(path, params=None, body=None):
+    return _request(path, params, body)[0]
+
+
+# ---- Data calls (same results as the backend functions they wrap) ----
+def load_dashboard_snapshot():
+    '''(df_tool_data, df_tool_data_all, refreshed_at): refreshed_at is when the server built the snapshot.'''
+    frames, headers = _request('/snapshot')
+    return frames['0'], frames['1'], datetime.fromisoformat(headers['X-Snapshot-Refreshed-At'])
+
+def get_inspection_data_bulk(sapcode):
+    return _call(f'/inspection/{_segment(sapcode)}')
+
+def get_tool_piece_aggregates(MachineName, Position, ToolingStation, StartDate, AlarmColumn, AlarmFilter, historyFlag=False, EndDate=None, ToolNoID=None):
+    '''Completed tools (historyFlag + ToolNoID) come from the server's tool archive.'''
+    return _call('/tool/aggregates', {'MachineName': MachineName, 'Position': Position, 'ToolingStation': ToolingStation,
+                                      'StartDate': StartDate, 'AlarmColumn': AlarmColumn, 'AlarmFilter': AlarmFilter,
+                                      'historyFlag': historyFlag, 'EndDate': EndDate, 'ToolNoID': ToolNoID})
+
+def get_live_tool_piece_aggregates(MachineName, Position, ToolingStation, StartDate, AlarmColumn, AlarmFilter, ToolNoID):
+    '''Live chart, served from the server's tail cache.'''
+    return _call('/tool/live', {'MachineName': MachineName, 'Position': Position, 'ToolingStation': ToolingStation,
+                                'StartDate': StartDate, 'AlarmColumn': AlarmColumn, 'AlarmFilter': AlarmFilter, 'ToolNoID': ToolNoID})
+
+def get_KPI_Data(MachineName):
+    return _call(f'/kpi/{_segment(MachineName)}')
+
+def get_historical_data(MachineName, Position, ToolingStation, StartDate, EndDate):
+    return _call('/history/tools', {'MachineName': MachineName, 'Position': Position, 'ToolingStation': ToolingStation,
+                                    'StartDate': StartDate, 'EndDate': EndDate})
+
+def get_History_Inspection_Data(MachineName, StartDate, EndDate):
+    return _call('/history/inspection', {'MachineName': MachineName, 'StartDate': StartDate, 'EndDate': EndDate})
+
+def get_tool_offsets_batch(df_tools, ToolingStation):
+    '''Same as ToolArchive.get_offsets_batch: {df_tools index: max offsets per piece}.'''
+    tools = df_tools[['MachineID', 'Turret', 'ToolNoID', 'StartDate', 'CompletedDate']].copy()
+    tools['Index'] = df_tools.index
+    frames = _call('/history/offsets', {'ToolingStation': ToolingStation}, body=tools.to_dict(orient='records'))
+    return {index: frames[str(index)] for index in df_tools.index}
+
+def read_lowest_ppk():
+    return _call('/results/lowest_ppk')
@@ -0,0 +1,11 @@
+# Set current working directory = script directory
+cd "$PSScriptRoot"
+
+# Activate virtual environment
+. ".venv\Scripts\Activate.ps1"
+
+# start the shared data service (api_server.py), dashboards use it with api.enabled: true in config.yaml
+# Task Scheduler: trigger once "At startup"
+python ".\api_server.py"
+
+# for manual run, in powershell, cd to this dir, then ".\api_launcher.ps1"
\ No newline at end of file
@@ -0,0 +1,119 @@
+'''
+Shared data service (README "Option 2"): wraps the backend.py readers behind HTTP and owns the cache,
+so every dashboard instance in client mode (config api.enabled) shares one set of database queries.
+DataFrames are returned as Parquet (api_client.encode_frames), the cache is cache.get_cache() (memory / disk / redis).
+
+    python api_server.py        # host/port from config.yaml api
+'''
+from datetime import date, datetime
+from typing import List, Optional
+
+import pandas as pd
+from fastapi import Body, FastAPI, Response
+
+from backend import (load_dashboard_snapshot, get_inspection_data_bulk, get_tool_piece_aggregates, get_KPI_Data,
+                     get_historical_data, get_History_Inspection_Data, get_pool_stats)
+from api_client import encode_frames
+from cache import get_cache
+from cache_keys import make_key
+from single_flight import get_single_flight
+from snapshot_refresher import SnapshotRefresher
+from config_loader import load_config
+from results_store import get_results_store
+from tail_cache import get_tool_tail_cache
+from tool_archive import get_tool_archive
+
+config = load_config()
+API_CONFIG = config.get('api', {})
+REFRESH_CONFIG = config.get('refresh', {})
+# seconds per endpoint, defaults follow the dashboard's st.cache_data ttls (kpi / history are cached in backend.py,
+# the snapshot is rebuilt in the background by snapshot_refresher)
+CACHE_TTL = {
+    'inspection': REFRESH_CONFIG.get('inspection_data_cache', 300),
+    'tool': REFRESH_CONFIG.get('inspection_data_cache', 300),
+    **config.get('cache', {}).get('ttl', {}),
+}
+
+
+# ---- Cache ----
+snapshot_refresher = SnapshotRefresher(load_dashboard_snapshot)
+
+def cached_result(endpoint, *args, compute):
+    return get_cache().get_or_compute(make_key(endpoint, *args), CACHE_TTL[endpoint], compute)
+
+def frames_response(result):
+    content_type, payload = encode_frames(result)
+    return Response(content=payload, media_type=content_type)
+
+
+# ---- Endpoints ----
+app = FastAPI(title='Tool monitoring data API')
+
+@app.get('/health')
+def health():
+    return {'status': 'ok', 'cache': get_cache().stats(), 'tail_cache': get_tool_tail_cache().stats(),
+            'archive': get_tool_archive().stats(), 'pools': get_pool_stats(),
+            'single_flight': get_single_flight().stats(), 'snapshot': snapshot_refresher.stats()}
+
+@app.on_event('startup')
+def start_snapshot_refresher():
+    snapshot_refresher.start()
+
+@app.get('/snapshot')
+def snapshot():
+    df_tool_data, df_tool_data_all, refreshed_at = snapshot_refresher.get()
+    response = frames_response((df_tool_data, df_tool_data_all))
+    response.headers['X-Snapshot-Refreshed-At'] = refreshed_at.isoformat()
+    return response
+
+@app.get('/inspection/{sapcode:path}')  # :path, a quoted '/' arrives decoded
+def inspection(sapcode: str):
+    return frames_response(cached_result('inspection', sapcode, compute=lambda: get_inspection_data_bulk(sapcode)))
+
+@app.get('/tool/aggregates')
+def tool_aggregates(MachineName: str, Position: str, ToolingStation: int, StartDate: datetime, AlarmColumn: str, AlarmFilter: float,
+                    historyFlag: bool = False, EndDate: Optional[datetime] = None, ToolNoID: Optional[str] = None):
+    def compute():
+        if historyFlag and ToolNoID is not None:
+            return get_tool_archive().get_piece_aggregates(ToolNoID, MachineName, Position, ToolingStation, StartDate, EndDate, AlarmColumn, AlarmFilter)
+        return get_tool_piece_aggregates(MachineName, Position, ToolingStation, StartDate, AlarmColumn, AlarmFilter, historyFlag=historyFlag, EndDate=EndDate)
+    key = (MachineName, Position, ToolingStation, StartDate, AlarmColumn, AlarmFilter, historyFlag, EndDate, ToolNoID)
+    return frames_response(cached_result('tool', *key, compute=compute))
+
+@app.get('/tool/live')
+def tool_live(MachineName: str, Position: str, ToolingStation: int, StartDate: datetime, AlarmColumn: str, AlarmFilter: float,
+              ToolNoID: Optional[str] = None):
+    # the tail cache is the cache here (append-only, min_refresh_seconds)
+    return frames_response(get_tool_tail_cache().get(MachineName, Position, ToolingStation, StartDate, AlarmColumn, AlarmFilter, ToolNoID=ToolNoID))
+
+@app.get('/kpi/{MachineName:path}')
+def kpi(MachineName: str):
+    df = get_KPI_Data(MachineName)
+    # get_KPI_Data returns None in demo mode, clients get an empty frame
+    return frames_response(pd.DataFrame() if df is None else df)
+
+@app.get('/history/tools')
+def history_tools(MachineName: str, Position: str, ToolingStation: int, StartDate: date, EndDate: date):
+    return frames_response(get_historical_data(MachineName, Position, ToolingStation, StartDate, EndDate))
+
+@app.get('/history/inspection')
+def history_inspection(MachineName: str, StartDate: date, EndDate: date):
+    return frames_response(get_History_Inspection_Data(MachineName, StartDate, EndDate))
+
+@app.post('/history/offsets')
+def history_offsets(ToolingStation: int, tools: List[dict] = Body(...)):
+    # completed tools, cached by the tool archive
+    df_tools = pd.DataFrame(tools).set_index('Index')
+    for column in ('StartDate', 'CompletedDate'):
+        df_tools[column] = pd.to_datetime(df_tools[column])
+    offsets = get_tool_archive().get_offsets_batch(df_tools, ToolingStation)
+    return frames_response({str(index): df for index, df in offsets.items()})
+
+@app.get('/results/lowest_ppk')
+def lowest_ppk():
+    return frames_response(get_results_store().read_lowest_ppk())
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host=API_CONFIG.get('host', '127.0.0.1'), port=API_CONFIG.get('port', 8600))
@@ -10,44 +10,66 @@ from config_loader import load_config
 from streamlit_extras.stylable_container import stylable_container
 config = load_config()
 
-from backend import load_data, load_data_all, get_inspection_data, get_CTQ_SpecNo,merge_OT_DataLake_Questdb,get_questdb_data,get_historical_data,get_KPI_Data,get_History_Inspection_Data,get_questdb_offset_history
-from helper import set_timer_style, plot_IMR, calculate_ppk,plot_selected_columns_by_pieces_made,plot_RPMGraph,plotIMRByPlotly,read_csv_data,plot_KPI_Graph,plotNormalDistributionPlotly,BalanceClustering,plot_OffSet_History_Graph
+from backend import load_dashboard_snapshot, get_inspection_data_bulk,get_tool_piece_aggregates,get_questdb_data,get_historical_data,get_KPI_Data,get_History_Inspection_Data,get_questdb_offset_history
+from results_store import get_results_store
+from tail_cache import get_tool_tail_cache
+from tool_archive import get_tool_archive
+from concurrent_fetch import run_concurrently
+from snapshot_refresher import SnapshotRefresher
+import api_client
+from api_client import API_ENABLED
+from helper import set_timer_style, plot_IMR, calculate_ppk,plot_selected_columns_by_pieces_made,plot_RPMGraph,plotIMRByPlotly,plot_KPI_Graph,plotNormalDistributionPlotly,BalanceClustering,plot_OffSet_History_Graphs,split_inspection_data_by_spec
 
 # ---- Load app setting from config ----
 
 PAGE_REFRESH = config['refresh']['page_refresh']
-OFFSET_CACHE = config['refresh']['offset_cache']
-DEFAULT_CACHE_LIFE  = PAGE_REFRESH-OFFSET_CACHE #offset to avoid race
 INSPECTION_DATA_CACHE = config['refresh']['inspection_data_cache']
+# API_ENABLED (config api.enabled): client mode, data comes from api_server.py (shared cache) instead of the databases
 
 # ---- Caching functions ----
 
 # Load data into cache
 
-@st.cache_data(ttl= DEFAULT_CACHE_LIFE)
+@st.cache_resource
+def get_snapshot_refresher():
+    # one background refresher per server process, shared by every session
+    return SnapshotRefresher(api_client.load_dashboard_snapshot if API_ENABLED else load_dashboard_snapshot).start()
+
 def load_data_cached():
-    df_tool_data = load_data()
-    df_tool_data_all = load_data_all()
-    last_refresh = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    # latest completed snapshot, never waits on the database (except for the very first one)
+    df_tool_data, df_tool_data_all, refreshed_at = get_snapshot_refresher().get()
+    last_refresh = refreshed_at.strftime('%Y-%m-%d %H:%M:%S')
     return df_tool_data, df_tool_data_all, last_refresh
 
 @st.cache_data(ttl= INSPECTION_DATA_CACHE)
-def get_inspection_data_cached(sapcode, specno):
-    df_inspection_data = get_inspection_data(sapcode, specno)
-    return df_inspection_data
-
-@st.cache_data(ttl= INSPECTION_DATA_CACHE)
-def get_CTQ_SpecNo_cached(sapcode):
-    df_inspection_data = get_CTQ_SpecNo(sapcode)
+def get_inspection_data_cached(sapcode):
+    if API_ENABLED:
+        return api_client.get_inspection_data_bulk(sapcode)
+    df_inspection_data = get_inspection_data_bulk(sapcode)
     return df_inspection_data
 
 @st.cache_data(ttl= INSPECTION_DATA_CACHE)
-def get_Current_Tool_Column_Data(MachineName, Position, ToolingStation,StartDate, AlarmColumn, AlarmFilter,historyFlag=False, EndDate=None):
-    df_Tool_Data = merge_OT_DataLake_Questdb(MachineName, Position, ToolingStation,StartDate, AlarmColumn, AlarmFilter,historyFlag=historyFlag, EndDate=EndDate)
+def get_Current_Tool_Column_Data(MachineName, Position, ToolingStation,StartDate, AlarmColumn, AlarmFilter,historyFlag=False, EndDate=None, ToolNoID=None):
+    if API_ENABLED:
+        return api_client.get_tool_piece_aggregates(MachineName, Position, ToolingStation, StartDate, AlarmColumn, AlarmFilter,
+                                                    historyFlag=historyFlag, EndDate=EndDate, ToolNoID=ToolNoID)
+    if historyFlag and ToolNoID is not None:
+        # completed tool: local Parquet archive, filled on first access
+        return get_tool_archive().get_piece_aggregates(ToolNoID, MachineName, Position, ToolingStation, StartDate, EndDate, AlarmColumn, AlarmFilter)
+    # per-piece max/mean only, the raw samples stay in QuestDB
+    df_Tool_Data = get_tool_piece_aggregates(MachineName, Position, ToolingStation,StartDate, AlarmColumn, AlarmFilter,historyFlag=historyFlag, EndDate=EndDate)
     return df_Tool_Data
 
-@st.cache_data(ttl= DEFAULT_CACHE_LIFE)
+def get_Live_Tool_Column_Data(MachineName, Position, ToolingStation,StartDate, AlarmColumn, AlarmFilter, ToolNoID):
+    # append-only: only samples after the last cached timestamp are aggregated, reset on tool change
+    if API_ENABLED:
+        return api_client.get_live_tool_piece_aggregates(MachineName, Position, ToolingStation, StartDate, AlarmColumn, AlarmFilter, ToolNoID)
+    return get_tool_tail_cache().get(MachineName, Position, ToolingStation, StartDate, AlarmColumn, AlarmFilter, ToolNoID=ToolNoID)
+
+@st.cache_data(ttl= PAGE_REFRESH)
 def get_KPI_Data_Cache(MachineName):
+    if API_ENABLED:
+        return api_client.get_KPI_Data(MachineName)
 
     df_KPI_Data = get_KPI_Data(MachineName)
 
@@ -59,12 +81,45 @@ def get_Current_Tool_Offset_History(MachineName, Position,StartDate, EndDate,Too
     return df_Offet_Data
 
 def get_History_Tool_Data(MachineName, Position, ToolingStation,StartDate, EndDate):
+    if API_ENABLED:
+        return api_client.get_historical_data(MachineName, Position, ToolingStation, StartDate, EndDate)
     df_Tool_Data = get_historical_data(MachineName, Position, ToolingStation,StartDate,EndDate)
     return df_Tool_Data
 
-def get_Inspection_History_Data(MachineName,StartDate,EndDate):
-    df_Inspection_History = get_History_Inspection_Data(MachineName,StartDate,EndDate)
-    return df_Inspection_History
+class ToolAnalysisError(Exception):
+    '''A Tool Analysis source failed or timed out, results holds every source's result or exception.'''
+
+    def __init__(self, results):
+        super().__init__(', '.join(name for name, result in results.items() if isinstance(result, Exception)))
+        self.results = results
+
+@st.cache_data(ttl= INSPECTION_DATA_CACHE, show_spinner=False)
+def get_Tool_Analysis_Data(MachineName, Position, ToolingStation, StartDate, EndDate):
+    '''
+    Tool Analysis panel sources, fetched concurrently (concurrent_fetch.timeouts per source):
+    tool history and inspection history (SQL) side by side, then the offset charts of the tools found (QuestDB).
+    Fetch threads have no Streamlit script context: they run the uncached backend (or api_client) calls and
+    the combined result is cached here, in the script thread. A failed / timed out source raises
+    ToolAnalysisError with the partial results, which are shown but not cached.
+    '''
+    if API_ENABLED:
+        historicalData, inspectionHistoryData = api_client.get_historical_data, api_client.get_History_Inspection_Data
+    else:
+        historicalData, inspectionHistoryData = get_historical_data.uncached, get_History_Inspection_Data.uncached
+    results = run_concurrently({
+        'tool history': ('sql', historicalData, MachineName, Position, ToolingStation, StartDate, EndDate),
+        'inspection history': ('sql', inspectionHistoryData, MachineName, StartDate, EndDate),
+    }, return_exceptions=True)
+    df_history = results['tool history']
+    if not isinstance(df_history, Exception) and not df_history.empty:
+        def offset_charts():
+            offsets = api_client.get_tool_offsets_batch(df_history, ToolingStation) if API_ENABLED else None
+            return plot_OffSet_History_Graphs(df=df_history,selectedStation=ToolingStation,MachineName=MachineName,offsets=offsets)
+
+        results.update(run_concurrently({'offset history': ('questdb', offset_charts)}, return_exceptions=True))
+    if any(isinstance(result, Exception) for result in results.values()):
+        raise ToolAnalysisError(results)
+    return results
 
 # ---- UI ----
 # ---- Page config ----
@@ -88,6 +143,23 @@ st.markdown("""
                 justify-content: space-around;
                 height: 100px; /* Adjust height as needed */
         }
+        @keyframes blinker {
+                50% { opacity: 0; }
+        }
+        .machine-row {
+                display: grid;
+                grid-template-columns: repeat(6, 1fr);
+                column-gap: 1rem;
+        }
+        .icon {
+                display: inline-block;
+                height: 1em;
+                width: 1em;
+                vertical-align: middle;
+                background-size: contain;
+                background-repeat: no-repeat;
+                background-position: center;
+        }
         .circle-button {
                 height: 40px;
                 width: 40px;
@@ -157,6 +229,14 @@ with open("images/robot-arm_5062552.png", "rb") as image_file:
 with open("images/milling-machine.png", "rb") as image_file:
     machineBase64 = base64.b64encode(image_file.read()).decode()
 
+# icons sent once per page as CSS classes instead of inside every machine row
+st.markdown(f"""
+    <style>
+        .icon-robot-arm {{ background-image: url('data:image/png;base64,{robotArmBase64}'); }}
+        .icon-machine {{ background-image: url('data:image/png;base64,{machineBase64}'); }}
+    </style>
+""", unsafe_allow_html=True)
+
 @st.fragment(run_every=str(PAGE_REFRESH)+"s")
 def ShowTimerInfo():
     df_tool_data, df_tool_data_all, last_refresh = load_data_cached()
@@ -174,7 +254,7 @@ def ShowTimerInfo():
     if selected_locations:
         filtered_df = filtered_df[filtered_df["Location"].isin(selected_locations)]
     
-    st.markdown(f"<p style='text-align: center; color: grey;'>Last refreshed: {last_refresh}</p>", unsafe_allow_html=True)
+    st.markdown(f"<p style='text-align: center; color: grey;'>Last refreshed: {last_refresh} ({get_snapshot_refresher().age():.0f}s ago)</p>", unsafe_allow_html=True)
     with st.container(height=70):
         col1, col2, col3 = st.columns([1,40,1])
         
@@ -192,126 +272,23 @@ def ShowTimerInfo():
         col1, col2, col3 = st.columns([1,60,1])
         
         with col2:
+            # display cells are rebuilt only for machines whose data changed (row hash), the rest come from cache
+            rowKeys = GetMachineRowKeys(filtered_df, df_tool_data_all)
+            toolsByLocation = dict(tuple(df_tool_data_all.groupby('Location', sort=False, observed=True)))
             for index, row in filtered_df.iterrows():   
-                # Create 3 columns: machine name | timer | button
-                col_name,colTechCall,colMacStatus, col_timer,colChangeTime,colToolChange, col_tool, col_history, col_button, col_kpi = st.columns([1,1,1, 1,1,1, 1, 1,1,1])  # adjust ratios as needed
-
-                with col_name:
-                     st.markdown(f"""
-                                <div class='circle-container' style='font-size: 2.5vw;'>
-                                    <strong>
-                                        {row['Location']} 
-                                    </strong></div>""", unsafe_allow_html=True)  
-                    
+                # machine cells (Machine .. Tool Change) in one HTML block | 4 buttons
+                col_cells, col_tool, col_history, col_button, col_kpi = st.columns([6, 1,1,1,1], vertical_alignment="center")
 
-                with colTechCall:
-                    if row['TechRequired']:
-                        if row['MacErrorType'] == 2:
-                            st.markdown(f"""
-                                    <div class='circle-container' style='font-size: 1.99vw;animation: blinker 1s linear infinite;'>
-                                        <strong>
-                                            <span>
-                                                <img src='data:image/png;base64,{robotArmBase64}' alt='icon' style='height: 1em; vertical-align: middle;'/> 
-                                                {row['TechRequestMin']}
-                                            </span>
-                                        </strong></div>""", unsafe_allow_html=True)
-                        else:
-                            st.markdown(f"""
-                                    <div class='circle-container' style='font-size: 1.99vw;animation: blinker 1s linear infinite;'>
-                                        <strong>
-                                            <span>
-                                                <img src='data:image/png;base64,{machineBase64}' alt='icon' style='height: 1em; vertical-align: middle;'/> 
-                                                {row['TechRequestMin']}
-                                            </span>
-                                        </strong></div>""", unsafe_allow_html=True)
-                    else:
-                        st.markdown(f"""
-                                <div class='circle-container' style='font-size: 1.99vw;'>
-                                    <strong>
-                                        <span style='color: gray; opacity: 0.2;'>
-                                            <img src='data:image/png;base64,{machineBase64}' alt='icon' style='height: 1em; vertical-align: middle;'/> {row['TechRequestMin']}
-                                        </span>
-                                    </strong></div>""", unsafe_allow_html=True)                                                     
-                with colMacStatus:
-                    backGroundColor = (
-                        'red' if row['MacLEDRed'] else
-                        '#FFBF00' if row['MacLEDYellow'] else
-                        '#00FF00' if row['MacLEDGreen'] else
-                        '#373737'
-                    )
-                    
-                    colorUI = GetTowerLightUI(backGroundColor)
-
-                    st.markdown(f"""
-                                <div class='circle-container' style='font-size:50px;'>
-                                    </strong>{colorUI}</div>""", unsafe_allow_html=True) 
+                with col_cells:
+                    ToolChangeTime = datetime.now() + timedelta(minutes=row['DurationMins'])
+                    changeTime = ToolChangeTime.strftime('%I:%M %p').lstrip('0')
+                    rowHTML = GetMachineRowHTML(rowKeys[index], row, toolsByLocation.get(row['Location'], df_tool_data_all.iloc[0:0]))
+                    # the change time moves with the clock, it is filled in after the cache
+                    st.markdown(rowHTML.replace(CHANGE_TIME_MARK, changeTime), unsafe_allow_html=True)
 
-                with col_timer:
-                    backGroundColor, blink_style = set_timer_style(row['DurationMins'])
-
-                    st.markdown(
-                        f"""
-                        <style>
-                            @keyframes blinker {{
-                                50% {{ opacity: 0; }}
-                            }}
-                        </style>
-                        <div class='circle-container' style="color: {backGroundColor}; font-size: 1.99vw; {blink_style};justify-content: space-evenly;">
-                            <span>{row['DurationMins']}</span>
-                        </div>
-                        """,
-                        unsafe_allow_html=True,
-                    )
-                with colChangeTime:
-                    backGroundColor, blink_style = set_timer_style(row['DurationMins'])
-                    currentTime = datetime.now()
-                    ToolChangeTime = currentTime + timedelta(minutes=row['DurationMins'])
-
-                    st.markdown(
-                        f"""
-                        <style>
-                            @keyframes blinker {{
-                                50% {{ opacity: 0; }}
-                            }}
-                        </style>
-                        <div class='circle-container' style="color: {backGroundColor}; font-size: 1.99vw; {blink_style};justify-content: space-evenly;">
-                            <span>{ToolChangeTime.strftime('%I:%M %p').lstrip('0')}</span>
-                        </div>
-                        """,
-                        unsafe_allow_html=True,
-                    )
-                    
-                with colToolChange:
-                    cols = ['Turret','Tool','Process','Balance (mins)', 'Balance (pcs)','MachineID', 'ToolNoID', 'StartDate', 'TotalCounter']
-                    df = df_tool_data_all[df_tool_data_all['Location']==row['Location']]
-                    df = df[cols].reset_index(drop=True)
-                    df = df[cols].reset_index(drop=True)
-                    df = BalanceClustering(df)
-                    
-                    min_balance = df['Balance (mins)'].min()
-                    min_cluster = df[df['Balance (mins)'] == min_balance]['Hierarchical_Distance'].iloc[0]
-                    filtered_df = df[(df['Hierarchical_Distance'] == min_cluster) | (df['Balance (mins)'] <= (min_balance + Tool_Change_min))]
-                    backGroundColor, blink_style = set_timer_style(row['DurationMins'])
-
-                    st.markdown(
-                        f"""
-                        <style>
-                            @keyframes blinker {{
-                                50% {{ opacity: 0; }}
-                            }}
-                        </style>
-                        <div class='circle-container' style="color: {backGroundColor}; font-size: 1.99vw; {blink_style};justify-content: space-evenly;">
-                            <span>{len(filtered_df)}</span>
-                        </div>
-                        """,
-                        unsafe_allow_html=True,
-                    )                    
-                            
                 with col_tool:
                     buttonType = "primary" if row['LoadPeak_Alm_L'] or row['LoadPeak_Warn_L'] or row['LoadPeak_Alm_R'] or row['LoadPeak_Warn_R'] else 'secondary'
 
-                    st.markdown("<div style='height:25px;'></div>", unsafe_allow_html=True)  # Top spacer
-
                     # Store selected location for showing details at bottom section
                     if st.button("Show 🛠️", key=f"btn_{row['Location']}", use_container_width=True,type=buttonType):
                         # #toggle off
@@ -329,7 +306,6 @@ def ShowTimerInfo():
                         st.rerun()
 
                 with col_history:
-                    st.markdown(f"""<div style='height:25px;'></div>""", unsafe_allow_html=True)  # Top spacer
                     # Store selected location for showing details at bottom section
                     if st.button("History 🛠️", key=f"btn_{row['Location']}_History", use_container_width=True):
                         # #toggle off
@@ -353,7 +329,6 @@ def ShowTimerInfo():
                     buttonType = "primary" if LowestPpk == "N/A" else "primary" if float(LowestPpk) < 0.7 else "secondary"
                     backGroundColor = '#00FF00' if LowestPpk == "N/A" else "red" if float(LowestPpk) < 0.7 else '#00FF00' if float(LowestPpk) > 1.0 else '#FFBF00'
                     color = "black" if LowestPpk == "N/A" else "white" if float(LowestPpk) < 0.7 else "black"
-                    st.markdown(f"""<div style='height:25px;'></div>""", unsafe_allow_html=True)  # Top spacer
                     with stylable_container(
                         key=f"insp{row['Location']}_button",
                         css_styles=f"""
@@ -388,7 +363,6 @@ def ShowTimerInfo():
                             st.rerun()
                             
                 with col_kpi:
-                    st.markdown(f"""<div style='height:25px;'></div>""", unsafe_allow_html=True)
                     if st.button("KPI 🛠️", key=f"btn_{row['Location']}_KPI", use_container_width=True):
                         st.session_state.clicked_KPI = row['MachineID'] # update session state
                         st.session_state.clicked_Common_Location = row['Location']
@@ -478,13 +452,14 @@ def ShowTimerInfo():
                         
                     if st.session_state[f'visible_graph_row_{i}'] == "LoadX":
                         
-                        loadXDf = get_Current_Tool_Column_Data(
+                        loadXDf = get_Live_Tool_Column_Data(
                             MachineName=row['MachineID'],
                             Position=row['Turret'],
                             ToolingStation=row['Tool'],
                             StartDate=row['StartDate'],
                             AlarmColumn='Load_X',
-                            AlarmFilter=row['LoadX_Alm']
+                            AlarmFilter=row['LoadX_Alm'],
+                            ToolNoID=row['ToolNoID'],
                         )
                         st.button("❌ Close",key = f'close_loadX{i}' , on_click=clear_Selected_Graph, args=(i,))
                         if loadXDf.empty:
@@ -504,13 +479,14 @@ def ShowTimerInfo():
                         
 
                     elif st.session_state[f'visible_graph_row_{i}'] == "LoadZ":
-                        loadZDf = get_Current_Tool_Column_Data(
+                        loadZDf = get_Live_Tool_Column_Data(
                             MachineName=row['MachineID'],
                             Position=row['Turret'],
                             ToolingStation=row['Tool'],
                             StartDate=row['StartDate'],
                             AlarmColumn='Load_Z',
-                            AlarmFilter=row['LoadZ_Alm']
+                            AlarmFilter=row['LoadZ_Alm'],
+                            ToolNoID=row['ToolNoID'],
                         )
                         st.button("❌ Close",key = f'close_loadZ{i}' , on_click=clear_Selected_Graph, args=(i,))
                         if loadZDf.empty:
@@ -541,10 +517,98 @@ def GetTowerLightUI(color):
                         """
     return colorUI
 
+TOOL_CHANGE_COLUMNS = ['Turret','Tool','Process','Balance (mins)', 'Balance (pcs)','MachineID', 'ToolNoID', 'StartDate', 'TotalCounter']
+
+@st.cache_data(max_entries=1000, show_spinner=False)
+def GetToolChangeCount(toolKey, _df_location_all):
+    # tools due together with the next one: same balance cluster or within Tool_Change_min of it
+    # cached on toolKey (hash of the location's tools, GetMachineRowKeys), _df_location_all is not hashed
+    df_location_all = _df_location_all
+    if df_location_all.empty:
+        return 0
+    df = df_location_all[TOOL_CHANGE_COLUMNS].reset_index(drop=True)
+    df = BalanceClustering(df)
+    
+    min_balance = df['Balance (mins)'].min()
+    min_cluster = df[df['Balance (mins)'] == min_balance]['Hierarchical_Distance'].iloc[0]
+    filtered_df = df[(df['Hierarchical_Distance'] == min_cluster) | (df['Balance (mins)'] <= (min_balance + Tool_Change_min))]
+    return len(filtered_df)
+
+def GetMachineRowKeys(df_tool_data, df_tool_data_all):
+    '''
+    Hashes per machine row (index -> (row hash, hash of its tools in df_tool_data_all)),
+    an unchanged key means unchanged display cells, an unchanged tools hash an unchanged tool change count.
+    '''
+    rowHash = pd.util.hash_pandas_object(df_tool_data, index=False)
+    toolHash = pd.util.hash_pandas_object(df_tool_data_all, index=False) \
+        .groupby(df_tool_data_all['Location'].values).agg(lambda hashes: hash(tuple(hashes)))
+    return {index: (int(rowHash[index]), int(toolHash.get(location, 0))) for index, location in df_tool_data['Location'].items()}
+
+# placeholder for the change time in the cached row HTML (now + DurationMins changes every minute)
+CHANGE_TIME_MARK = '<!--change-time-->'
+
+@st.cache_data(max_entries=1000, show_spinner=False)
+def GetMachineRowHTML(rowKey, _row, _df_location_all):
+    '''
+    Display cells of one machine row (Machine .. Tool Change) as a single HTML block, the change time
+    is left as CHANGE_TIME_MARK. Cached on rowKey (GetMachineRowKeys) only, _row / _df_location_all are not hashed.
+    '''
+    row = _row
+    if row['TechRequired']:
+        icon = 'icon-robot-arm' if row['MacErrorType'] == 2 else 'icon-machine'
+        techCall = f"""
+                <div class='circle-container' style='font-size: 1.99vw;animation: blinker 1s linear infinite;'>
+                    <strong>
+                        <span>
+                            <span class='icon {icon}'></span> 
+                            {row['TechRequestMin']}
+                        </span>
+                    </strong></div>"""
+    else:
+        techCall = f"""
+                <div class='circle-container' style='font-size: 1.99vw;'>
+                    <strong>
+                        <span style='color: gray; opacity: 0.2;'>
+                            <span class='icon icon-machine'></span> {row['TechRequestMin']}
+                        </span>
+                    </strong></div>"""
+
+    towerLightColor = (
+        'red' if row['MacLEDRed'] else
+        '#FFBF00' if row['MacLEDYellow'] else
+        '#00FF00' if row['MacLEDGreen'] else
+        '#373737'
+    )
+    backGroundColor, blink_style = set_timer_style(row['DurationMins'])
+    timerStyle = f"color: {backGroundColor}; font-size: 1.99vw; {blink_style};justify-content: space-evenly;"
+
+    rowHTML = f"""
+        <div class='machine-row'>
+            <div class='circle-container' style='font-size: 2.5vw;'>
+                <strong>
+                    {row['Location']} 
+                </strong></div>
+            {techCall}
+            <div class='circle-container' style='font-size:50px;'>
+                {GetTowerLightUI(towerLightColor)}</div>
+            <div class='circle-container' style="{timerStyle}">
+                <span>{row['DurationMins']}</span>
+            </div>
+            <div class='circle-container' style="{timerStyle}">
+                <span>{CHANGE_TIME_MARK}</span>
+            </div>
+            <div class='circle-container' style="{timerStyle}">
+                <span>{GetToolChangeCount(rowKey[1], _df_location_all)}</span>
+            </div>
+        </div>
+        """
+    # one markdown block: a blank line would end the HTML block and the rest would render as text
+    return "\n".join(line for line in rowHTML.splitlines() if line.strip())
+
 @st.fragment(run_every=str(INSPECTION_DATA_CACHE)+"s")
 def GetLowestCPK():
-    df_tool_data = read_csv_data("LowestCPK.csv")
-    filtered_df = df_tool_data.copy()
+    df_tool_data = api_client.read_lowest_ppk() if API_ENABLED else get_results_store().read_lowest_ppk()
+    filtered_df = df_tool_data
     for index, row in filtered_df.iterrows():
         MachineID = row['MachineID']
         if f'CurrentMachineMaterial_{MachineID}_LowestPpk' not in st.session_state:
@@ -576,26 +640,19 @@ if st.session_state.clicked_materialcode:
 
             materialcode = st.session_state.clicked_materialcode
             materialdesc = st.session_state.clicked_materialdesc
-            specnoList = get_CTQ_SpecNo_cached(materialcode)
+            df_inspection_bulk = get_inspection_data_cached(materialcode)
             st.button("❌ Close",key = f'close_{st.session_state.clicked_materialcode}', on_click=clear_selection_clicked_materialcode)
-            for specno in specnoList['BalloonNo'].unique():
-                df_inspection_data = get_inspection_data_cached(materialcode, specno)
-
-                if not df_inspection_data.empty:
-                    # Calculate ppk
-                    df_inspection_data['LSL'] = pd.to_numeric(df_inspection_data['LSL'], errors='coerce')
-    
-                    df_inspection_data['USL'] = pd.to_numeric(df_inspection_data['USL'], errors='coerce')
-
-                    ppk = calculate_ppk(df_inspection_data['MeasVal'],df_inspection_data['USL'].iloc[0],df_inspection_data['LSL'].iloc[0])
-
-                    st.info(f"#### Showing details for: `{st.session_state.clicked_materialcode} | {materialdesc}`")
-                    title =f"SpecNo:{specno}| {df_inspection_data['Description'].iloc[0]} | Ppk = {ppk}"
-                    fig = plotIMRByPlotly(df_inspection_data,df_inspection_data['USL'].iloc[0],df_inspection_data['LSL'].iloc[0],title = title) 
-                    #st.pyplot(fig)
-                    st.plotly_chart(fig)
-                else:
-                    st.warning(f"No inspection data available for `{st.session_state.clicked_materialcode}`.")
+            if df_inspection_bulk.empty:
+                st.warning(f"No inspection data available for `{st.session_state.clicked_materialcode}`.")
+            for specno, df_inspection_data in split_inspection_data_by_spec(df_inspection_bulk):
+                # Calculate ppk
+                ppk = calculate_ppk(df_inspection_data['MeasVal'],df_inspection_data['USL'].iloc[0],df_inspection_data['LSL'].iloc[0])
+
+                st.info(f"#### Showing details for: `{st.session_state.clicked_materialcode} | {materialdesc}`")
+                title =f"SpecNo:{specno}| {df_inspection_data['Description'].iloc[0]} | Ppk = {ppk}"
+                fig = plotIMRByPlotly(df_inspection_data,df_inspection_data['USL'].iloc[0],df_inspection_data['LSL'].iloc[0],title = title) 
+                #st.pyplot(fig)
+                st.plotly_chart(fig)
 
             
             st.markdown('---')
@@ -752,6 +809,7 @@ if st.session_state.clicked_location_History:
                                 AlarmFilter=row['LoadX_Alm'],
                                 historyFlag=True,
                                 EndDate=row['CompletedDate'],
+                                ToolNoID=row['ToolNoID'],
                             )
                             st.button("❌ Close",key = f'close_loadX{i}' , on_click=clear_Selected_Graph, args=(i,))
                             if loadXDf.empty:
@@ -780,6 +838,7 @@ if st.session_state.clicked_location_History:
                                 AlarmFilter=row['LoadZ_Alm'],
                                 historyFlag=True,
                                 EndDate=row['CompletedDate'],
+                                ToolNoID=row['ToolNoID'],
                             )
                             st.button("❌ Close",key = f'close_loadZ{i}' , on_click=clear_Selected_Graph, args=(i,))
                             if loadZDf.empty:
@@ -806,50 +865,56 @@ if st.session_state.clicked_location_History:
                     st.error("Start Date must be earlier than or equal to End Date.")
                 else:
                 
-                    df_history = get_History_Tool_Data(
-                        MachineName=st.session_state.clicked_NormalDistribution,
-                        Position=OptionTurret, 
-                        ToolingStation=OptionStation,  
-                        StartDate=StartDate,  
-                        EndDate=EndDate
-                    )
-                    
-                    df_PPKHistory = get_Inspection_History_Data(
-                        MachineName= st.session_state.clicked_NormalDistribution,
-                        StartDate=StartDate,  
-                        EndDate=EndDate
-                    )
-                    if df_history.empty:
-                                st.error(f"No data available for {st.session_state.clicked_location_History}-{OptionTurret} on {OptionStation} from {StartDate} to {EndDate}.")
-                    else:
-                        fig = plotNormalDistributionPlotly(df_history,title=f"Normal Distribution for {st.session_state.clicked_location_History}-{OptionTurret} on {OptionStation} from {StartDate} to {EndDate}")
-                        st.plotly_chart(fig)
-                        offsetX_fig = plot_OffSet_History_Graph(df=df_history,selectedStation=OptionStation,selectedAxis='X',MachineName=st.session_state.clicked_NormalDistribution)
-                        offsetZ_fig = plot_OffSet_History_Graph(df=df_history,selectedStation=OptionStation,selectedAxis='Z',MachineName=st.session_state.clicked_NormalDistribution)
-                        st.plotly_chart(offsetX_fig)
-                        st.plotly_chart(offsetZ_fig)
+                    try:
+                        ToolAnalysisData = get_Tool_Analysis_Data(
+                            MachineName=st.session_state.clicked_NormalDistribution,
+                            Position=OptionTurret, 
+                            ToolingStation=OptionStation,  
+                            StartDate=StartDate,  
+                            EndDate=EndDate
+                        )
+                    except ToolAnalysisError as e:
+                        ToolAnalysisData = e.results
+                    for name, result in ToolAnalysisData.items():
+                        if isinstance(result, Exception):
+                            st.error(f"Failed to load {name}: {result}")
+                    df_history = ToolAnalysisData['tool history']
+                    df_PPKHistory = ToolAnalysisData['inspection history']
+                    # failed sources are reported above
+                    if not isinstance(df_history, Exception):
+                        if df_history.empty:
+                            st.error(f"No data available for {st.session_state.clicked_location_History}-{OptionTurret} on {OptionStation} from {StartDate} to {EndDate}.")
+                        else:
+                            fig = plotNormalDistributionPlotly(df_history,title=f"Normal Distribution for {st.session_state.clicked_location_History}-{OptionTurret} on {OptionStation} from {StartDate} to {EndDate}")
+                            st.plotly_chart(fig)
+                            OffsetCharts = ToolAnalysisData['offset history']
+                            if not isinstance(OffsetCharts, Exception):
+                                offsetX_fig, offsetZ_fig = OffsetCharts
+                                st.plotly_chart(offsetX_fig)
+                                st.plotly_chart(offsetZ_fig)
                     
-                    if df_PPKHistory.empty:
-                        st.error(f"No inspection data available for {st.session_state.clicked_location_History}-{OptionTurret} on {OptionStation} from {StartDate} to {EndDate}.")
-                    else:
-                        grouped = df_PPKHistory.groupby(['ControlPlanId', 'CharId'])
-                        separated_df = {f"ControlPlanId{cp}_CharId_{i}": group for (cp, i), group in grouped}
+                    if not isinstance(df_PPKHistory, Exception):
+                        if df_PPKHistory.empty:
+                            st.error(f"No inspection data available for {st.session_state.clicked_location_History}-{OptionTurret} on {OptionStation} from {StartDate} to {EndDate}.")
+                        else:
+                            grouped = df_PPKHistory.groupby(['ControlPlanId', 'CharId'])
+                            separated_df = {f"ControlPlanId{cp}_CharId_{i}": group for (cp, i), group in grouped}
                         
                         
-                        for name, table in separated_df.items():
-                            # Calculate ppk
-                            table['LSL'] = pd.to_numeric(table['LSL'], errors='coerce')
+                            for name, table in separated_df.items():
+                                # Calculate ppk
+                                table['LSL'] = pd.to_numeric(table['LSL'], errors='coerce')
             
-                            table['USL'] = pd.to_numeric(table['USL'], errors='coerce')
-                            table['MeasValue']= pd.to_numeric(table['MeasValue'], errors='coerce')
+                                table['USL'] = pd.to_numeric(table['USL'], errors='coerce')
+                                table['MeasValue']= pd.to_numeric(table['MeasValue'], errors='coerce')
 
-                            ppk = calculate_ppk(table['MeasValue'],table['USL'].iloc[0],table['LSL'].iloc[0])
-                            title =f"SpecNo:{table['SpecNo'].iloc[0]}| {table['DimensionDesc'].iloc[0]} | Ppk = {ppk}"
-                            st.info(f"Ppk for: {table['MaterialCode'].iloc[0]} | {table['MaterialDesc'].iloc[0]} | {title}")
+                                ppk = calculate_ppk(table['MeasValue'],table['USL'].iloc[0],table['LSL'].iloc[0])
+                                title =f"SpecNo:{table['SpecNo'].iloc[0]}| {table['DimensionDesc'].iloc[0]} | Ppk = {ppk}"
+                                st.info(f"Ppk for: {table['MaterialCode'].iloc[0]} | {table['MaterialDesc'].iloc[0]} | {title}")
                             
-                            #fig = plotIMRByPlotly(table,table['USL'].iloc[0],table['LSL'].iloc[0],title = title) 
-                            #st.pyplot(fig)
-                            #st.plotly_chart(fig)
+                                #fig = plotIMRByPlotly(table,table['USL'].iloc[0],table['LSL'].iloc[0],title = title) 
+                                #st.pyplot(fig)
+                                #st.plotly_chart(fig)
             st.markdown('---')
 
 # ---- Bottom Section: Show KPI data for clicked_KPI ----
@@ -1,6 +1,14 @@
 import pyodbc
 from dotenv import load_dotenv
+import base64
+import logging
 import os
+import re
+import threading
+from datetime import timedelta
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
 
 import pandas as pd
 import numpy as np
@@ -8,8 +16,18 @@ from sqlalchemy import create_engine, text
 
 # ---- Load app setting from config ----
 from config_loader import load_config
+from db_pool import ConnectionPool
+from concurrent_fetch import run_concurrently
+from cache import cached
+from single_flight import single_flight
 config = load_config()
 DEMO_MODE = config['demo_mode']
+logger = logging.getLogger('backend')
+DB_POOL_CONFIG = config.get('db_pool', {})
+QUESTDB_CONFIG = config.get('questdb', {})
+# dashboard-only readers are cached in cache.py (shared with api_server / other processes), same ttls as the dashboard
+KPI_CACHE_TTL = config['refresh']['page_refresh']
+HISTORY_CACHE_TTL = config['refresh']['inspection_data_cache']
 
 # ---- Database connection using .env variables ----
 
@@ -66,25 +84,119 @@ def get_DataMart_db_connection():
     )
     return conn
 
+_questdb_engine = None
+_questdb_engine_lock = threading.Lock()
+
 def get_Questdb_connection():
+    '''
+    Process-wide SQLAlchemy engine for QuestDB, created on first use.
+    Shared by every Streamlit session and the backend job so the connection pool survives between queries.
+    '''
+    global _questdb_engine
+    if _questdb_engine is not None:
+        return _questdb_engine
+    with _questdb_engine_lock:
+        if _questdb_engine is None:
+            _questdb_engine = _create_Questdb_engine()
+    return _questdb_engine
+
+def _create_Questdb_engine():
     Qusername = os.getenv("QuestDB_Username")
     Qpassword = os.getenv("QuestDB_Password")
     Qhost = os.getenv("QuestDB_Host")
     Qport =os.getenv("QuestDB_Port")
     Qdatabase = os.getenv("QuestDB_Database")
 
+    connect_args = {'connect_timeout': QUESTDB_CONFIG.get('connect_timeout', 10)}
+    statement_timeout_ms = QUESTDB_CONFIG.get('statement_timeout_ms')
+    if statement_timeout_ms:
+        connect_args['options'] = f'-c statement_timeout={int(statement_timeout_ms)}'
 
     # Create SQLAlchemy engine
-    engine = create_engine(f'postgresql+psycopg2://{Qusername}:{Qpassword}@{Qhost}:{Qport}/{Qdatabase}')
+    engine = create_engine(
+        f'postgresql+psycopg2://{Qusername}:{Qpassword}@{Qhost}:{Qport}/{Qdatabase}',
+        pool_size=QUESTDB_CONFIG.get('pool_size', 5),
+        max_overflow=QUESTDB_CONFIG.get('max_overflow', 5),
+        pool_timeout=QUESTDB_CONFIG.get('pool_timeout', 30),
+        pool_recycle=QUESTDB_CONFIG.get('pool_recycle', 1800),
+        pool_pre_ping=QUESTDB_CONFIG.get('pool_pre_ping', True),
+        connect_args=connect_args,
+    )
     return engine
 
+# ---- Connection pools (one per SQL Server target) ----
+def _create_pool(name, connect_fn):
+    return ConnectionPool(
+        name,
+        connect_fn,
+        max_size=DB_POOL_CONFIG.get('max_size', 5),
+        idle_timeout=DB_POOL_CONFIG.get('idle_timeout', 300),
+        health_check_interval=DB_POOL_CONFIG.get('health_check_interval', 30),
+        acquire_timeout=DB_POOL_CONFIG.get('acquire_timeout', 30),
+    )
+
+SQL_POOL = _create_pool('SQL_SERVER', get_db_connection)
+OT_DATALAKE_POOL = _create_pool('OT_DATALAKE', get_OT_DataLake_db_connection)
+DATAMART_POOL = _create_pool('DATAMART', get_DataMart_db_connection)
+
+def get_pool_stats():
+    stats = {pool.name: pool.stats() for pool in (SQL_POOL, OT_DATALAKE_POOL, DATAMART_POOL)}
+    if _questdb_engine is not None:
+        stats['QUESTDB'] = _questdb_engine.pool.status()
+    return stats
+
+def _read_result_sets(conn, query, params=None):
+    '''
+    Run a T-SQL batch and return every result set as a DataFrame.
+    The batch is always drained so trailing statements (DROP TABLE #...) run before the connection goes back to the pool.
+    '''
+    cursor = conn.cursor()
+    try:
+        if params is None:
+            cursor.execute(query)
+        else:
+            cursor.execute(query, params)
+        frames = []
+        while True:
+            if cursor.description is not None:
+                columns = [column[0] for column in cursor.description]
+                frames.append(pd.DataFrame.from_records(cursor.fetchall(), columns=columns, coerce_float=True))
+            if not cursor.nextset():
+                break
+    finally:
+        cursor.close()
+    return frames
+
+def _iter_read_sql(pool, query, params=None, chunksize=50000):
+    '''First result set of a query as DataFrames of at most `chunksize` rows, fetched as they are consumed.'''
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if params is None:
+                cursor.execute(query)
+            else:
+                cursor.execute(query, params)
+            columns = [column[0] for column in cursor.description] if cursor.description is not None else []
+            while columns:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                yield pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+            while cursor.nextset():
+                pass
+        finally:
+            cursor.close()
+
+def _read_sql(pool, query, params=None):
+    with pool.connection() as conn:
+        frames = _read_result_sets(conn, query, params)
+    return frames[0] if frames else pd.DataFrame()
+
 # ---- Business Logic ----
 
-# get tool data (min duration only)
-def load_data(limit: int = 1000):
-    if not DEMO_MODE:
-        conn = get_db_connection()
-        query = f'''
+# ---- Tool snapshot SQL (shared by load_data and load_dashboard_snapshot) ----
+# builds #ToolLife, #Session, #WCMachineID, #TL, #ToolInfo, #ToolSummary, #DT and #MacInfo
+TOOL_SNAPSHOT_SQL = '''
         SET NOCOUNT ON
         SET ANSI_WARNINGS OFF
         ;
@@ -103,19 +215,6 @@ def load_data(limit: int = 1000):
         AND TL.IsActiveTool=1
         ORDER BY MACHINEID,SAPCode DESC
 
-        --SELECT TL.ToolNoId,mmTool.ToolID mmToolID,mmTool.ToolingMaker,TN.MachineId,TN.IdentifyNo,TL.StartCounter,TL.CurrentCounter,TL.TotalCounter, 0 IsActiveTool,
-        --TL.StartDate, TL.CompletedDate,TN.ToolPieces,
-        --mmTool.ToolingStation,mmTool.ProductGroup,mmTool.ToolingClass,mmTool.ToolingMainCategory, mmTool.ToolingSubCategory, mmTool.SAPCode,
-        --ISNULL(mmTool.PresetCounter,0)PresetCounter
-        --INTO #ToolLifeHist FROM ToolLifeHistory TL
-        --INNER JOIN (ToolNo TN INNER JOIN mmTool mmTool ON TN.mmToolID=mmTool.ID)
-        --ON TL.ToolNoId=TN.Id
-        --WHERE TL.ToolNoId IN (SELECT ToolNoID FROM #ToolLife)
-        --ORDER BY MACHINEID,SAPCode DESC
-
-        --INSERT INTO #ToolLife SELECT * FROM #ToolLifeHist
-        -- drop table #ToolLife,#ToolLifeHist
-
         ------------------------------------------- Material & Machine Information ------------------------------------
         SELECT Plant, MachineID, Dept, MaterialCode, MaterialDescription, MesCT
         INTO #Session  FROM [SPLOEE].[dbo].[Session]
@@ -128,9 +227,9 @@ def load_data(limit: int = 1000):
         AND DelFlag=0 AND IsActive=1 AND Plant=@Plant
 
         ------------------------------------------- ToolLifeDetails In Group ------------------------------------
-        SELECT MachineID,ToolNoID,ToolingMainCategory,ToolingSubCategory,ToolingStation,SUM(TotalCounter) TotalCounter,PresetCounter,LoadX_Alm,LoadZ_Alm
+        SELECT MachineID,ToolNoID,ToolingMainCategory,ToolingSubCategory,ToolingStation,SUM(TotalCounter) TotalCounter,PresetCounter,StartDate,LoadX_Alm,LoadZ_Alm,mmToolID
         INTO #TL FROM #ToolLife
-        GROUP BY MachineID,ToolNoID,ToolingMainCategory,ToolingSubCategory,ToolingStation,PresetCounter,LoadX_Alm,LoadZ_Alm
+        GROUP BY MachineID,ToolNoID,ToolingMainCategory,ToolingSubCategory,ToolingStation,PresetCounter,StartDate,LoadX_Alm,LoadZ_Alm,mmToolID
         ORDER BY MachineID,ToolingMainCategory,ToolingStation
 
         SELECT #TL.*,(#TL.PresetCounter-#TL.TotalCounter) Balance, 
@@ -156,10 +255,6 @@ def load_data(limit: int = 1000):
         UPDATE #ToolInfo SET Balance=0 WHERE Balance<0
         UPDATE #ToolInfo SET DurationMins=(Balance*MesCT)/60
         ------------------------------------------- ToolLife Summary ------------------------------------
-        DECLARE @RowNum INT=1
-        DECLARE @TotalRow INT
-        SET @TotalRow = (SELECT COUNT(DISTINCT MachineID) from #ToolInfo)
-
         CREATE TABLE #ToolSummary (
         MachineID NVARCHAR(18),
         Location NVARCHAR(10),
@@ -184,15 +279,17 @@ def load_data(limit: int = 1000):
         LoadPeak_Warn_R BIT,
         )
 
-        WHILE @RowNum <= @TotalRow
-        BEGIN
-            INSERT INTO #ToolSummary SELECT TOP 1 MachineID,Location,MaterialCode,MaterialDescription,
-                ToolingStation,TotalCounter,PresetCounter,Balance,DurationMins,0,0,0,0,0,0,0,0,0,0,0,0 
+        -- lowest DurationMins tool per machine, single pass over #ToolInfo
+        ;WITH RankedTool AS (
+            SELECT MachineID,Location,MaterialCode,MaterialDescription,
+                ToolingStation,TotalCounter,PresetCounter,Balance,DurationMins,
+                ROW_NUMBER() OVER (PARTITION BY MachineID ORDER BY DurationMins) AS DurationRank
             FROM #ToolInfo
-            WHERE MachineID NOT IN (SELECT MachineID FROM #ToolSummary)
-            ORDER BY DurationMins
-            SET @RowNum= @RowNum+1
-        END
+        )
+        INSERT INTO #ToolSummary SELECT MachineID,Location,MaterialCode,MaterialDescription,
+            ToolingStation,TotalCounter,PresetCounter,Balance,DurationMins,0,0,0,0,0,0,0,0,0,0,0,0 
+        FROM RankedTool
+        WHERE DurationRank = 1
 
         ------------------------------------------- Technical Request Information ------------------------------------
         DECLARE @ProdnShift INT
@@ -221,33 +318,11 @@ def load_data(limit: int = 1000):
         FROM #ToolSummary
         LEFT OUTER JOIN #DT ON #DT.MacID=#ToolSummary.MachineID
 
-        -- ================================ MATERIAL CODE ========================
-        --SELECT MachineID,MaterialCode INTO #Session
-        --FROM [SPLOEE].[dbo].[Session] Session
-        --WHERE MachineID IN (SELECT MachineID FROM #ToolSummary)
-        --AND SessionStatus='RUNNING'
-
-        --UPDATE #ToolSummary SET
-        -- #ToolSummary.MaterialCode=#Session.MaterialCode,
-        -- #ToolSummary.MaterialDesc=#Session.MaterialDescription
-        --FROM #ToolSummary
-        --LEFT OUTER JOIN #Session ON #Session.MachineID=#ToolSummary.MachineID
-
-        ------------------------------------------- Machine Stop Duration ------------------------------------
-        --SELECT Kep.ID,Kep.ProdnDate,Kep.ProdnShift,Kep.MacID,Kep.RecordType, 
-        --DATEDIFF(MINUTE, (CASE WHEN Kep.RecordType='STOP' THEN Kep.StartTime ELSE GetDate() END), GetDate()) AS MacStopMin
-        --INTO #MacStatus
-        --FROM [SPLOEE].[dbo].[OEEOUTPUTKEP] Kep
-        --JOIN (SELECT MAX(ID) ID, Macid FROM [SPLOEE].[dbo].[OEEOUTPUTKEP] Kep2 
-        --        WHERE Kep2.ProdnDate=@ProdnDate AND Kep2.ProdnShift=@ProdnShift
-        --        Group By Macid) AS Kep2 ON (Kep.ID = Kep2.ID)
-
         ------------------------------------------- Machine Status (LED + Status) ------------------------------------
         ;WITH CTE1 AS (
         SELECT DISTINCT MacInfo.InMacID, MAX(MacInfo.ID) AS MaxID
         FROM [KEPDATALOGGER].[dbo].[LogGetMatInfo] MacInfo
         WHERE MacInfo.InMacID IN (SELECT MachineID FROM #ToolSummary)
-        -- WHERE MacInfo.InMacID IN ('MSNLTH09-29','MSNLTH13-11')
         GROUP BY MacInfo.InMacID)
         SELECT CTE1.*,MacLEDGreen,MacLEDYellow,MacLEDRed,MacStatus,
         LoadPeak_Alm_L,LoadPeak_Warn_L,LoadPeak_Alm_R,LoadPeak_Warn_R 
@@ -268,245 +343,86 @@ def load_data(limit: int = 1000):
         #ToolSummary.LoadPeak_Warn_R=ISNULL(#MacInfo.LoadPeak_Warn_R,0)
         FROM #ToolSummary
         LEFT OUTER JOIN #MacInfo ON #MacInfo.InMacID=#ToolSummary.MachineID
+'''
 
+# machine summary (lowest DurationMins tool per machine)
+TOOL_SUMMARY_SELECT_SQL = '''
         SELECT * FROM #ToolSummary ORDER BY MacLEDRed DESC,MacLEDYellow DESC,TechRequired desc,MacLEDGreen desc,DurationMins
-        -- SELECT * FROM #ToolSummary ORDER BY DurationMins
-        -- SELECT * FROM #ToolInfo ORDER BY DurationMins
-
-        DROP TABLE #TL,#ToolLife,#Session,#WCMachineID,#ToolInfo,#ToolSummary,#DT,#MacInfo,#MacStatus
-        '''
-        df = pd.read_sql(query, conn)
-        conn.close()
-
-    else:
-        data_demo = {'MachineID': ['MSNLTH09-29','MSNLTH13-11'],
-                    'Location': ['FMC9','FMC4'],
-                    'MaterialCode': ['40039550','40061967'],
-                    'MaterialDesc': ['MATERIAL A','MATERIAL B'],
-                    'ToolingStation': [202,101],
-                    'TotalCounter': [164,75],
-                    'PresetCounter': [300,200],
-                    'BalanceCounter': [136,125],
-                    'DurationMins': [10,135],
-                    'TechRequired': [False,False],
-                    'TechRequestMin':0,
-                    'MacLEDGreen': [False,False],
-                    'MacLEDYellow': [False,False],
-                    'MacLEDRed': [False,True],
-                    'MacStatus': [0,0],
-                    'LoadPeak_Alm_L':False,
-                    'LoadPeak_Warn_L':False,
-                    'LoadPeak_Alm_R':False,
-                    'LoadPeak_Warn_R':False,
-                    'MacStopMins':'0',
-                    'MacErrorType':'1'}
-        df = pd.DataFrame(data_demo)
-
-    return df
-
-# get tool data (all)
-def load_data_all():
-    if not DEMO_MODE:
-        conn = get_db_connection()
-        query = f'''
-        SET NOCOUNT ON
-        SET ANSI_WARNINGS OFF
-        ;
-
-        DECLARE @Plant INT=2100
-        ------------------------------------------- ToolCounter ------------------------------------
-        SELECT TL.ToolNoId,mmTool.ToolID mmToolID,mmTool.ToolingMaker,TN.MachineId,TN.IdentifyNo,TL.StartCounter,TL.CurrentCounter,TL.TotalCounter, TL.IsActiveTool,
-        DATEADD(HOUR, 8, TL.StartDate) AS StartDate, GetDate() CompletedDate,TN.ToolPieces,
-        mmTool.ToolingStation,mmTool.ProductGroup,mmTool.ToolingClass,mmTool.ToolingMainCategory, mmTool.ToolingSubCategory, mmTool.SAPCode,
-        ISNULL(mmTool.PresetCounter,0)PresetCounter,
-        mmTool.LoadX_Alm,mmTool.LoadZ_Alm
-        INTO #ToolLife FROM ToolLife TL
-        INNER JOIN (ToolNo TN INNER JOIN mmTool mmTool ON TN.mmToolID=mmTool.ID)
-        ON TL.ToolNoId=TN.Id
-        WHERE TN.MachineID LIKE 'MS%'
-        AND TL.IsActiveTool=1
-        ORDER BY MACHINEID,SAPCode DESC
-
-        --SELECT TL.ToolNoId,mmTool.ToolID mmToolID,mmTool.ToolingMaker,TN.MachineId,TN.IdentifyNo,TL.StartCounter,TL.CurrentCounter,TL.TotalCounter, 0 IsActiveTool,
-        --TL.StartDate, TL.CompletedDate,TN.ToolPieces,
-        --mmTool.ToolingStation,mmTool.ProductGroup,mmTool.ToolingClass,mmTool.ToolingMainCategory, mmTool.ToolingSubCategory, mmTool.SAPCode,
-        --ISNULL(mmTool.PresetCounter,0)PresetCounter
-        --INTO #ToolLifeHist FROM ToolLifeHistory TL
-        --INNER JOIN (ToolNo TN INNER JOIN mmTool mmTool ON TN.mmToolID=mmTool.ID)
-        --ON TL.ToolNoId=TN.Id
-        --WHERE TL.ToolNoId IN (SELECT ToolNoID FROM #ToolLife)
-        --ORDER BY MACHINEID,SAPCode DESC
-
-        --INSERT INTO #ToolLife SELECT * FROM #ToolLifeHist
-        -- drop table #ToolLife,#ToolLifeHist
-
-        ------------------------------------------- Material & Machine Information ------------------------------------
-        SELECT Plant, MachineID, Dept, MaterialCode, MaterialDescription, MesCT
-        INTO #Session  FROM [SPLOEE].[dbo].[Session]
-        WHERE MachineID IN (SELECT DISTINCT MachineID FROM #ToolLife)
-        AND SessionStatus='RUNNING' AND Plant=@Plant
-
-        SELECT Plant,Dept,MachineID,MachineNo Location
-        INTO #WCMachineID FROM [MDM].[dbo].[WorkCenterMachineID]
-        WHERE MachineID IN (SELECT DISTINCT MachineID FROM #ToolLife)
-        AND DelFlag=0 AND IsActive=1 AND Plant=@Plant
-
-        ------------------------------------------- ToolLifeDetails In Group ------------------------------------
-        SELECT MachineID,ToolNoID,ToolingMainCategory,ToolingSubCategory,ToolingStation,SUM(TotalCounter) TotalCounter,PresetCounter,StartDate,LoadX_Alm,LoadZ_Alm,mmToolID
-        INTO #TL FROM #ToolLife
-        GROUP BY MachineID,ToolNoID,ToolingMainCategory,ToolingSubCategory,ToolingStation,PresetCounter,StartDate,LoadX_Alm,LoadZ_Alm,mmToolID
-        ORDER BY MachineID,ToolingMainCategory,ToolingStation
-
-        SELECT #TL.*,(#TL.PresetCounter-#TL.TotalCounter) Balance, 
-        #Session.MesCT,#Session.MaterialCode,#Session.MaterialDescription,
-        #WCMachineID.Location,0 DurationMins
-        INTO #ToolInfo FROM #TL
-        LEFT OUTER JOIN #Session ON #TL.MachineID=#Session.MachineID
-        LEFT OUTER JOIN #WCMachineID ON #TL.MachineID=#WCMachineID.MachineID
-
-        ------------------------------------------- Revise ToolCounter (Muratec Data) 27/06/25 ------------------------------------
-        UPDATE TI 
-        SET 
-            TI.PresetCounter = TC.ToolSetPoint,
-            TI.Balance = TC.ToolBalance,
-            TI.TotalCounter = TC.ToolQty
-        FROM 
-            #ToolInfo TI 
-        INNER JOIN ToolCount TC ON 
-            TI.MachineID = TC.MacID
-            AND TI.ToolingMainCategory = TC.MainCategory
-            AND TI.ToolingStation = TC.ToolStation
-
-        UPDATE #ToolInfo SET Balance=0 WHERE Balance<0
-        UPDATE #ToolInfo SET DurationMins=(Balance*MesCT)/60
-        ------------------------------------------- ToolLife Summary ------------------------------------
-        DECLARE @RowNum INT=1
-        DECLARE @TotalRow INT
-        SET @TotalRow = (SELECT COUNT(DISTINCT MachineID) from #ToolInfo)
-
-        CREATE TABLE #ToolSummary (
-        MachineID NVARCHAR(18),
-        Location NVARCHAR(10),
-        MaterialCode NVARCHAR(40),
-        MaterialDesc NVARCHAR(40),
-        ToolingStation INT,
-        TotalCounter INT,
-        PresetCounter INT,
-        BalanceCounter INT,
-        DurationMins INT,
-        TechRequired BIT,
-        TechRequestMin INT,
-        MacLEDGreen BIT,
-        MacLEDYellow BIT,
-        MacLEDRed BIT,
-        MacStatus INT,
-        LoadPeak_Alm_L BIT,
-        LoadPeak_Warn_L BIT,
-        LoadPeak_Alm_R BIT,
-        LoadPeak_Warn_R BIT,
-        )
-
-        WHILE @RowNum <= @TotalRow
-        BEGIN
-            INSERT INTO #ToolSummary SELECT TOP 1 MachineID,Location,MaterialCode,MaterialDescription,
-                ToolingStation,TotalCounter,PresetCounter,Balance,DurationMins,0,0,0,0,0,0,0,0,0,0 
-            FROM #ToolInfo
-            WHERE MachineID NOT IN (SELECT MachineID FROM #ToolSummary)
-            ORDER BY DurationMins
-            SET @RowNum= @RowNum+1
-        END
-
-        ------------------------------------------- Technical Request Information ------------------------------------
-        DECLARE @ProdnShift INT
-        DECLARE @PrevDay INT
-        DECLARE @ProdnDate AS DATE
-
-        SELECT TOP 1 @ProdnShift=Shift,@PrevDay=CAST(PreviousDay AS INT) FROM mdm.dbo.TSHIFT
-        WHERE Plant=@Plant AND ISNULL(DelFlag,0)=0 AND CAST(getdate() AS TIME)
-        BETWEEN StartTime AND EndTime
-        SET @ProdnDate = DATEADD(d,-@PrevDay,CAST(getdate() AS DATE))
-
-        SELECT DT.ID,Kep.MacID,DT.TechRequired,
-        DATEDIFF(MINUTE, (CASE WHEN UpdateDate IS NULL THEN CreatedDate ELSE UpdateDate END), GetDate()) AS TechRequestMin
-        INTO #DT FROM [SPLOEE].[dbo].[OEEDownTime] DT
-        LEFT OUTER JOIN [SPLOEE].[dbo].[OEEOUTPUTKEP] Kep ON DT.ID=Kep.ID
-        WHERE Kep.ProdnDate=@ProdnDate AND Kep.ProdnShift=@ProdnShift
-        AND DT.TechRequired=1
-        AND Kep.MacID IN (SELECT MachineID FROM #ToolSummary)
-        ORDER BY MacID DESC
-
-        UPDATE #ToolSummary
-        SET #ToolSummary.TechRequired=ISNULL(#DT.TechRequired,0),
-            #ToolSummary.TechRequestMin=ISNULL(#DT.TechRequestMin,0)
-        FROM #ToolSummary
-        LEFT OUTER JOIN #DT ON #DT.MacID=#ToolSummary.MachineID
-
-
-        -- ================================ MATERIAL CODE ========================
-        --SELECT MachineID,MaterialCode INTO #Session
-        --FROM [SPLOEE].[dbo].[Session] Session
-        --WHERE MachineID IN (SELECT MachineID FROM #ToolSummary)
-        --AND SessionStatus='RUNNING'
-
-        --UPDATE #ToolSummary SET
-        --	#ToolSummary.MaterialCode=#Session.MaterialCode,
-        --	#ToolSummary.MaterialDesc=#Session.MaterialDescription
-        --FROM #ToolSummary
-        --LEFT OUTER JOIN #Session ON #Session.MachineID=#ToolSummary.MachineID
-
-        ------------------------------------------- Machine Status (LED + Status) ------------------------------------
-        ;WITH CTE1 AS (
-        SELECT DISTINCT MacInfo.InMacID, MAX(MacInfo.ID) AS MaxID
-        FROM [KEPDATALOGGER].[dbo].[LogGetMatInfo] MacInfo
-        WHERE MacInfo.InMacID IN (SELECT MachineID FROM #ToolSummary)
-        -- WHERE MacInfo.InMacID IN ('MSNLTH09-29','MSNLTH13-11')
-        GROUP BY MacInfo.InMacID)
-        SELECT CTE1.*,MacLEDGreen,MacLEDYellow,MacLEDRed,MacStatus,
-        LoadPeak_Alm_L,LoadPeak_Warn_L,LoadPeak_Alm_R,LoadPeak_Warn_R 
-        INTO #MacInfo FROM CTE1
-        LEFT JOIN (SELECT ID, InMacID,MacLEDGreen,MacLEDYellow,MacLEDRed,MacStatus,
-                          LoadPeak_Alm_L,LoadPeak_Warn_L,LoadPeak_Alm_R,LoadPeak_Warn_R 
-                   FROM [KEPDATALOGGER].[dbo].[LogGetMatInfo]) AS R1
-        ON R1.InMacID = CTE1.InMacID and R1.ID = CTE1.MaxID;
-
-        UPDATE #ToolSummary SET
-        #ToolSummary.MacLEDGreen=ISNULL(#MacInfo.MacLEDGreen,0),
-        #ToolSummary.MacLEDYellow=ISNULL(#MacInfo.MacLEDYellow,0),
-        #ToolSummary.MacLEDRed=ISNULL(#MacInfo.MacLEDRed,0),
-        #ToolSummary.MacStatus=ISNULL(#MacInfo.MacStatus,0),
-        #ToolSummary.LoadPeak_Alm_L=ISNULL(#MacInfo.LoadPeak_Alm_L,0),
-        #ToolSummary.LoadPeak_Warn_L=ISNULL(#MacInfo.LoadPeak_Warn_L,0),
-        #ToolSummary.LoadPeak_Alm_R=ISNULL(#MacInfo.LoadPeak_Alm_R,0),
-        #ToolSummary.LoadPeak_Warn_R=ISNULL(#MacInfo.LoadPeak_Warn_R,0)
-        FROM #ToolSummary
-        LEFT OUTER JOIN #MacInfo ON #MacInfo.InMacID=#ToolSummary.MachineID
-
+'''
 
+# per-tool detail
+TOOL_DETAIL_SELECT_SQL = '''
         SELECT
         Location, ToolingMainCategory AS [Turret], ToolingStation AS [Tool], ToolingSubCategory AS [Process], DurationMins AS [Balance (mins)], Balance AS [Balance (pcs)], MachineID, ToolNoID,StartDate,TotalCounter,PresetCounter,LoadX_Alm,LoadZ_Alm,mmToolID
         FROM #ToolInfo
         ORDER BY Location, DurationMins
+'''
 
+TOOL_SNAPSHOT_CLEANUP_SQL = '''
         DROP TABLE #TL,#ToolLife,#Session,#WCMachineID,#ToolInfo,#ToolSummary,#DT,#MacInfo
-        --DROP TABLE #DT,#MacInfo
-        '''
-        df = pd.read_sql(query, conn)
-        conn.close()
+'''
+
+def _demo_tool_data():
+    data_demo = {'MachineID': ['MSNLTH09-29','MSNLTH13-11'],
+                'Location': ['FMC9','FMC4'],
+                'MaterialCode': ['40039550','40061967'],
+                'MaterialDesc': ['MATERIAL A','MATERIAL B'],
+                'ToolingStation': [202,101],
+                'TotalCounter': [164,75],
+                'PresetCounter': [300,200],
+                'BalanceCounter': [136,125],
+                'DurationMins': [10,135],
+                'TechRequired': [False,False],
+                'TechRequestMin':0,
+                'MacLEDGreen': [False,False],
+                'MacLEDYellow': [False,False],
+                'MacLEDRed': [False,True],
+                'MacStatus': [0,0],
+                'LoadPeak_Alm_L':False,
+                'LoadPeak_Warn_L':False,
+                'LoadPeak_Alm_R':False,
+                'LoadPeak_Warn_R':False,
+                'MacStopMins':'0',
+                'MacErrorType':'1'}
+    return pd.DataFrame(data_demo)
+
+def _demo_tool_data_all():
+    data_demo = {'Location': ['FMC9','FMC9','FMC9'],
+                'Turret': ['RIGHT','RIGHT','RIGHT'],
+                'Tool': ['202','101','505'],
+                'Process': ['OP10 OD FINISH','OP10 OD ROUGH','OP10 ID FINISH'],
+                'Balance (mins)': ['12','12','13'],
+                'Balance (pcs)': ['15','15','17']}
+    return pd.DataFrame(data_demo)
+
+# get tool data (min duration only)
+@single_flight
+def load_data(limit: int = 1000):
+    if not DEMO_MODE:
+        query = TOOL_SNAPSHOT_SQL + TOOL_SUMMARY_SELECT_SQL + TOOL_SNAPSHOT_CLEANUP_SQL
+        df = _read_sql(SQL_POOL, query)
 
     else:
-        data_demo = {'Location': ['FMC9','FMC9','FMC9'],
-                    'Turret': ['RIGHT','RIGHT','RIGHT'],
-                    'Tool': ['202','101','505'],
-                    'Process': ['OP10 OD FINISH','OP10 OD ROUGH','OP10 ID FINISH'],
-                    'Balance (mins)': ['12','12','13'],
-                    'Balance (pcs)': ['15','15','17']}
-        df = pd.DataFrame(data_demo)
+        df = _demo_tool_data()
 
     return df
 
+# get tool data (summary + all) in one batch: temp tables are built once and both result sets come back on the same connection
+@single_flight
+def load_dashboard_snapshot():
+    if not DEMO_MODE:
+        query = TOOL_SNAPSHOT_SQL + TOOL_SUMMARY_SELECT_SQL + TOOL_DETAIL_SELECT_SQL + TOOL_SNAPSHOT_CLEANUP_SQL
+        with SQL_POOL.connection() as conn:
+            df_tool_data, df_tool_data_all = _read_result_sets(conn, query)
+
+    else:
+        df_tool_data = _demo_tool_data()
+        df_tool_data_all = _demo_tool_data_all()
+
+    return df_tool_data, df_tool_data_all
+
 # get CTQ SpecNo
 def get_CTQ_SpecNo(sapcode):
-    conn = get_db_connection()
     query = f'''
     SET NOCOUNT ON
     SET ANSI_WARNINGS OFF
@@ -520,13 +436,11 @@ def get_CTQ_SpecNo(sapcode):
     WHERE 1=1
     AND [ControlPlanId] IN (SELECT [ControlPlanId] FROM [QMM].[dbo].[SPCcontrolPlanGenInfo] WHERE SAPCode = @SAPCODE AND IsActive = 1  AND DEPARTMENT != 'VEND') and CAT in (2,3) AND SPECTYPE NOT IN (4, 6) AND (IsPassFailGDT != 1 OR IsPassFailGDT IS NULL)
     '''
-    df = pd.read_sql(query, conn)
-    conn.close()
+    df = _read_sql(SQL_POOL, query)
     return df
 
 # get inspection data
 def get_inspection_data(sapcode, specno):
-    conn = get_db_connection()
     query = f'''
     SET NOCOUNT ON
     SET ANSI_WARNINGS OFF
@@ -602,13 +516,132 @@ def get_inspection_data(sapcode, specno):
     
 	OPTION(RECOMPILE);
     '''
-    df = pd.read_sql(query, conn)
-    conn.close()
+    df = _read_sql(SQL_POOL, query)
+    return df
+
+# get inspection data for every CTQ/CTP spec of a material (latest 30 measurements per CharId) in one query
+# since: {CharId: watermark}, only return measurements with MeasDate > the CharId's watermark (incremental fetch),
+# CharIds without a watermark get their whole window
+@single_flight
+def get_inspection_data_bulk(sapcode, since=None, window=30):
+    # window: latest measurements per CharId, keep equal to the backend job's backend_job.ppk_window
+    since = dict(since or {})
+    if len(since) > 1000:
+        since = {}  # 2 parameters per CharId, SQL Server takes at most 2100: fetch whole windows (PpkStateStore.apply skips the known rows)
+    since_join, since_filter = '', ''
+    if since:
+        since_join = f"LEFT JOIN (VALUES {', '.join(['(?, ?)'] * len(since))}) AS S (CharId, LastMeasDate) ON S.CharId = A.CharId"
+        since_filter = 'AND (S.LastMeasDate IS NULL OR A.[MeasDate] > S.LastMeasDate)'
+    query = f'''
+    SET NOCOUNT ON
+    SET ANSI_WARNINGS OFF
+    ;
+
+    DECLARE @SAPCODE AS NVARCHAR(100) = ?
+    DECLARE @WINDOW AS INT = ?
+
+    ;WITH cte_MinMaxofSpec_temp AS (
+                SELECT
+                a.[charid]
+                ,a.[BalloonNo]
+                ,a.[Description]
+                ,a.[UppTol]
+                ,a.[LowTol]
+                ,a.TolSymbol
+                ,a.SpecType
+                ,CASE   WHEN [Spectype] ='4' THEN 'AC'
+                        WHEN [Spectype] ='5' AND IsPassFailGDT = 1 THEN 'AC'
+                        WHEN [Spectype] ='6' THEN NULL
+                        ELSE a.[maxval]
+                END AS [USL]
+                ,CASE   WHEN [Spectype] ='3' AND a.[maxval] not in ('99999') THEN '-99999' -- LSL change to -99999 instead of 0
+                        WHEN [Spectype] ='4' THEN 'NC'
+                        WHEN [Spectype] ='5' AND IsPassFailGDT = 1 THEN 'NC'
+                        WHEN [Spectype] ='6' THEN NULL
+                        ELSE A.[minval]
+                END AS [LSL]
+                ,a.[CAT]
+                ,a.NomVal
+                FROM [QMM].[dbo].[SPCControlPlan] AS a
+                WHERE 1=1
+                AND [ControlPlanId] IN (SELECT [ControlPlanId] FROM [QMM].[dbo].[SPCcontrolPlanGenInfo] WHERE SAPCode = @SAPCODE AND IsActive = 1  AND DEPARTMENT != 'VEND')
+                AND CAT in (2,3) AND SPECTYPE NOT IN (4, 6) AND (IsPassFailGDT != 1 OR IsPassFailGDT IS NULL) -- same spec filter as get_CTQ_SpecNo
+    ),
+    
+    CTE_BALLOON AS (
+            SELECT
+            [CharId]
+            ,[LSL]
+            ,[USL]
+            ,[NomVal]
+            , [BalloonNo]
+            , [CAT]
+            , CASE WHEN [TolSymbol] = '1' THEN CONCAT( REPLACE([Description],'*',''),' ',NomVal,' ± ',[UppTol])
+                WHEN [TolSymbol] = '2' THEN CONCAT( REPLACE([Description],'*',''),' ',NomVal,' +',[UppTol], ' / +',[LowTol])
+                WHEN [TolSymbol] = '3' THEN CONCAT( REPLACE([Description],'*',''),' ',NomVal,' +',[UppTol], ' / ',[LowTol])
+                WHEN [TolSymbol] = '4' THEN CONCAT( REPLACE([Description],'*',''),' ',NomVal,' ',[UppTol], ' / ',[LowTol])
+                WHEN [TolSymbol] = '5' THEN CONCAT( REPLACE([Description],'*',''),N' ≥ ',[LowTol])
+                WHEN [TolSymbol] = '7' THEN CONCAT( REPLACE([Description],'*',''),' > ',[LowTol])
+                WHEN [TolSymbol] = '6' THEN CONCAT( REPLACE([Description],'*',''),N' ≤ ',[UppTol])
+                WHEN [TolSymbol] = '8' THEN CONCAT( REPLACE([Description],'*',''),' < ',[UppTol])
+                WHEN SpecType = '4' THEN REPLACE([Description],'*','') --PASS FAIL
+                WHEN SpecType = '5' THEN CONCAT( REPLACE([Description],'*',''),' < ',[UppTol]) --GDT
+                WHEN SpecType = '6' THEN REPLACE([Description],'*','') --REMARK SPEC
+                ELSE CONCAT( REPLACE([Description],'*',''),' ',LSL,'~',USL) END AS [Description]
+        FROM cte_MinMaxofSpec_temp
+    ),
+
+    CTE_LATEST AS (
+            SELECT A.[MeasDate], TRY_CAST(A.[MeasVal] AS NUMERIC(26,4)) AS MeasVal, C.LSL, C.USL,c.[Description],c.CharId, c.BalloonNo, c.CAT,
+            ROW_NUMBER() OVER (PARTITION BY A.[CharId] ORDER BY A.[MeasDate] DESC) AS MeasRank
+            FROM [QMM].[dbo].[InspResult] AS A
+
+            INNER JOIN [QMM].[dbo].[InspMainInfo] AS B
+            ON A.InspId = B.[InspId]
+            join CTE_BALLOON C on C.CharId = A.CharId
+            {since_join}
+
+            WHERE 1=1
+            AND B.FormType = 'PROD'
+            {since_filter}
+    )
+
+    SELECT [MeasDate], MeasVal, LSL, USL, [Description], CharId, BalloonNo, CAT
+    FROM CTE_LATEST
+    WHERE MeasRank <= @WINDOW --get latest @WINDOW inspection data per CharId
+    ORDER BY BalloonNo, CharId, [MeasDate] DESC
+    '''
+    params = (str(sapcode), int(window), *(value for charid_since in since.items() for value in charid_since))
+    df = _read_sql(SQL_POOL, query, params)
     return df
 
+# ---- OT_DataLake tag names ----
+def get_OT_tag_pattern(MachineName, Position, ToolingStation):
+    return f"%{MachineName}%TOOL_%{'L' if Position.upper() == 'LEFT' else 'R'}_T{str(ToolingStation)}%".replace("-","_")
+
+def get_OT_tag_filter(MachineName, Position, ToolingStation):
+    '''
+    NAME filter for OT_MS and its parameters: NAME IN (exact names from the local tag dictionary, see ot_tags.py)
+    plus the leading-wildcard LIKE restricted to rows after the dictionary's coverage (tags added or renamed
+    since its last refresh). Only the LIKE when the dictionary is disabled, not built yet or doesn't know the tool.
+    '''
+    QueryMachineName = get_OT_tag_pattern(MachineName, Position, ToolingStation)
+    likeFilter = "NAME LIKE ?\n                    AND NAME LIKE '%_bal%'"
+    if config.get('ot_tags', {}).get('enabled', True):
+        try:
+            from ot_tags import get_ot_tag_dictionary
+            tagNames, coveredUntil = get_ot_tag_dictionary().resolve(QueryMachineName)
+        except Exception:
+            logger.exception("OT tag dictionary unavailable, using LIKE")
+            tagNames, coveredUntil = [], None
+        if tagNames:
+            nameFilter = f"(NAME IN ({', '.join('?' * len(tagNames))})\n                    OR ({likeFilter} AND [TIMESTAMP] > ?))"
+            return nameFilter, (*tagNames, QueryMachineName, coveredUntil.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3])
+    return likeFilter, (QueryMachineName,)
+
 def get_OT_Datalake_data(MachineName, Position, ToolingStation,StartDate):
-    conn = get_OT_DataLake_db_connection()
-    query = """
+    nameFilter, nameParams = get_OT_tag_filter(MachineName, Position, ToolingStation)
+    query = f"""
             SELECT *
                 FROM (
                     SELECT *,? ToolingStation,
@@ -616,8 +649,7 @@ def get_OT_Datalake_data(MachineName, Position, ToolingStation,StartDate):
                     PARTITION BY Value ORDER BY TIMESTAMP DESC
                     ) AS Duplicate
                     FROM [OT_DataLake].[dbo].[OT_MS]
-                    WHERE NAME LIKE ?
-                    AND NAME LIKE '%_bal%'
+                    WHERE {nameFilter}
                     AND [TIMESTAMP] > ?
             --AND [TIMESTAMP] <=CAST(GETDATE() AS DATE)
             ) D
@@ -626,17 +658,17 @@ def get_OT_Datalake_data(MachineName, Position, ToolingStation,StartDate):
             """
 
 
-    QueryMachineName = f"%{MachineName}%TOOL_%{'L' if Position.upper() == 'LEFT' else 'R'}_T{str(ToolingStation)}%".replace("-","_")
-
     StartDate = StartDate.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-    params = (ToolingStation,QueryMachineName, StartDate)
-    cursor = conn.cursor()
-    df = pd.read_sql(query, conn,params=params)
+    params = (ToolingStation, *nameParams, StartDate)
+    df = _read_sql(OT_DATALAKE_POOL, query, params)
     return df
 
-def get_OT_Datalake_data_history(MachineName, Position, ToolingStation,StartDate,EndDate):
-    conn = get_OT_DataLake_db_connection()
-    query = """
+# OT_MS columns used by merge_OT_DataLake_Questdb (history)
+OT_MERGE_COLUMNS = ['TIMESTAMP', 'VALUE', 'ToolingStation', 'Duplicate']
+
+def get_OT_Datalake_data_history(MachineName, Position, ToolingStation,StartDate,EndDate,chunksize=None):
+    nameFilter, nameParams = get_OT_tag_filter(MachineName, Position, ToolingStation)
+    query = f"""
             SELECT *
                 FROM (
                     SELECT *,? ToolingStation,
@@ -644,103 +676,398 @@ def get_OT_Datalake_data_history(MachineName, Position, ToolingStation,StartDate
                     PARTITION BY Value ORDER BY TIMESTAMP DESC
                     ) AS Duplicate
                     FROM [OT_DataLake].[dbo].[OT_MS]
-                    WHERE NAME LIKE ?
-                    AND NAME LIKE '%_bal%'
+                    WHERE {nameFilter}
                     AND [TIMESTAMP] > ?
                     AND [TIMESTAMP] <= ?
             ) D
             WHERE Duplicate = 1
-            ORDER BY [TIMESTAMP] DESC
+            ORDER BY [TIMESTAMP] -- ascending: merge_asof input, no client-side sort
             """
 
 
-    QueryMachineName = f"%{MachineName}%TOOL_%{'L' if Position.upper() == 'LEFT' else 'R'}_T{str(ToolingStation)}%".replace("-","_")
     StartDate = StartDate.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
     EndDate = EndDate.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-    params = (ToolingStation,QueryMachineName, StartDate, EndDate)
-    cursor = conn.cursor()
-    df = pd.read_sql(query, conn,params=params)
+    params = (ToolingStation, *nameParams, StartDate, EndDate)
+    if chunksize:
+        # streamed, only the columns the history merge uses are kept
+        chunks = [chunk[OT_MERGE_COLUMNS] for chunk in _iter_read_sql(OT_DATALAKE_POOL, query, params, chunksize)]
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=OT_MERGE_COLUMNS)
+    df = _read_sql(OT_DATALAKE_POOL, query, params)
     return df
 
 
-def get_questdb_data(Position,StartDate, ToolingStation, MacID):
+# ---- MuratecStsLog column sets ----
+# each view selects only its columns with explicit dtypes instead of SELECT *,
+# new MuratecStsLog columns don't reach the dashboard until a view asks for them
+# columns aggregated per piece made (see helper.GroupDfByPiecesMade)
+LOAD_COLUMNS = ['FeedRate', 'SpdlSpd_RPM', 'SpdlSpd_RPM_SP', 'Load_X', 'Load_Z', 'Load_Spdl']
+
+def get_piece_column(ToolingStation):
+    # per-station piece counter in MuratecStsLog, e.g. T02_Bal
+    return f'T{int(ToolingStation):02}_Bal'
+
+def get_offset_columns(ToolingStation, Axis=None):
+    axes = ['X', 'Z'] if Axis is None else [Axis.upper()]
+    return [f'Offset{axis}_{int(ToolingStation):02}' for axis in axes]
+
+def get_muratec_columns(view, ToolingStation, Axis=None):
+    '''{column: dtype} selected by a view: 'load' (tool load charts), 'sampled' (SAMPLE BY buckets) or 'offset' (offset history).'''
+    pieceColumn = get_piece_column(ToolingStation)
+    if view == 'load':
+        columns = {'Timestamp': 'datetime64[ns]', 'MacID': 'category', 'Turret': 'category', 'ToolNo': 'Int16', 'SeqNo': 'Int16', pieceColumn: 'Int32'}
+        columns.update({column: 'float32' for column in LOAD_COLUMNS})
+    elif view == 'sampled':
+        columns = {'Timestamp': 'datetime64[ns]', 'ToolNo': 'Int16', pieceColumn: 'Int32', 'SeqNo': 'Int16', 'Samples': 'int32'}
+        for column in LOAD_COLUMNS:
+            columns.update({f'{column}_max': 'float32', f'{column}_mean': 'float32', f'{column}_count': 'int32'})
+    elif view == 'offset':
+        # offsets stay float64: the chart plots changes of a few 1/10000 mm
+        columns = {'Timestamp': 'datetime64[ns]', pieceColumn: 'Int32'}
+        columns.update({column: 'float64' for column in get_offset_columns(ToolingStation, Axis)})
+    else:
+        raise ValueError(f"Unknown MuratecStsLog view: {view}")
+    return columns
+
+def _read_questdb(query, params, dtypes=None):
+    '''Run a QuestDB query (PG wire or HTTP CSV export, questdb.transport) and apply the view's dtypes.'''
+    if QUESTDB_CONFIG.get('transport', 'pg') == 'http':
+        return _read_questdb_http(query, params, dtypes)
     engine = get_Questdb_connection()
-    QuestDbQuery="""
-        SELECT * 
+    with engine.connect() as conn:
+        df = pd.read_sql(text(query), conn, params=params)
+    return _apply_questdb_dtypes(df, dtypes)
+
+def _apply_questdb_dtypes(df, dtypes):
+    for column, dtype in (dtypes or {}).items():
+        if column not in df.columns:
+            continue
+        if dtype.startswith('datetime'):
+            if not pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = pd.to_datetime(df[column], format='ISO8601')
+            if df[column].dt.tz is not None:
+                df[column] = df[column].dt.tz_convert(None) # /exp returns UTC 'Z' timestamps, PG wire naive UTC
+        elif df[column].dtype != dtype:
+            df[column] = df[column].astype(dtype)
+    return df
+
+# ---- QuestDB bulk export (HTTP /exp) ----
+# QuestDB's PG wire has no COPY ... TO STDOUT. /exp streams the result as CSV which is parsed column-wise
+# (pyarrow when installed, else pandas' C parser) instead of building a Python object per value as read_sql does.
+try:
+    import pyarrow # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+def get_Questdb_http_url():
+    url = QUESTDB_CONFIG.get('http_url')
+    if url:
+        return url.rstrip('/')
+    return f"http://{os.getenv('QuestDB_Host')}:{os.getenv('QuestDB_HTTP_Port', '9000')}"
+
+def get_Questdb_http_headers():
+    '''HTTP Basic auth from the same QuestDB_Username / QuestDB_Password as the PG wire engine (none when unset).'''
+    Qusername = os.getenv("QuestDB_Username")
+    Qpassword = os.getenv("QuestDB_Password")
+    if not Qusername:
+        return {}
+    credentials = base64.b64encode(f"{Qusername}:{Qpassword or ''}".encode()).decode()
+    return {'Authorization': f'Basic {credentials}'}
+
+def render_questdb_query(query, params):
+    '''Inline the :name parameters as SQL literals (/exp takes no bind parameters), quoted by SQLAlchemy.'''
+    from sqlalchemy.dialects import postgresql
+    statement = text(query).bindparams(**params) if params else text(query)
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+
+def _read_questdb_http(query, params, dtypes=None):
+    url = f"{get_Questdb_http_url()}/exp?{urlencode({'query': render_questdb_query(query, params)})}"
+    # parse floats straight to their dtype, the rest is cast afterwards (cheap on whole columns)
+    csvDtypes = {column: dtype for column, dtype in (dtypes or {}).items() if dtype.startswith('float')}
+    try:
+        with urlopen(Request(url, headers=get_Questdb_http_headers()), timeout=QUESTDB_CONFIG.get('http_timeout', 120)) as response:
+            df = pd.read_csv(response, dtype=csvDtypes, engine=CSV_ENGINE)
+    except HTTPError as e:
+        raise RuntimeError(f"QuestDB export failed ({e.code}): {e.read().decode('utf-8', 'replace')}") from e
+    return _apply_questdb_dtypes(df, dtypes)
+
+def get_questdb_data(Position,StartDate, ToolingStation, MacID):
+    columns = get_muratec_columns('load', ToolingStation)
+    QuestDbQuery=f"""
+        SELECT {', '.join(columns)}
             FROM MuratecStsLog
             WHERE timestamp > :StartDate 
             and ToolNo = :ToolingStation
             and MacID = :MacID
             and Turret = :Turret
-            and Run = 3"""
+            and Run = 3
+            ORDER BY timestamp"""
     StartDate = StartDate.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
     params = {"StartDate": StartDate, "ToolingStation": int(str(ToolingStation)[0]), "MacID": MacID, "Turret": Position}
-    with engine.connect() as conn:
-        df = pd.read_sql(text(QuestDbQuery), conn, params=params)
-    return df
+    return _read_questdb(QuestDbQuery, params, columns)
 
 def get_questdb_data_history(Position,StartDate,EndDate, ToolingStation, MacID):
-    engine = get_Questdb_connection()
-    QuestDbQuery="""
-        SELECT * 
+    columns = get_muratec_columns('load', ToolingStation)
+    QuestDbQuery=f"""
+        SELECT {', '.join(columns)}
         FROM MuratecStsLog
         WHERE timestamp > :StartDate 
         and timestamp < :EndDate
         and ToolNo = :ToolingStation
         and MacID = :MacID
         and Turret = :Turret
-        and Run = 3"""
+        and Run = 3
+        ORDER BY timestamp"""
     StartDate = StartDate.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
     EndDate = EndDate.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
     params = {"StartDate": StartDate, "EndDate": EndDate, "ToolingStation": int(str(ToolingStation)[0]), "MacID": MacID, "Turret": Position}
-    with engine.connect() as conn:
-        df = pd.read_sql(text(QuestDbQuery), conn, params=params)
-    return df
+    return _read_questdb(QuestDbQuery, params, columns)
 
-def merge_OT_DataLake_Questdb(MachineName, Position, ToolingStation,StartDate, AlarmColumn,AlarmFilter,historyFlag=False,EndDate=None):
+# ---- Downsampled MuratecStsLog (QuestDB SAMPLE BY) ----
+SAMPLE_BY_PATTERN = re.compile(r'^\d+[UTsmhdMy]$')
+
+def get_questdb_data_sampled(Position, StartDate, ToolingStation, MacID, EndDate=None, AlarmColumn=None, AlarmFilter=None, resolution=None):
+    '''
+    MuratecStsLog downsampled in QuestDB: one row per (time bucket, piece, SeqNo) with
+    {column}_max, {column}_mean, {column}_count (non-NULL samples) for every LOAD_COLUMNS column and the bucket's sample count (Samples).
+    The alarm filter (AlarmColumn <= AlarmFilter*1.1 and > 0) is applied to the raw samples before aggregation.
+    '''
+    resolution = resolution or QUESTDB_CONFIG.get('sample_by', '1s')
+    if not SAMPLE_BY_PATTERN.match(resolution):
+        raise ValueError(f"Invalid SAMPLE BY resolution: {resolution}")
+    if AlarmColumn is not None and AlarmColumn not in LOAD_COLUMNS:
+        raise ValueError(f"Invalid alarm column: {AlarmColumn}")
+
+    aggregates = ', '.join(f'max({column}) {column}_max, avg({column}) {column}_mean, count({column}) {column}_count' for column in LOAD_COLUMNS)
+    filters = ''
+    params = {"StartDate": StartDate.strftime('%Y-%m-%dT%H:%M:%S.%fZ'), "ToolingStation": int(str(ToolingStation)[0]), "MacID": MacID, "Turret": Position}
+    if EndDate is not None:
+        filters += ' and timestamp < :EndDate'
+        params["EndDate"] = EndDate.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    if AlarmColumn is not None:
+        filters += f' and {AlarmColumn} <= :AlarmFilter and {AlarmColumn} > 0'
+        params["AlarmFilter"] = float(AlarmFilter) * 1.1 # add 10% buffer to alarm filter
+
+    QuestDbQuery=f"""
+        SELECT Timestamp, ToolNo, {get_piece_column(ToolingStation)}, SeqNo, count() Samples, {aggregates}
+            FROM MuratecStsLog
+            WHERE timestamp > :StartDate{filters}
+            and ToolNo = :ToolingStation
+            and MacID = :MacID
+            and Turret = :Turret
+            and Run = 3
+            SAMPLE BY {resolution} ALIGN TO CALENDAR"""
+    return _read_questdb(QuestDbQuery, params, get_muratec_columns('sampled', ToolingStation))
+
+def aggregate_sampled_by_piece(df, keys, extraColumns=()):
+    '''
+    Re-aggregate per-piece rows or downsampled buckets per piece made: max of the maxima and each
+    {column}_mean weighted by its own {column}_count (avg ignores NULLs, Samples counts them).
+    Exact when every input row belongs to a single piece (per-piece aggregates, chunks of them).
+    On the history path a SAMPLE BY bucket that straddles a piece counter change is credited wholly
+    to one piece, so the values are approximate to within the sample_by resolution.
+    '''
+    grouped = df.groupby(keys)
+    counts = grouped[[f'{column}_count' for column in LOAD_COLUMNS]].sum()
+    weighted = pd.DataFrame({column: df[f'{column}_mean'].astype('float64').fillna(0) * df[f'{column}_count'] for column in LOAD_COLUMNS})
+    weighted[keys] = df[keys]
+    sums = weighted.groupby(keys).sum()
+    aggregates = grouped[[f'{column}_max' for column in LOAD_COLUMNS]].max()
+    for column in LOAD_COLUMNS:
+        # a piece without a single non-NULL sample keeps a NULL mean, like avg()
+        aggregates[f'{column}_mean'] = sums[column] / counts[f'{column}_count'].where(counts[f'{column}_count'] > 0)
+    aggregates = aggregates.join(counts)
+    aggregates['Samples'] = grouped['Samples'].sum()
+    timestampColumn = 'Timestamp' if 'Timestamp' in df.columns else 'LastTimestamp'
+    aggregates['LastTimestamp'] = grouped[timestampColumn].max()
+    for column in extraColumns:
+        aggregates[column] = grouped[column].max()
+    return aggregates.reset_index()
+
+def get_tool_piece_aggregates(MachineName, Position, ToolingStation, StartDate, AlarmColumn, AlarmFilter, historyFlag=False, EndDate=None, since=None):
+    '''
+    Per piece made: {column}_max, {column}_mean, {column}_count for every LOAD_COLUMNS column, Samples and LastTimestamp.
+    Live tool: grouped by the piece counter (T{NN}_Bal) in QuestDB.
+    History: QuestDB rows merged with the OT_DataLake piece counter (VALUE) window by window, then grouped per VALUE/SeqNo.
+    Either way the raw samples never leave the database.
+    since (live only): aggregate only samples after this timestamp (see tail_cache.ToolTailCache).
+    '''
     if historyFlag:
         if EndDate is None:
             raise ValueError("EndDate must be provided when historyFlag is True")
-        OT_DataLake_df = get_OT_Datalake_data_history(MachineName, Position, ToolingStation,StartDate,EndDate)
+        return stream_tool_piece_aggregates_history(MachineName, Position, ToolingStation, StartDate, EndDate, AlarmColumn, AlarmFilter)
+
+    if AlarmColumn not in LOAD_COLUMNS:
+        raise ValueError(f"Invalid alarm column: {AlarmColumn}")
+    pieceColumn = get_piece_column(ToolingStation)
+    aggregates = ', '.join(f'max({column}) {column}_max, avg({column}) {column}_mean, count({column}) {column}_count' for column in LOAD_COLUMNS)
+    sinceFilter = ' and timestamp > :Since' if since is not None else ''
+    QuestDbQuery=f"""
+        SELECT {pieceColumn}, max(ToolNo) ToolNo, count() Samples, max(Timestamp) LastTimestamp, {aggregates}
+            FROM MuratecStsLog
+            WHERE timestamp > :StartDate{sinceFilter}
+            and ToolNo = :ToolingStation
+            and MacID = :MacID
+            and Turret = :Turret
+            and Run = 3
+            and {AlarmColumn} <= :AlarmFilter and {AlarmColumn} > 0
+            GROUP BY {pieceColumn}"""
+    params = {"StartDate": StartDate.strftime('%Y-%m-%dT%H:%M:%S.%fZ'), "ToolingStation": int(str(ToolingStation)[0]), "MacID": MachineName,
+              "Turret": Position, "AlarmFilter": float(AlarmFilter) * 1.1} # add 10% buffer to alarm filter
+    if since is not None:
+        params["Since"] = since.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    dtypes = get_muratec_columns('sampled', ToolingStation)
+    dtypes['LastTimestamp'] = 'datetime64[ns]'
+    df = _read_questdb(QuestDbQuery, params, dtypes)
+    if df.empty:
+        return pd.DataFrame()
+    df.rename(columns={'ToolNo': 'ToolingStation'}, inplace=True)
+    df['ToolingStation'] = station_code(df['ToolingStation'])
+    return df
+
+def station_code(ToolNo):
+    '''ToolNo -> ToolingStation code as used by the dashboard (2 -> 202, 10 -> 10010), int(f"{x}0{x}") without a Python call per row.'''
+    ToolNo = np.asarray(ToolNo, dtype='int64')
+    digits = np.floor(np.log10(np.maximum(ToolNo, 1))).astype('int64') + 1
+    return ToolNo * 10 ** (digits + 1) + ToolNo
+
+def prepare_questdb_frame(Questdb_df):
+    '''ToolNo -> ToolingStation code, ToolingStationSeqNum and Timestamp order, in place where possible.'''
+    Questdb_df.rename(columns={'ToolNo': 'ToolingStation'}, inplace=True)
+    Questdb_df['ToolingStation'] = station_code(Questdb_df['ToolingStation'])
+
+    # '<station>_<SeqNo>' labels are only formatted once per distinct pair, rows hold categorical codes
+    pairKey = pd.array(Questdb_df['ToolingStation'], dtype='Int64') * 100000 + pd.array(Questdb_df['SeqNo'], dtype='Int64')
+    codes, pairKeys = pd.factorize(pairKey)
+    Questdb_df['ToolingStationSeqNum'] = pd.Categorical.from_codes(codes, [f'{key // 100000}_{key % 100000}' for key in pairKeys])
+
+    if not pd.api.types.is_datetime64_any_dtype(Questdb_df['Timestamp']):
+        Questdb_df['Timestamp'] = pd.to_datetime(Questdb_df['Timestamp'])
+    # the readers ORDER BY timestamp, only sort when a source didn't
+    if not Questdb_df['Timestamp'].is_monotonic_increasing:
+        Questdb_df.sort_values('Timestamp', inplace=True)
+    return Questdb_df
+
+def merge_history_frames(Questdb_df, OT_DataLake_df):
+    '''Attach the OT_DataLake piece counter (VALUE) to every QuestDB row (last counter change at or before the row).'''
+    prepare_questdb_frame(Questdb_df)
+
+    if not pd.api.types.is_datetime64_any_dtype(OT_DataLake_df['TIMESTAMP']):
+        OT_DataLake_df['TIMESTAMP'] = pd.to_datetime(OT_DataLake_df['TIMESTAMP'])
+    if not OT_DataLake_df['TIMESTAMP'].is_monotonic_increasing:
+        OT_DataLake_df = OT_DataLake_df.sort_values('TIMESTAMP')
+    # ToolingStation comes from the QuestDB side (station code), no _x/_y columns to reconcile afterwards
+    OT_DataLake_df = OT_DataLake_df.drop(columns='ToolingStation', errors='ignore')
+
+    # merge_asof keeps the (sorted) left order, no re-sort of the result
+    CurrentToolCountNQuestdbdf = pd.merge_asof(Questdb_df, OT_DataLake_df, left_on='Timestamp', right_on='TIMESTAMP', direction='backward')
+    CurrentToolCountNQuestdbdf = CurrentToolCountNQuestdbdf[CurrentToolCountNQuestdbdf['Duplicate'].notna()].reset_index(drop=True)
+    CurrentToolCountNQuestdbdf['VALUE'] = CurrentToolCountNQuestdbdf['VALUE'].astype(int)
+    return CurrentToolCountNQuestdbdf
+
+def apply_alarm_filter(df, AlarmColumn, AlarmFilter):
+    AlarmFilter = AlarmFilter*1.1 # add 10% buffer to alarm filter
+    return df[(df[AlarmColumn] <= AlarmFilter) & (df[AlarmColumn] > 0)]
+
+def aggregate_raw_by_piece(df, keys):
+    '''Raw samples -> per-piece {column}_max, {column}_mean, {column}_count, Samples, LastTimestamp (mergeable with aggregate_sampled_by_piece).'''
+    grouped = df.groupby(keys)
+    aggregates = grouped[LOAD_COLUMNS].max().add_suffix('_max').join(grouped[LOAD_COLUMNS].mean().add_suffix('_mean'))
+    aggregates = aggregates.join(grouped[LOAD_COLUMNS].count().add_suffix('_count'))
+    aggregates['Samples'] = grouped.size()
+    aggregates['LastTimestamp'] = grouped['Timestamp'].max()
+    return aggregates.reset_index()
+
+def iter_time_windows(StartDate, EndDate, hours):
+    windowStart = StartDate
+    while windowStart < EndDate:
+        windowEnd = min(windowStart + timedelta(hours=hours), EndDate)
+        yield windowStart, windowEnd
+        windowStart = windowEnd
+
+def stream_tool_piece_aggregates_history(MachineName, Position, ToolingStation, StartDate, EndDate, AlarmColumn, AlarmFilter, sampled=None, chunk_hours=None):
+    '''
+    Per-piece aggregates of a completed tool, read from QuestDB one time window (questdb.history_chunk_hours) at a time.
+    Each window is merged with the OT_DataLake piece counter, alarm filtered and reduced to per-piece partial
+    aggregates before the next one is read, so peak memory is one window whatever the date range.
+    '''
+    if sampled is None:
+        sampled = QUESTDB_CONFIG.get('fetch_mode', 'raw') == 'sampled'
+    chunk_hours = chunk_hours or QUESTDB_CONFIG.get('history_chunk_hours', 24)
+    keys = ['VALUE', 'ToolingStation', 'SeqNo']
+
+    def read_window(windowStart, windowEnd):
+        # readers use timestamp > start: move back 1us so a sample on a window boundary is read exactly once
+        if windowStart != StartDate:
+            windowStart = windowStart - timedelta(microseconds=1)
+        if sampled:
+            return get_questdb_data_sampled(Position, windowStart, ToolingStation, MachineName, EndDate=windowEnd,
+                                            AlarmColumn=AlarmColumn, AlarmFilter=AlarmFilter)
+        return get_questdb_data_history(Position, windowStart, windowEnd, ToolingStation, MachineName)
+
+    windows = list(iter_time_windows(StartDate, EndDate, chunk_hours))
+    if not windows:
+        return pd.DataFrame()
+    # OT_DataLake piece counter and the first QuestDB window are read at the same time
+    fetched = run_concurrently({
+        'OT_DataLake': ('ot_datalake', get_OT_Datalake_data_history, MachineName, Position, ToolingStation, StartDate, EndDate,
+                        QUESTDB_CONFIG.get('history_chunk_rows', 50000)),
+        'Questdb': ('questdb', read_window, *windows[0]),
+    })
+    OT_DataLake_df = fetched['OT_DataLake']
+    if OT_DataLake_df.empty:
+        return pd.DataFrame()
+
+    partials = []
+    for windowIndex, (windowStart, windowEnd) in enumerate(windows):
+        Questdb_df = fetched.pop('Questdb') if windowIndex == 0 else read_window(windowStart, windowEnd)
+        if Questdb_df.empty:
+            continue
+        df_window = merge_history_frames(Questdb_df, OT_DataLake_df.copy())
+        del Questdb_df
+        if sampled:
+            partials.append(aggregate_sampled_by_piece(df_window, keys))
+        else:
+            partials.append(aggregate_raw_by_piece(apply_alarm_filter(df_window, AlarmColumn, AlarmFilter), keys))
+    partials = [partial for partial in partials if not partial.empty]
+    if not partials:
+        return pd.DataFrame()
+    return aggregate_sampled_by_piece(pd.concat(partials, ignore_index=True), keys)
+
+def merge_OT_DataLake_Questdb(MachineName, Position, ToolingStation,StartDate, AlarmColumn,AlarmFilter,historyFlag=False,EndDate=None,sampled=None):
+    # sampled: None -> questdb.fetch_mode from config, False -> raw samples (drill-down)
+    if sampled is None:
+        sampled = QUESTDB_CONFIG.get('fetch_mode', 'raw') == 'sampled'
+    if historyFlag and EndDate is None:
+        raise ValueError("EndDate must be provided when historyFlag is True")
+    if sampled:
+        questdbTask = ('questdb', get_questdb_data_sampled, Position, StartDate, ToolingStation, MachineName,
+                       EndDate if historyFlag else None, AlarmColumn, AlarmFilter)
+    elif historyFlag:
+        questdbTask = ('questdb', get_questdb_data_history, Position,StartDate, EndDate,ToolingStation, MachineName)
+    else:
+        questdbTask = ('questdb', get_questdb_data, Position,StartDate, ToolingStation, MachineName)
+    if historyFlag:
+        # independent servers, fetched at the same time
+        fetched = run_concurrently({
+            'OT_DataLake': ('ot_datalake', get_OT_Datalake_data_history, MachineName, Position, ToolingStation,StartDate,EndDate),
+            'Questdb': questdbTask,
+        })
+        OT_DataLake_df, Questdb_df = fetched['OT_DataLake'], fetched['Questdb']
     # else:
     #     OT_DataLake_df = get_OT_Datalake_data(MachineName, Position, ToolingStation,StartDate)
-    if historyFlag:
-        Questdb_df = get_questdb_data_history(Position,StartDate, EndDate,ToolingStation, MachineName)
     else:
-        Questdb_df = get_questdb_data(Position,StartDate, ToolingStation, MachineName)
+        source, fn, *args = questdbTask
+        Questdb_df = fn(*args)
 
     if historyFlag:
         if OT_DataLake_df.empty and Questdb_df.empty:
             return pd.DataFrame()
-        Questdb_df.rename(columns={'ToolNo': 'ToolingStation'}, inplace=True)
-
-        Questdb_df['ToolingStation'] = Questdb_df['ToolingStation'].apply(lambda x: int(f"{x}0{x}"))
-        Questdb_df['ToolingStationSeqNum'] = Questdb_df['ToolingStation'].astype(str) +'_'+ Questdb_df['SeqNo'].astype(str)
-        
-        Questdb_df['Timestamp'] = pd.to_datetime(Questdb_df['Timestamp'])
-        OT_DataLake_df['TIMESTAMP'] = pd.to_datetime(OT_DataLake_df['TIMESTAMP'])
-        CurrentToolCountNQuestdbdf =pd.merge_asof(Questdb_df.sort_values('Timestamp'), OT_DataLake_df.sort_values('TIMESTAMP'), left_on='Timestamp', right_on='TIMESTAMP', direction='backward')
-        CurrentToolCountNQuestdbdf['Timestamp'] = pd.to_datetime(CurrentToolCountNQuestdbdf['Timestamp'], format='%d/%m/%Y %H:%M:%S.%f')
-
-        CurrentToolCountNQuestdbdf = CurrentToolCountNQuestdbdf.dropna(subset=['Duplicate'])
-
-        CurrentToolCountNQuestdbdf['VALUE'] =  CurrentToolCountNQuestdbdf['VALUE'].astype(int)
-        
-        CurrentToolCountNQuestdbdf = CurrentToolCountNQuestdbdf.sort_values(by='Timestamp').reset_index(drop=True)
-        
-        CurrentToolCountNQuestdbdf['ToolingStation'] = CurrentToolCountNQuestdbdf['ToolingStation_x']
-        CurrentToolCountNQuestdbdf = CurrentToolCountNQuestdbdf.drop(columns=['ToolingStation_x', 'ToolingStation_y'])
+        CurrentToolCountNQuestdbdf = merge_history_frames(Questdb_df, OT_DataLake_df)
     else:
         if Questdb_df.empty:
             return pd.DataFrame()
-        Questdb_df.rename(columns={'ToolNo': 'ToolingStation'}, inplace=True)
-
-        Questdb_df['ToolingStation'] = Questdb_df['ToolingStation'].apply(lambda x: int(f"{x}0{x}"))
-        Questdb_df['ToolingStationSeqNum'] = Questdb_df['ToolingStation'].astype(str) +'_'+ Questdb_df['SeqNo'].astype(str)
-        
-        Questdb_df['Timestamp'] = pd.to_datetime(Questdb_df['Timestamp'])
-        CurrentToolCountNQuestdbdf = Questdb_df
-        CurrentToolCountNQuestdbdf = CurrentToolCountNQuestdbdf.sort_values(by='Timestamp').reset_index(drop=True)
+        CurrentToolCountNQuestdbdf = prepare_questdb_frame(Questdb_df).reset_index(drop=True)
     
     #filters
     #filter all data that have time diff of 5s and above with next row
@@ -767,18 +1094,19 @@ def merge_OT_DataLake_Questdb(MachineName, Position, ToolingStation,StartDate, A
         
     #     CurrentToolCountNQuestdbdf['percent_diff'] = abs(CurrentToolCountNQuestdbdf['SpdlSpd_RPM'] - CurrentToolCountNQuestdbdf['SpdlSpd_RPM_SP']) / CurrentToolCountNQuestdbdf['SpdlSpd_RPM_SP'] * 100
     #     CurrentToolCountNQuestdbdf=CurrentToolCountNQuestdbdf[CurrentToolCountNQuestdbdf['percent_diff'] <= 2]
-    AlarmFilter = AlarmFilter*1.1 # add 10% buffer to alarm filter
-    CurrentToolCountNQuestdbdf=CurrentToolCountNQuestdbdf[CurrentToolCountNQuestdbdf[AlarmColumn] <= AlarmFilter]
-    CurrentToolCountNQuestdbdf=CurrentToolCountNQuestdbdf[CurrentToolCountNQuestdbdf[AlarmColumn] >0]
+    if sampled:
+        return CurrentToolCountNQuestdbdf # alarm filter already applied in QuestDB, before aggregation
+
+    CurrentToolCountNQuestdbdf = apply_alarm_filter(CurrentToolCountNQuestdbdf, AlarmColumn, AlarmFilter)
 
 
     #CurrentToolCountNQuestdbdf = CurrentToolCountNQuestdbdf[CurrentToolCountNQuestdbdf[selectedColumn]<=CutOffValue]
 
     return CurrentToolCountNQuestdbdf
 
+@cached('history', HISTORY_CACHE_TTL)
 def get_historical_data(MachineName, Position, ToolingStation, StartDate, EndDate):
     if not DEMO_MODE:
-        conn = get_db_connection()
         query = f'''
         SET NOCOUNT ON
         SET ANSI_WARNINGS OFF
@@ -860,8 +1188,7 @@ def get_historical_data(MachineName, Position, ToolingStation, StartDate, EndDat
 
         DROP TABLE #TL,#ToolLife,#Session,#WCMachineID,#ToolInfo
         '''
-        df = pd.read_sql(query, conn)
-        conn.close()
+        df = _read_sql(SQL_POOL, query)
     else:
         data_demo = {'Location': ['FMC9','FMC9','FMC9'],
                     'Turret': ['RIGHT','RIGHT','RIGHT'],
@@ -873,6 +1200,27 @@ def get_historical_data(MachineName, Position, ToolingStation, StartDate, EndDat
 
     return df
 
+def get_completed_tools(since):
+    '''Tools completed (in ToolLifeHistory, no longer in ToolLife) since `since`, one row per ToolNoID as in get_historical_data.'''
+    query = '''
+        SET NOCOUNT ON
+        SELECT TN.MachineId MachineID, TL.ToolNoId ToolNoID, mmTool.ToolingMainCategory AS [Turret], mmTool.ToolingStation AS [Tool],
+        MIN(DATEADD(HOUR, 8, TL.StartDate)) StartDate, MAX(DATEADD(HOUR, 8, TL.CompletedDate)) CompletedDate,
+        MAX(mmTool.LoadX_Alm) LoadX_Alm, MAX(mmTool.LoadZ_Alm) LoadZ_Alm
+        FROM ToolLifeHistory TL
+        INNER JOIN (ToolNo TN INNER JOIN mmTool mmTool ON TN.mmToolID=mmTool.ID)
+        ON TL.ToolNoId=TN.Id
+        WHERE TN.MachineID LIKE 'MS%'
+        AND TL.ToolNoId NOT IN (SELECT DISTINCT ToolNoID FROM ToolLife)
+        AND TL.Delflag = 0
+        AND DATEADD(HOUR, 8, TL.CompletedDate) >= ?
+        GROUP BY TN.MachineId, TL.ToolNoId, mmTool.ToolingMainCategory, mmTool.ToolingStation
+        HAVING SUM(TL.TotalCounter) > 0
+        ORDER BY CompletedDate DESC
+        '''
+    return _read_sql(SQL_POOL, query, (since.strftime('%Y-%m-%d %H:%M:%S'),))
+
+@cached('kpi', KPI_CACHE_TTL)
 def get_KPI_Data(MachineName):
 
     if not DEMO_MODE:
@@ -897,13 +1245,12 @@ def get_KPI_Data(MachineName):
         mmTool.ToolingStation,mmTool.ProductGroup,mmTool.ToolingClass,mmTool.ToolingMainCategory, mmTool.ToolingSubCategory, mmTool.SAPCode
         ORDER BY mmTool.ToolingMainCategory,mmTool.ToolingStation,TN.Month
         '''
-        params = (MachineName)
-        conn = get_db_connection()
-        df = pd.read_sql(query, conn,params=params)
-        conn.close()
+        params = (MachineName,)
+        df = _read_sql(SQL_POOL, query, params)
 
         return df
     
+@cached('history', HISTORY_CACHE_TTL)
 def get_History_Inspection_Data(MachineName,StartDate, EndDate):
     query = f'''
     SELECT *
@@ -917,16 +1264,15 @@ def get_History_Inspection_Data(MachineName,StartDate, EndDate):
         , SubSampleNo
     '''
     params = (StartDate,EndDate,MachineName)
-    conn = get_DataMart_db_connection()
-    df = pd.read_sql(query, conn,params=params)
-    conn.close()
+    df = _read_sql(DATAMART_POOL, query, params)
 
     return df
 
-def get_questdb_offset_history(MachineName, Position, StartDate, EndDate,ToolNo):
-    engine = get_Questdb_connection()
-    QuestDbQuery="""
-           SELECT * 
+def get_questdb_offset_history(MachineName, Position, StartDate, EndDate,ToolNo,Axis=None):
+    # Axis 'X'/'Z' selects one offset column, None both
+    columns = get_muratec_columns('offset', ToolNo, Axis)
+    QuestDbQuery=f"""
+           SELECT {', '.join(columns)}
             FROM MuratecStsLog
             WHERE timestamp > :StartDate 
             and timestamp < :CompletedDate
@@ -939,6 +1285,47 @@ def get_questdb_offset_history(MachineName, Position, StartDate, EndDate,ToolNo)
     StartDate = StartDate.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
     EndDate = EndDate.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
     params = {"StartDate": StartDate,"CompletedDate":EndDate,"Turret":Position,"ToolNo":ToolNo, "MacID": MachineName}
-    with engine.connect() as conn:
-        df = pd.read_sql(text(QuestDbQuery), conn, params=params)
-    return df
\ No newline at end of file
+    return _read_questdb(QuestDbQuery, params, columns)
+
+def get_tool_offsets_by_piece_batch(MachineName, Position, ToolNo, windows):
+    '''
+    Max OffsetX_NN / OffsetZ_NN per piece made for many tool lives of one station.
+    windows: {key: (StartDate, EndDate)} -> {key: frame}. One QuestDB query per questdb.offset_batch_windows windows,
+    the rows are split back per window on the (ordered) timestamp.
+    '''
+    columns = get_muratec_columns('offset', ToolNo)
+    pieceColumn = get_piece_column(ToolNo)
+    offsetColumns = get_offset_columns(ToolNo)
+    batchSize = QUESTDB_CONFIG.get('offset_batch_windows', 50)
+    items = list(windows.items())
+    results = {}
+    for batchStart in range(0, len(items), batchSize):
+        batch = items[batchStart:batchStart + batchSize]
+        params = {"Turret": Position, "ToolNo": ToolNo, "MacID": MachineName}
+        ranges = []
+        for n, (_, (StartDate, EndDate)) in enumerate(batch):
+            ranges.append(f'(timestamp > :StartDate{n} and timestamp < :CompletedDate{n})')
+            params[f'StartDate{n}'] = StartDate.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            params[f'CompletedDate{n}'] = EndDate.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        QuestDbQuery=f"""
+            SELECT {', '.join(columns)}
+            FROM MuratecStsLog
+            WHERE ({' or '.join(ranges)})
+            and run  = 3
+            and toolno = :ToolNo
+            and Turret = :Turret
+            and MacID = :MacID
+            order by timestamp"""
+        df = _read_questdb(QuestDbQuery, params, columns)
+        if not df['Timestamp'].is_monotonic_increasing:
+            df = df.sort_values('Timestamp')
+        timestamps = df['Timestamp'].to_numpy()
+        for key, (StartDate, EndDate) in batch:
+            first = np.searchsorted(timestamps, np.datetime64(pd.Timestamp(StartDate)), side='right')
+            last = np.searchsorted(timestamps, np.datetime64(pd.Timestamp(EndDate)), side='left')
+            results[key] = df.iloc[first:last].groupby(pieceColumn)[offsetColumns].max().reset_index()
+    return results
+
+def get_tool_offset_by_piece(MachineName, Position, StartDate, EndDate, ToolNo):
+    '''Max OffsetX_NN / OffsetZ_NN per piece made (T{NN}_Bal) of one tool life.'''
+    return get_tool_offsets_by_piece_batch(MachineName, Position, ToolNo, {0: (StartDate, EndDate)})[0]
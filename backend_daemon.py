@@ -0,0 +1,216 @@
+'''
+Resident scheduler for the backend jobs.
+
+Started once (backend_launcher.ps1) instead of one interpreter per run: imports, DB connection pools
+and caches stay warm between runs. Each job runs on its own thread and interval from config.yaml,
+a failing or slow job does not affect the others. Timings and last-run status are written to
+scheduler.status_path after every run.
+
+    python backend_daemon.py               # run all enabled jobs until stopped
+    python backend_daemon.py --once NAME   # run one job once and exit
+'''
+import argparse
+import json
+import logging
+import os
+import signal
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from config_loader import load_config
+
+config = load_config()
+SCHEDULER_CONFIG = config.get('scheduler', {})
+STATUS_PATH = SCHEDULER_CONFIG.get('status_path', './logs/scheduler_status.json')
+LOG_PATH = SCHEDULER_CONFIG.get('log_path', './logs/backend_daemon.log')
+
+logger = logging.getLogger('backend_daemon')
+
+
+# ---- Jobs ----
+def run_lowest_ppk():
+    from BackEndJobCalculateLowestCPk import GetLowestCPK
+    GetLowestCPK()
+
+def run_pool_maintenance():
+    from backend import SQL_POOL, OT_DATALAKE_POOL, DATAMART_POOL, get_pool_stats
+    closed = sum(pool.evict_idle() for pool in (SQL_POOL, OT_DATALAKE_POOL, DATAMART_POOL))
+    logger.info("pool maintenance: closed %s idle connections, stats=%s", closed, get_pool_stats())
+
+def run_ot_tags():
+    from ot_tags import get_ot_tag_dictionary
+    dictionary = get_ot_tag_dictionary()
+    full, count = dictionary.refresh()
+    logger.info("ot tags: %s refresh, %s names fetched, %s", 'full' if full else 'incremental', count, dictionary.stats())
+
+def run_tool_archive():
+    from tool_archive import get_tool_archive
+    archive = get_tool_archive()
+    processed = archive.backfill()
+    logger.info("tool archive: %s tools backfilled, stats=%s", processed, archive.stats())
+
+# name -> callable, enabled/interval come from config.yaml scheduler.jobs.<name>
+JOBS = {
+    'lowest_ppk': run_lowest_ppk,
+    'pool_maintenance': run_pool_maintenance,
+    'ot_tags': run_ot_tags,
+    'tool_archive': run_tool_archive,
+}
+
+DEFAULT_INTERVALS = {
+    'lowest_ppk': 300,
+    'pool_maintenance': 300,
+    'ot_tags': 3600,
+    'tool_archive': 1800,
+}
+
+
+# ---- Scheduler ----
+class JobRunner(threading.Thread):
+    def __init__(self, name, fn, interval, scheduler):
+        super().__init__(name=f'job-{name}', daemon=True)
+        self.job_name = name
+        self.fn = fn
+        self.interval = interval
+        self.scheduler = scheduler
+        self.status = {
+            'interval': interval,
+            'runs': 0,
+            'failures': 0,
+            'last_start': None,
+            'last_end': None,
+            'last_duration_s': None,
+            'avg_duration_s': None,
+            'max_duration_s': None,
+            'last_status': None,
+            'last_error': None,
+            'next_run': None,
+        }
+
+    def run_once(self):
+        started = time.monotonic()
+        self.status['last_start'] = datetime.now().isoformat(timespec='seconds')
+        try:
+            self.fn()
+            self.status['last_status'] = 'ok'
+            self.status['last_error'] = None
+        except Exception as e:
+            # isolate failures: log, record and keep the schedule going
+            self.status['last_status'] = 'error'
+            self.status['last_error'] = f'{type(e).__name__}: {e}'
+            self.status['failures'] += 1
+            logger.error("job %s failed:\n%s", self.job_name, traceback.format_exc())
+        duration = time.monotonic() - started
+        runs = self.status['runs'] + 1
+        previous_avg = self.status['avg_duration_s'] or 0
+        self.status.update({
+            'runs': runs,
+            'last_end': datetime.now().isoformat(timespec='seconds'),
+            'last_duration_s': round(duration, 3),
+            'avg_duration_s': round(previous_avg + (duration - previous_avg) / runs, 3),
+            'max_duration_s': round(max(duration, self.status['max_duration_s'] or 0), 3),
+        })
+        logger.info("job %s %s in %.2fs", self.job_name, self.status['last_status'], duration)
+        return duration
+
+    def run(self):
+        while not self.scheduler.stopping.is_set():
+            started = time.monotonic()
+            self.run_once()
+            # fixed rate from the start of the run, a run longer than the interval starts the next one right away
+            wait = max(0, self.interval - (time.monotonic() - started))
+            self.status['next_run'] = datetime.fromtimestamp(time.time() + wait).isoformat(timespec='seconds')
+            self.scheduler.write_status()
+            self.scheduler.stopping.wait(wait)
+
+
+class Scheduler:
+    def __init__(self, jobs_config=None):
+        jobs_config = SCHEDULER_CONFIG.get('jobs', {}) if jobs_config is None else jobs_config
+        self.stopping = threading.Event()
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self._status_lock = threading.Lock()
+        self.runners = {}
+        for name, fn in JOBS.items():
+            job_config = jobs_config.get(name, {})
+            if not job_config.get('enabled', True):
+                continue
+            interval = job_config.get('interval', DEFAULT_INTERVALS.get(name, 300))
+            self.runners[name] = JobRunner(name, fn, interval, self)
+
+    def get_status(self):
+        return {
+            'pid': os.getpid(),
+            'started_at': self.started_at,
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'jobs': {name: dict(runner.status) for name, runner in self.runners.items()},
+        }
+
+    def write_status(self):
+        with self._status_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(STATUS_PATH)), exist_ok=True)
+            tmp_path = STATUS_PATH + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(self.get_status(), file, indent=2)
+            os.replace(tmp_path, STATUS_PATH)
+
+    def start(self):
+        logger.info("scheduler started, jobs: %s", {name: runner.interval for name, runner in self.runners.items()})
+        for runner in self.runners.values():
+            runner.start()
+
+    def stop(self):
+        logger.info("scheduler stopping")
+        self.stopping.set()
+
+    def serve_forever(self):
+        self.start()
+        while not self.stopping.is_set():
+            self.stopping.wait(1)
+        for runner in self.runners.values():
+            runner.join(timeout=30)
+        self.write_status()
+
+
+def read_status():
+    '''Last status written by a running daemon (None when it never ran).'''
+    try:
+        with open(STATUS_PATH, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def setup_logging():
+    os.makedirs(os.path.dirname(os.path.abspath(LOG_PATH)), exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s %(threadName)s %(message)s',
+        handlers=[logging.FileHandler(LOG_PATH, encoding='utf-8'), logging.StreamHandler()],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--once', metavar='NAME', choices=sorted(JOBS), help='run one job once and exit')
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.once:
+        scheduler = Scheduler(jobs_config={})
+        runner = scheduler.runners[args.once]
+        runner.run_once()
+        print(json.dumps(runner.status, indent=2))  # status file belongs to the resident daemon, leave it alone
+        return 0 if runner.status['last_status'] == 'ok' else 1
+
+    scheduler = Scheduler()
+    signal.signal(signal.SIGINT, lambda *_: scheduler.stop())
+    signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
+    scheduler.serve_forever()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
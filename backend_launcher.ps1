@@ -4,7 +4,9 @@ cd "$PSScriptRoot"
 # Activate virtual environment
 . ".venv\Scripts\Activate.ps1"
 
-# run BackEndJobCalculateLowestCPk python script
-python ".\BackEndJobCalculateLowestCPk.py"
+# start the resident backend scheduler (runs BackEndJobCalculateLowestCPk etc. on the intervals in config.yaml)
+# Task Scheduler: trigger once "At startup", not on a repeating schedule
+python ".\backend_daemon.py"
 
+# single run of one job, e.g. for testing: python ".\backend_daemon.py" --once lowest_ppk
 # for manual run, in powershell, cd to this dir, then ".\backend_launcher.ps1"
\ No newline at end of file
@@ -0,0 +1,126 @@
+'''
+QuestDB bulk fetch: read_sql over PG wire vs CSV export (/exp) parsed by pandas.
+
+Offline (default) isolates the client-side cost on a synthetic MuratecStsLog 'load' view:
+building the frame from DB-API row tuples (what read_sql does) vs parsing the same rows as
+CSV (what the /exp path does). Served from a local HTTP server so the CSV path includes the
+urllib stream.
+
+    python benchmarks/bench_questdb_fetch.py                    # offline, synthetic rows
+    python benchmarks/bench_questdb_fetch.py --questdb MACID TURRET TOOLNO START END
+                                                                # both transports against QuestDB from .env
+'''
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROW_COUNTS = [100_000, 300_000, 1_000_000]
+REPEAT = 3
+LOAD_COLUMNS = ['FeedRate', 'SpdlSpd_RPM', 'SpdlSpd_RPM_SP', 'Load_X', 'Load_Z', 'Load_Spdl']
+
+
+def synthetic_load_rows(row_count):
+    rnd = np.random.default_rng(row_count)
+    df = pd.DataFrame({
+        'Timestamp': pd.date_range('2026-01-01', periods=row_count, freq='100ms'),
+        'MacID': 'MSNLTH0001',
+        'Turret': 'Left',
+        'ToolNo': 2,
+        'SeqNo': rnd.integers(1, 4, row_count),
+        'T02_Bal': np.arange(row_count) // 400,
+    })
+    for column in LOAD_COLUMNS:
+        df[column] = rnd.random(row_count) * 100
+    return df
+
+
+def best_of(fn):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def serve(payload):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/csv')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_offline():
+    from urllib.request import urlopen
+    from backend import get_muratec_columns, _apply_questdb_dtypes, CSV_ENGINE
+
+    dtypes = get_muratec_columns('load', 2)
+    csvDtypes = {column: dtype for column, dtype in dtypes.items() if dtype.startswith('float')}
+    print(f"MuratecStsLog 'load' view ({len(dtypes)} columns), CSV engine {CSV_ENGINE}, best of {REPEAT}")
+    print(f"{'rows':>9} {'row tuples (ms)':>16} {'CSV /exp (ms)':>14} {'speedup':>8}")
+    for row_count in ROW_COUNTS:
+        df = synthetic_load_rows(row_count)
+        columns = list(df.columns)
+        rows = [tuple(row) for row in df.astype(object).itertuples(index=False)]  # what a DB-API cursor hands back
+        df['Timestamp'] = df['Timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        server = serve(df.to_csv(index=False).encode())
+        url = f'http://127.0.0.1:{server.server_address[1]}/exp'
+
+        def from_rows():
+            return _apply_questdb_dtypes(pd.DataFrame.from_records(rows, columns=columns, coerce_float=True), dtypes)
+
+        def from_csv():
+            with urlopen(url) as response:
+                return _apply_questdb_dtypes(pd.read_csv(response, dtype=csvDtypes, engine=CSV_ENGINE), dtypes)
+
+        rows_time, rows_df = best_of(from_rows)
+        csv_time, csv_df = best_of(from_csv)
+        server.shutdown()
+        assert len(rows_df) == len(csv_df) == row_count
+        print(f"{row_count:>9} {rows_time*1000:>16.1f} {csv_time*1000:>14.1f} {rows_time/csv_time:>7.1f}x")
+
+
+def run_questdb(MacID, Turret, ToolNo, StartDate, EndDate):
+    import backend
+
+    print(f"get_questdb_data_history {MacID} {Turret} T{ToolNo} {StartDate} -> {EndDate}, best of {REPEAT}")
+    for transport in ('pg', 'http'):
+        backend.QUESTDB_CONFIG['transport'] = transport
+        elapsed, df = best_of(lambda: backend.get_questdb_data_history(Turret, StartDate, EndDate, ToolNo, MacID))
+        print(f"{transport:>5}: {elapsed*1000:>9.1f} ms  {len(df):>9} rows  {df.memory_usage(deep=True).sum()/1e6:>7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questdb', nargs=5, metavar=('MACID', 'TURRET', 'TOOLNO', 'START', 'END'),
+                        help='run both transports against QuestDB (START/END as YYYY-MM-DDTHH:MM:SS)')
+    args = parser.parse_args()
+    if args.questdb:
+        MacID, Turret, ToolNo, StartDate, EndDate = args.questdb
+        run_questdb(MacID, Turret, int(ToolNo), datetime.fromisoformat(StartDate), datetime.fromisoformat(EndDate))
+    else:
+        run_offline()
+
+
+if __name__ == '__main__':
+    main()
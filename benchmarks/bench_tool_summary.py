@@ -0,0 +1,182 @@
+'''
+#ToolSummary build: per-machine WHILE loop vs set-based ROW_NUMBER() selection.
+
+Times both strategies over a synthetic #ToolInfo (TOOLS_PER_MACHINE tools per machine)
+for a growing number of machines.
+
+    python benchmarks/bench_tool_summary.py              # local SQLite emulation
+    python benchmarks/bench_tool_summary.py --sqlserver  # against SQL_SERVER from .env (temp tables only)
+'''
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MACHINE_COUNTS = [10, 25, 50, 100, 200, 400]
+TOOLS_PER_MACHINE = 40
+REPEAT = 3
+
+
+def synthetic_tool_info(machine_count):
+    rnd = random.Random(machine_count)
+    rows = []
+    for m in range(machine_count):
+        for t in range(TOOLS_PER_MACHINE):
+            rows.append((f'MSNLTH{m:04}', f'FMC{m}', '40039550', 'MATERIAL A', 101 + t, rnd.randint(0, 3000), 3000,
+                         rnd.randint(0, 3000), rnd.randint(0, 2000)))
+    return rows
+
+
+# ---- SQLite emulation ----
+SQLITE_SCHEMA = '''
+CREATE TABLE ToolInfo (MachineID TEXT, Location TEXT, MaterialCode TEXT, MaterialDescription TEXT, ToolingStation INT,
+                       TotalCounter INT, PresetCounter INT, Balance INT, DurationMins INT);
+CREATE TABLE ToolSummary (MachineID TEXT, Location TEXT, MaterialCode TEXT, MaterialDesc TEXT, ToolingStation INT,
+                          TotalCounter INT, PresetCounter INT, BalanceCounter INT, DurationMins INT);
+'''
+
+SQLITE_LOOP_STEP = '''
+INSERT INTO ToolSummary SELECT MachineID,Location,MaterialCode,MaterialDescription,
+    ToolingStation,TotalCounter,PresetCounter,Balance,DurationMins
+FROM ToolInfo
+WHERE MachineID NOT IN (SELECT MachineID FROM ToolSummary)
+ORDER BY DurationMins LIMIT 1
+'''
+
+SQLITE_SET_BASED = '''
+WITH RankedTool AS (
+    SELECT *, ROW_NUMBER() OVER (PARTITION BY MachineID ORDER BY DurationMins) AS DurationRank FROM ToolInfo
+)
+INSERT INTO ToolSummary SELECT MachineID,Location,MaterialCode,MaterialDescription,
+    ToolingStation,TotalCounter,PresetCounter,Balance,DurationMins
+FROM RankedTool WHERE DurationRank = 1
+'''
+
+
+def run_sqlite(machine_count):
+    conn = sqlite3.connect(':memory:')
+    conn.executescript(SQLITE_SCHEMA)
+    conn.executemany('INSERT INTO ToolInfo VALUES (?,?,?,?,?,?,?,?,?)', synthetic_tool_info(machine_count))
+
+    def loop():
+        total = conn.execute('SELECT COUNT(DISTINCT MachineID) FROM ToolInfo').fetchone()[0]
+        for _ in range(total):
+            conn.execute(SQLITE_LOOP_STEP)
+
+    def set_based():
+        conn.execute(SQLITE_SET_BASED)
+
+    timings = {}
+    for name, fn in (('while_loop', loop), ('set_based', set_based)):
+        best = None
+        for _ in range(REPEAT):
+            conn.execute('DELETE FROM ToolSummary')
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+        timings[f'{name}_rows'] = conn.execute('SELECT COUNT(*) FROM ToolSummary').fetchone()[0]
+    conn.close()
+    return timings
+
+
+# ---- SQL Server ----
+SQLSERVER_SETUP = '''
+SET NOCOUNT ON
+IF OBJECT_ID('tempdb..#ToolInfo') IS NOT NULL DROP TABLE #ToolInfo
+IF OBJECT_ID('tempdb..#ToolSummary') IS NOT NULL DROP TABLE #ToolSummary
+CREATE TABLE #ToolInfo (MachineID NVARCHAR(18), Location NVARCHAR(10), MaterialCode NVARCHAR(40), MaterialDescription NVARCHAR(40),
+                        ToolingStation INT, TotalCounter INT, PresetCounter INT, Balance INT, DurationMins INT)
+CREATE TABLE #ToolSummary (MachineID NVARCHAR(18), Location NVARCHAR(10), MaterialCode NVARCHAR(40), MaterialDesc NVARCHAR(40),
+                           ToolingStation INT, TotalCounter INT, PresetCounter INT, BalanceCounter INT, DurationMins INT)
+'''
+
+SQLSERVER_LOOP = '''
+SET NOCOUNT ON
+DECLARE @RowNum INT=1
+DECLARE @TotalRow INT
+SET @TotalRow = (SELECT COUNT(DISTINCT MachineID) from #ToolInfo)
+WHILE @RowNum <= @TotalRow
+BEGIN
+    INSERT INTO #ToolSummary SELECT TOP 1 MachineID,Location,MaterialCode,MaterialDescription,
+        ToolingStation,TotalCounter,PresetCounter,Balance,DurationMins
+    FROM #ToolInfo
+    WHERE MachineID NOT IN (SELECT MachineID FROM #ToolSummary)
+    ORDER BY DurationMins
+    SET @RowNum= @RowNum+1
+END
+'''
+
+SQLSERVER_SET_BASED = '''
+SET NOCOUNT ON
+;WITH RankedTool AS (
+    SELECT MachineID,Location,MaterialCode,MaterialDescription,
+        ToolingStation,TotalCounter,PresetCounter,Balance,DurationMins,
+        ROW_NUMBER() OVER (PARTITION BY MachineID ORDER BY DurationMins) AS DurationRank
+    FROM #ToolInfo
+)
+INSERT INTO #ToolSummary SELECT MachineID,Location,MaterialCode,MaterialDescription,
+    ToolingStation,TotalCounter,PresetCounter,Balance,DurationMins
+FROM RankedTool
+WHERE DurationRank = 1
+'''
+
+
+def run_sqlserver(machine_count, conn):
+    cursor = conn.cursor()
+    cursor.execute(SQLSERVER_SETUP)
+    cursor.fast_executemany = True
+    cursor.executemany('INSERT INTO #ToolInfo VALUES (?,?,?,?,?,?,?,?,?)', synthetic_tool_info(machine_count))
+
+    timings = {}
+    for name, batch in (('while_loop', SQLSERVER_LOOP), ('set_based', SQLSERVER_SET_BASED)):
+        best = None
+        for _ in range(REPEAT):
+            cursor.execute('TRUNCATE TABLE #ToolSummary')
+            start = time.perf_counter()
+            cursor.execute(batch)
+            while cursor.nextset():
+                pass
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+        timings[f'{name}_rows'] = cursor.execute('SELECT COUNT(*) FROM #ToolSummary').fetchone()[0]
+    cursor.execute('DROP TABLE #ToolInfo, #ToolSummary')
+    cursor.close()
+    conn.rollback()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sqlserver', action='store_true', help='run against SQL_SERVER from .env instead of SQLite')
+    args = parser.parse_args()
+
+    if args.sqlserver:
+        from backend import get_db_connection
+        conn = get_db_connection()
+        run = lambda n: run_sqlserver(n, conn)
+        target = 'SQL Server'
+    else:
+        run = run_sqlite
+        target = 'SQLite (emulated)'
+
+    print(f"#ToolSummary build on {target}, {TOOLS_PER_MACHINE} tools/machine, best of {REPEAT}")
+    print(f"{'machines':>9} {'while loop (ms)':>16} {'set based (ms)':>15} {'speedup':>8}")
+    for machine_count in MACHINE_COUNTS:
+        timings = run(machine_count)
+        assert timings['while_loop_rows'] == timings['set_based_rows'] == machine_count
+        speedup = timings['while_loop'] / timings['set_based'] if timings['set_based'] else float('inf')
+        print(f"{machine_count:>9} {timings['while_loop']*1000:>16.2f} {timings['set_based']*1000:>15.2f} {speedup:>7.1f}x")
+
+    if args.sqlserver:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
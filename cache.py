@@ -0,0 +1,350 @@
+import functools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+import pandas as pd
+
+from cache_keys import make_key, copy_value
+from config_loader import load_config
+from single_flight import SingleFlight
+
+config = load_config()
+CACHE_CONFIG = config.get('cache', {})
+MEMORY_MAX_BYTES = int(CACHE_CONFIG.get('memory_max_mb', 256) * 1024 * 1024)
+DISK_ENABLED = CACHE_CONFIG.get('disk_enabled', True)
+DISK_PATH = CACHE_CONFIG.get('disk_path', './data/Cache.db')
+DISK_MAX_BYTES = int(CACHE_CONFIG.get('disk_max_mb', 1024) * 1024 * 1024)
+DISK_ACCESS_FLUSH_SECONDS = CACHE_CONFIG.get('disk_access_flush_seconds', 30)
+DISK_SWEEP_SECONDS = CACHE_CONFIG.get('disk_sweep_seconds', 60)
+REDIS_URL = CACHE_CONFIG.get('redis_url', '')
+# seconds per namespace, overrides the ttl given in code
+CACHE_TTL = CACHE_CONFIG.get('ttl', {})
+
+
+def sizeof(value):
+    '''Approximate in-memory size in bytes (DataFrames by their deep memory usage).'''
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sum(sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sum(sizeof(item) for item in value.values())
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+# ---- Tiers ----
+class MemoryTier:
+    '''In-process LRU bounded by max_bytes (sizeof), values are handed out as copies.'''
+
+    name = 'memory'
+
+    def __init__(self, max_bytes=MEMORY_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key):
+        '''(value, expires) or None.'''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                self._remove(key)
+                self._stats['expirations'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return copy_value(entry[2]), entry[0]
+
+    def set(self, key, value, expires):
+        size = sizeof(value)
+        if size > self.max_bytes:
+            return
+        value = copy_value(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, size, value)
+            self._bytes += size
+            self._stats['sets'] += 1
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, prefix=''):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
+
+
+class DiskTier:
+    '''
+    SQLite tier shared by every process on the host (dashboard, api_server, backend_daemon) and kept
+    across restarts. Values are pickled, the file is only written by these processes.
+    Bounded by max_bytes, least recently read entries go first. Read times are kept in memory and
+    written in batches, expired / over-budget entries are removed by a periodic sweep, so a read is
+    one SELECT and a write one INSERT most of the time (the file may exceed max_bytes until the next sweep).
+    '''
+
+    name = 'disk'
+
+    SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS cache (
+        Key TEXT PRIMARY KEY,
+        Value BLOB NOT NULL,
+        Size INTEGER NOT NULL,
+        Expires REAL NOT NULL,
+        LastAccess REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_cache_last_access ON cache (LastAccess);
+    '''
+
+    def __init__(self, path=DISK_PATH, max_bytes=DISK_MAX_BYTES, access_flush_seconds=DISK_ACCESS_FLUSH_SECONDS,
+                 sweep_seconds=DISK_SWEEP_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.access_flush_seconds = access_flush_seconds
+        self.sweep_seconds = sweep_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+        self._accessed = {}  # key -> last read time, not written yet
+        self._last_flush = time.time()
+        self._last_sweep = 0.0  # first write sweeps
+        self._written = 0  # bytes written since the last sweep
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'expirations': 0, 'sweeps': 0}
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key):
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute('SELECT Value, Expires FROM cache WHERE Key = ?', (key,)).fetchone()
+            if row is not None and row[1] <= now:
+                conn.execute('DELETE FROM cache WHERE Key = ?', (key,))
+                self._count('expirations')
+                row = None
+            if row is None:
+                self._count('misses')
+                return None
+            with self._lock:
+                self._stats['hits'] += 1
+                self._accessed[key] = now
+                flush = now - self._last_flush >= self.access_flush_seconds
+            if flush:
+                self._flush_accesses(conn)
+        return pickle.loads(row[0]), row[1]
+
+    def _flush_accesses(self, conn):
+        with self._lock:
+            accessed, self._accessed = self._accessed, {}
+            self._last_flush = time.time()
+        if accessed:
+            conn.executemany('UPDATE cache SET LastAccess = ? WHERE Key = ?', [(when, key) for key, when in accessed.items()])
+
+    def set(self, key, value, expires):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO cache (Key, Value, Size, Expires, LastAccess) VALUES (?, ?, ?, ?, ?)',
+                         (key, payload, len(payload), expires, now))
+            with self._lock:
+                self._stats['sets'] += 1
+                self._written += len(payload)
+                sweep = now - self._last_sweep >= self.sweep_seconds or self._written > self.max_bytes / 10
+                if sweep:
+                    self._last_sweep, self._written = now, 0
+            if sweep:
+                self._sweep(conn, now)
+
+    def _sweep(self, conn, now):
+        '''Drop expired entries, then least recently read ones until the file is within max_bytes.'''
+        self._flush_accesses(conn)
+        expired = conn.execute('DELETE FROM cache WHERE Expires <= ?', (now,)).rowcount
+        total = conn.execute('SELECT COALESCE(SUM(Size), 0) FROM cache').fetchone()[0]
+        evicted = 0
+        if total > self.max_bytes:
+            for oldKey, size in conn.execute('SELECT Key, Size FROM cache ORDER BY LastAccess').fetchall():
+                conn.execute('DELETE FROM cache WHERE Key = ?', (oldKey,))
+                evicted += 1
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        self._count('sweeps')
+        self._count('expirations', expired)
+        self._count('evictions', evicted)
+
+    def invalidate(self, prefix=''):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM cache WHERE substr(Key, 1, ?) = ?", (len(prefix), prefix))
+
+    def _count(self, name, count=1):
+        with self._lock:
+            self._stats[name] += count
+
+    def stats(self):
+        with closing(self._connect()) as conn:
+            entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(Size), 0) FROM cache').fetchone()
+        with self._lock:
+            return dict(self._stats, entries=entries, bytes=size, max_bytes=self.max_bytes)
+
+
+class RedisTier:
+    '''
+    Redis-compatible tier (anything speaking the Redis protocol, or a client object with get/set/delete/scan_iter).
+    Shared between hosts; size limits and eviction are the server's (maxmemory + policy). Values are pickled.
+    '''
+
+    name = 'redis'
+
+    def __init__(self, client):
+        self.client = client
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'errors': 0}
+
+    @classmethod
+    def from_url(cls, url):
+        import redis
+        return cls(redis.Redis.from_url(url, socket_timeout=2))
+
+    def get(self, key):
+        try:
+            payload = self.client.get(key)
+        except Exception:
+            self._count('errors')
+            return None
+        if payload is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        expires, value = pickle.loads(payload)
+        return value, expires
+
+    def set(self, key, value, expires):
+        ttl = int(expires - time.time())
+        if ttl <= 0:
+            return
+        try:
+            self.client.set(key, pickle.dumps((expires, value), protocol=pickle.HIGHEST_PROTOCOL), ex=ttl)
+            self._count('sets')
+        except Exception:
+            self._count('errors')
+
+    def invalidate(self, prefix=''):
+        try:
+            for key in self.client.scan_iter(match=f'{prefix}*'):
+                self.client.delete(key)
+        except Exception:
+            self._count('errors')
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+# ---- Tiered cache ----
+class TieredCache:
+    '''
+    Read through the tiers in order (memory, disk, redis), a hit in a lower tier is copied up with its
+    remaining TTL; writes go to every tier. TTLs are per key (set / get_or_compute).
+    Concurrent misses on the same key run compute once (single_flight), the others wait for it.
+    '''
+
+    def __init__(self, tiers):
+        self.tiers = tiers
+        self._flight = SingleFlight()
+
+    def get(self, key):
+        for index, tier in enumerate(self.tiers):
+            found = tier.get(key)
+            if found is not None:
+                value, expires = found
+                for upper in self.tiers[:index]:
+                    upper.set(key, value, expires)
+                return found
+        return None
+
+    def set(self, key, value, ttl):
+        expires = time.time() + ttl
+        for tier in self.tiers:
+            tier.set(key, value, expires)
+
+    def get_or_compute(self, key, ttl, compute):
+        found = self.get(key)
+        if found is not None:
+            return found[0]
+        return self._flight.do(key, lambda: self._compute(key, ttl, compute))
+
+    def _compute(self, key, ttl, compute):
+        # a call that just finished may have filled the key between our miss and taking the lead
+        found = self.get(key)
+        if found is not None:
+            return found[0]
+        value = compute()
+        self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, prefix=''):
+        '''Drop every key starting with prefix (e.g. a namespace "kpi:"), all tiers.'''
+        for tier in self.tiers:
+            tier.invalidate(prefix)
+
+    def stats(self):
+        return dict({tier.name: tier.stats() for tier in self.tiers}, single_flight=self._flight.stats())
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    '''Process-wide TieredCache from config.yaml cache.'''
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            tiers = [MemoryTier()]
+            if DISK_ENABLED:
+                tiers.append(DiskTier())
+            if REDIS_URL:
+                try:
+                    tiers.append(RedisTier.from_url(REDIS_URL))
+                except ImportError:
+                    print("cache: redis_url set but the redis package is not installed, redis tier disabled")
+            _cache = TieredCache(tiers)
+    return _cache
+
+def cached(namespace, ttl):
+    '''Decorator: cache the function's result in get_cache() per arguments, ttl seconds (cache.ttl.<namespace> overrides).'''
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = make_key(namespace, fn.__name__, *args, **kwargs)
+            return get_cache().get_or_compute(key, CACHE_TTL.get(namespace, ttl), lambda: fn(*args, **kwargs))
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
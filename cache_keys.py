@@ -0,0 +1,20 @@
+import hashlib
+
+import pandas as pd
+
+
+def make_key(namespace, *args, **kwargs):
+    '''namespace:<digest of the arguments>, the namespace prefix is what invalidate() matches on.'''
+    digest = hashlib.sha1(repr((args, sorted(kwargs.items()))).encode()).hexdigest()
+    return f'{namespace}:{digest}'
+
+def copy_value(value):
+    '''Copy of a cached result (DataFrames, and tuples / lists / dicts of them).'''
+    # callers add / convert columns on the returned frames, the cached ones must stay untouched
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, (tuple, list)):
+        return type(value)(copy_value(item) for item in value)
+    if isinstance(value, dict):
+        return {key: copy_value(item) for key, item in value.items()}
+    return value
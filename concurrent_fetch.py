@@ -0,0 +1,99 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from config_loader import load_config
+
+config = load_config()
+CONCURRENT_FETCH_CONFIG = config.get('concurrent_fetch', {})
+# shared by every caller (Streamlit sessions, backend functions), keep at or below the db pools' max_size.
+# A timed out task is not interrupted: it keeps its worker and its pooled connection until the query
+# returns (database side timeouts), so repeated timeouts can use up both; size the database timeouts accordingly.
+MAX_WORKERS = CONCURRENT_FETCH_CONFIG.get('max_workers', config.get('db_pool', {}).get('max_size', 5))
+# seconds a caller waits for one source once its task is running, per source name
+SOURCE_TIMEOUTS = {'sql': 60, 'ot_datalake': 120, 'questdb': 120, **CONCURRENT_FETCH_CONFIG.get('timeouts', {})}
+DEFAULT_TIMEOUT = CONCURRENT_FETCH_CONFIG.get('default_timeout', 120)
+# seconds a task may wait for a free worker (other sessions' tasks) before it is dropped
+QUEUE_TIMEOUT = CONCURRENT_FETCH_CONFIG.get('queue_timeout', 60)
+
+
+class SourceTimeoutError(TimeoutError):
+    '''A source did not answer within its timeout (concurrent_fetch.timeouts).'''
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_worker = threading.local()
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='fetch')
+    return _executor
+
+class _Started:
+    '''When a task's worker picked it up, its timeout counts from there.'''
+    __slots__ = ('event', 'at')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.at = None
+
+def _run_in_worker(started, fn, args, kwargs):
+    started.at = time.monotonic()
+    started.event.set()
+    _worker.active = True
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _worker.active = False
+
+
+def run_concurrently(tasks, return_exceptions=False):
+    '''
+    Run independent fetches at the same time, total latency is the slowest source instead of the sum.
+    tasks: {name: (source, fn, *args)} -> {name: result}. Each task gets the timeout of its source
+    (SOURCE_TIMEOUTS), counted from when a worker starts it; time queued behind other callers' tasks
+    is bounded by QUEUE_TIMEOUT instead. A late task raises SourceTimeoutError. A queued task is
+    cancelled, a running one is not (the worker finishes in the background, see MAX_WORKERS).
+
+    return_exceptions=False raises the first error once every task is done or timed out,
+    True puts the exception in place of the result (asyncio.gather style).
+    Called from inside a task, the tasks run one after another in the caller's thread (no pool deadlock).
+    '''
+    results = {}
+    if getattr(_worker, 'active', False):
+        for name, (source, fn, *args) in tasks.items():
+            try:
+                results[name] = fn(*args)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[name] = e
+        return results
+
+    executor = _get_executor()
+    submitted = time.monotonic()
+    futures = {}
+    for name, (source, fn, *args) in tasks.items():
+        started = _Started()
+        futures[name] = (source, started, executor.submit(_run_in_worker, started, fn, args, {}))
+    for name, (source, started, future) in futures.items():
+        timeout = SOURCE_TIMEOUTS.get(source, DEFAULT_TIMEOUT)
+        if not started.event.wait(max(0, submitted + QUEUE_TIMEOUT - time.monotonic())) and future.cancel():
+            results[name] = SourceTimeoutError(f"{name}: no free fetch worker for {source} after {QUEUE_TIMEOUT}s")
+            continue
+        started.event.wait()  # cancel() lost the race, the task has just started
+        try:
+            results[name] = future.result(timeout=max(0, started.at + timeout - time.monotonic()))
+        except FutureTimeoutError:
+            results[name] = SourceTimeoutError(f"{name}: no answer from {source} after {timeout}s")
+        except Exception as e:
+            results[name] = e
+
+    if not return_exceptions:
+        for result in results.values():
+            if isinstance(result, Exception):
+                raise result
+    return results
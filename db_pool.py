@@ -0,0 +1,165 @@
+import threading
+import time
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool:
+    '''
+    Bounded pool of DB-API connections (pyodbc) created by `connect_fn`.
+
+    - at most `max_size` connections exist at any time (idle + in use)
+    - idle connections older than `idle_timeout` seconds are closed
+    - connections idle longer than `health_check_interval` seconds are pinged before reuse
+    - connections are always given back (or discarded on error) by `connection()`
+    '''
+
+    def __init__(self, name, connect_fn, max_size=5, idle_timeout=300, health_check_interval=30,
+                 acquire_timeout=30, health_check_query='SELECT 1'):
+        self.name = name
+        self._connect_fn = connect_fn
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self.health_check_query = health_check_query
+
+        self._idle = LifoQueue()  # (conn, last_used) - LIFO keeps the warmest connection in use
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,              # checkout served by an idle connection
+            'misses': 0,            # checkout had to open a new connection
+            'timeouts': 0,          # checkout gave up waiting for a free slot
+            'health_check_failures': 0,
+            'evicted_idle': 0,
+            'discarded': 0,         # connection dropped after an error while in use
+            'in_use': 0,
+        }
+
+    # ---- checkout / checkin ----
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self._incr('timeouts')
+            raise PoolTimeoutError(f"{self.name}: no connection available after {self.acquire_timeout}s (max_size={self.max_size})")
+        try:
+            conn = self._take_idle()
+            if conn is None:
+                conn = self._connect_fn()
+                self._incr('misses')
+            else:
+                self._incr('hits')
+        except Exception:
+            self._slots.release()
+            raise
+        self._incr('in_use')
+        return conn
+
+    def release(self, conn, discard=False):
+        self._incr('in_use', -1)
+        try:
+            if discard:
+                self._incr('discarded')
+                self._close(conn)
+                return
+            try:
+                conn.rollback()  # pyodbc runs with autocommit off, never hand back an open transaction
+            except Exception:
+                self._incr('discarded')
+                self._close(conn)
+                return
+            self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            # connection state is unknown (half-run batch, leftover temp tables...), do not reuse it
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+    # ---- maintenance ----
+    def _take_idle(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except Empty:
+                return None
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.idle_timeout:
+                self._incr('evicted_idle')
+                self._close(conn)
+                continue
+            if idle_for > self.health_check_interval and not self._is_healthy(conn):
+                self._incr('health_check_failures')
+                self._close(conn)
+                continue
+            return conn
+
+    def _is_healthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.health_check_query)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def evict_idle(self):
+        '''Close idle connections that passed idle_timeout. Returns number closed.'''
+        keep, closed = [], 0
+        now = time.monotonic()
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except Empty:
+                break
+            if now - last_used > self.idle_timeout:
+                self._close(conn)
+                closed += 1
+            else:
+                keep.append((conn, last_used))
+        for item in reversed(keep):
+            self._idle.put(item)
+        self._incr('evicted_idle', closed)
+        return closed
+
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except Empty:
+                break
+            self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # ---- statistics ----
+    def _incr(self, key, value=1):
+        with self._lock:
+            self._stats[key] += value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        checkouts = stats['hits'] + stats['misses']
+        stats['idle'] = self._idle.qsize()
+        stats['max_size'] = self.max_size
+        stats['hit_ratio'] = round(stats['hits'] / checkouts, 3) if checkouts else None
+        return stats
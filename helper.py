@@ -15,7 +15,8 @@ plt.style.use('dark_background') # #see all styles --> print(plt.style.available
 from config_loader import load_config
 from scipy.stats import norm,linregress
 from datetime import datetime
-from backend import get_questdb_offset_history
+from backend import get_piece_column, aggregate_sampled_by_piece, LOAD_COLUMNS
+from tool_archive import get_tool_archive
 
 config = load_config()
 
@@ -78,18 +79,21 @@ def find_usl_lsl_for_cpk(USL,LSL, target_cpk=1.0):
 
 def GroupDfByPiecesMade(df,ToolingStation,IsHistory, IsMax=True):
     if IsHistory:
-        if IsMax:
-            GroupCurrentToolCountNQuestdbValue = df.groupby(['VALUE', 'ToolingStation','SeqNo'])[['FeedRate', 'SpdlSpd_RPM','SpdlSpd_RPM_SP','Load_X','Load_Z','Load_Spdl']].max().reset_index()
-        else:
-            GroupCurrentToolCountNQuestdbValue = df.groupby(['VALUE', 'ToolingStation','SeqNo'])[['FeedRate', 'SpdlSpd_RPM','SpdlSpd_RPM_SP','Load_X','Load_Z','Load_Spdl']].mean().reset_index()
-        GroupCurrentToolCountNQuestdbValue = GroupCurrentToolCountNQuestdbValue.sort_values(by=['VALUE'], ascending=[False]).reset_index(drop=True)
+        keys = ['VALUE', 'ToolingStation','SeqNo']
+        extraColumns = []
     else:
-        if IsMax:
-            GroupCurrentToolCountNQuestdbValue = df.groupby([f'T{ToolingStation:02}_Bal'])[['FeedRate', 'SpdlSpd_RPM','SpdlSpd_RPM_SP','Load_X','Load_Z','Load_Spdl','ToolingStation']].max().reset_index()
-        else:
-            GroupCurrentToolCountNQuestdbValue = df.groupby([f'T{ToolingStation:02}_Bal'])[['FeedRate', 'SpdlSpd_RPM','SpdlSpd_RPM_SP','Load_X','Load_Z','Load_Spdl','ToolingStation']].mean().reset_index()
-            
-        GroupCurrentToolCountNQuestdbValue = GroupCurrentToolCountNQuestdbValue.sort_values(by=[f'T{ToolingStation:02}_Bal'], ascending=[False]).reset_index(drop=True)
+        keys = [get_piece_column(ToolingStation)]
+        extraColumns = ['ToolingStation']
+
+    if 'Samples' in df.columns:
+        # downsampled buckets (get_questdb_data_sampled) or per-piece aggregates (get_tool_piece_aggregates)
+        GroupCurrentToolCountNQuestdbValue = GroupSampledDfByPiecesMade(df, keys, extraColumns, IsMax)
+    elif IsMax:
+        GroupCurrentToolCountNQuestdbValue = df.groupby(keys)[LOAD_COLUMNS + extraColumns].max().reset_index()
+    else:
+        GroupCurrentToolCountNQuestdbValue = df.groupby(keys)[LOAD_COLUMNS + extraColumns].mean().reset_index()
+
+    GroupCurrentToolCountNQuestdbValue = GroupCurrentToolCountNQuestdbValue.sort_values(by=[keys[0]], ascending=[False]).reset_index(drop=True)
         
     #GroupCurrentToolCountNQuestdbValue['ToolingStationSeqNum'] = GroupCurrentToolCountNQuestdbValue['ToolingStation'].astype(str) +'-'+ GroupCurrentToolCountNQuestdbValue['SeqNo'].astype(str)
     
@@ -98,6 +102,12 @@ def GroupDfByPiecesMade(df,ToolingStation,IsHistory, IsMax=True):
 
     return GroupCurrentToolCountNQuestdbValue
 
+def GroupSampledDfByPiecesMade(df, keys, extraColumns, IsMax):
+    suffix = '_max' if IsMax else '_mean'
+    GroupValue = aggregate_sampled_by_piece(df, keys, extraColumns)
+    GroupValue = GroupValue.rename(columns={f'{column}{suffix}': column for column in LOAD_COLUMNS})
+    return GroupValue[keys + LOAD_COLUMNS + extraColumns]
+
 # ---- plot IMR ----
 def plot_IMR(df, usl, lsl,title):
     df = df.sort_values(by='MeasDate').reset_index(drop=True)
@@ -378,6 +388,17 @@ def plot_RPMGraph(df,start_date):
     
     return fig
     
+def split_inspection_data_by_spec(df):
+    '''
+    Split a get_inspection_data_bulk frame into one frame per characteristic.
+    Yields (BalloonNo, df_inspection_data) in query order, LSL/USL converted to numbers.
+    '''
+    for (specno, _), df_inspection_data in df.groupby(['BalloonNo', 'CharId'], sort=False):
+        df_inspection_data = df_inspection_data.reset_index(drop=True)
+        df_inspection_data['LSL'] = pd.to_numeric(df_inspection_data['LSL'], errors='coerce')
+        df_inspection_data['USL'] = pd.to_numeric(df_inspection_data['USL'], errors='coerce')
+        yield specno, df_inspection_data
+
 def insert_data_into_csv(df, filename):
     """
     Insert data into a CSV file.
@@ -598,7 +619,17 @@ def BalanceClustering(df):
     df['Hierarchical_Distance'] = fcluster(linked, t=0.1, criterion='distance')
     return df
 
-def plot_OffSet_History_Graph(df,selectedStation,selectedAxis,MachineName):
+def plot_OffSet_History_Graphs(df,selectedStation,MachineName,offsets=None):
+    # both axes from one (batched, archived) offset fetch
+    if offsets is None:
+        offsets = get_tool_archive().get_offsets_batch(df, selectedStation)
+    offsetX_fig = plot_OffSet_History_Graph(df,selectedStation,'X',MachineName,offsets)
+    offsetZ_fig = plot_OffSet_History_Graph(df,selectedStation,'Z',MachineName,offsets)
+    return offsetX_fig, offsetZ_fig
+
+def plot_OffSet_History_Graph(df,selectedStation,selectedAxis,MachineName,offsets=None):
+    if offsets is None:
+        offsets = get_tool_archive().get_offsets_batch(df, selectedStation)
     Tools = df['ToolNoID'].unique()
     # Create the Plotly figure
     fig = go.Figure()
@@ -608,9 +639,10 @@ def plot_OffSet_History_Graph(df,selectedStation,selectedAxis,MachineName):
         CurrentToolAllData = pd.DataFrame()
         columnName = f"Offset{selectedAxis}_{selectedStation:02}"
         ChangeOffsetColumnName = f"OffsetChange{selectedAxis}_{selectedStation:02}"
-        for row in CurrentToolDf.itertuples(index=False):
-            ToolOffsetDF = get_questdb_offset_history(MachineName=row.MachineID,Position=row.Turret,StartDate=row.StartDate,EndDate=row.CompletedDate,ToolNo=int(selectedStation))
-            GroupedData = ToolOffsetDF.groupby(f'T{selectedStation:02}_Bal')[[columnName]].max().reset_index()
+        for row in CurrentToolDf.itertuples():
+            # max offset per piece of this tool life
+            ToolOffsetDF = offsets[row.Index]
+            GroupedData = ToolOffsetDF[[f'T{selectedStation:02}_Bal', columnName]].copy()
             GroupedData = GroupedData.sort_values(by=[f'T{selectedStation:02}_Bal'], ascending=[False]).reset_index(drop=True)
             if GroupedData.empty:
                 continue
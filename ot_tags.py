@@ -0,0 +1,173 @@
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta
+
+from config_loader import load_config
+
+config = load_config()
+OT_TAGS_CONFIG = config.get('ot_tags', {})
+OT_TAGS_PATH = OT_TAGS_CONFIG.get('path', './data/OtTags.db')
+# incremental refreshes also look this far back, tags written shortly before the last refresh are not missed
+REFRESH_OVERLAP_HOURS = OT_TAGS_CONFIG.get('refresh_overlap_hours', 2)
+# every n hours the dictionary is rebuilt from scratch (renamed / retired tags)
+FULL_REFRESH_HOURS = OT_TAGS_CONFIG.get('full_refresh_hours', 24)
+
+# piece counter tags only, same filter the OT_DataLake readers used
+TAG_FILTER = '%_bal%'
+
+
+def like_to_regex(pattern):
+    '''SQL Server LIKE pattern (%, _) -> compiled, case-insensitive regex (default CI collation).'''
+    parts = []
+    for char in pattern:
+        if char == '%':
+            parts.append('.*')
+        elif char == '_':
+            parts.append('.')
+        else:
+            parts.append(re.escape(char))
+    return re.compile(''.join(parts), re.IGNORECASE | re.DOTALL)
+
+
+class OtTagDictionary:
+    '''
+    Local copy of the OT_DataLake piece counter tag names ([OT_MS].NAME LIKE '%_bal%').
+
+    - refresh() (backend_daemon job ot_tags) pulls the distinct names from OT_MS, incrementally after the first run
+    - resolve() maps the readers' LIKE pattern to the exact names in memory, so the data queries
+      become NAME IN (...) lookups instead of leading-wildcard scans; a name missing from the dictionary
+      has no rows before the last refresh (minus the overlap), the readers LIKE-scan only after that
+    - the in-memory name list is reloaded only when the file changed (mtime)
+    '''
+
+    SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS ot_tags (
+        NAME TEXT PRIMARY KEY,
+        LastSeen TEXT
+    );
+    CREATE TABLE IF NOT EXISTS ot_tags_meta (
+        Key TEXT PRIMARY KEY,
+        Value TEXT
+    );
+    '''
+
+    def __init__(self, path=OT_TAGS_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(self.SCHEMA)
+
+        self._lock = threading.Lock()
+        self._cached_mtime = None
+        self._names = []
+        self._covered_until = None
+        self._resolved = {}
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _get_meta(self, conn, key):
+        row = conn.execute('SELECT Value FROM ot_tags_meta WHERE Key = ?', (key,)).fetchone()
+        return None if row is None else row[0]
+
+    # ---- refresh ----
+    def refresh(self, full=None):
+        '''Pull tag names from OT_DataLake. Returns (full, number of names fetched).'''
+        from backend import OT_DATALAKE_POOL, _read_sql
+
+        now = datetime.now()
+        with closing(self._connect()) as conn:
+            lastRefresh = self._get_meta(conn, 'LastRefresh')
+            lastFullRefresh = self._get_meta(conn, 'LastFullRefresh')
+        if full is None:
+            full = lastRefresh is None or lastFullRefresh is None or \
+                now - datetime.fromisoformat(lastFullRefresh) > timedelta(hours=FULL_REFRESH_HOURS)
+
+        query = '''
+            SELECT NAME, MAX([TIMESTAMP]) LastSeen
+            FROM [OT_DataLake].[dbo].[OT_MS]
+            WHERE NAME LIKE ?
+            {since_filter}
+            GROUP BY NAME
+            '''
+        if full:
+            df = _read_sql(OT_DATALAKE_POOL, query.format(since_filter=''), (TAG_FILTER,))
+        else:
+            since = datetime.fromisoformat(lastRefresh) - timedelta(hours=REFRESH_OVERLAP_HOURS)
+            df = _read_sql(OT_DATALAKE_POOL, query.format(since_filter='AND [TIMESTAMP] > ?'),
+                           (TAG_FILTER, since.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]))
+
+        rows = [(str(name), None if lastSeen is None else str(lastSeen)) for name, lastSeen in zip(df['NAME'], df['LastSeen'])] \
+            if not df.empty else []
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if full:
+                    conn.execute('DELETE FROM ot_tags')
+                    conn.execute("INSERT OR REPLACE INTO ot_tags_meta (Key, Value) VALUES ('LastFullRefresh', ?)", (now.isoformat(),))
+                conn.executemany('INSERT OR REPLACE INTO ot_tags (NAME, LastSeen) VALUES (?, ?)', rows)
+                conn.execute("INSERT OR REPLACE INTO ot_tags_meta (Key, Value) VALUES ('LastRefresh', ?)", (now.isoformat(),))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return full, len(rows)
+
+    # ---- resolve ----
+    def _file_mtime(self):
+        mtimes = []
+        for path in (self.path, self.path + '-wal'):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _load(self):
+        mtime = self._file_mtime()
+        if mtime == self._cached_mtime:
+            return
+        with closing(self._connect()) as conn:
+            self._names = [row[0] for row in conn.execute('SELECT NAME FROM ot_tags ORDER BY NAME')]
+            lastRefresh = self._get_meta(conn, 'LastRefresh')
+        # every name with a row before this is in the dictionary (same overlap as the incremental refresh)
+        self._covered_until = None if lastRefresh is None else \
+            datetime.fromisoformat(lastRefresh) - timedelta(hours=REFRESH_OVERLAP_HOURS)
+        self._resolved = {}
+        self._cached_mtime = mtime
+
+    def resolve(self, pattern):
+        '''
+        (exact tag names matching the LIKE pattern and the piece counter filter, covered_until):
+        tags added / renamed since the last refresh are not listed but only have rows after covered_until.
+        ([], None) before the first refresh.
+        '''
+        with self._lock:
+            self._load()
+            if pattern not in self._resolved:
+                regex = like_to_regex(pattern)
+                counter = like_to_regex(TAG_FILTER)
+                self._resolved[pattern] = [name for name in self._names if regex.fullmatch(name) and counter.fullmatch(name)]
+            return list(self._resolved[pattern]), self._covered_until
+
+    def stats(self):
+        with closing(self._connect()) as conn:
+            count = conn.execute('SELECT COUNT(*) FROM ot_tags').fetchone()[0]
+            return {'tags': count, 'last_refresh': self._get_meta(conn, 'LastRefresh'),
+                    'last_full_refresh': self._get_meta(conn, 'LastFullRefresh')}
+
+
+_dictionary = None
+_dictionary_lock = threading.Lock()
+
+def get_ot_tag_dictionary():
+    '''Process-wide OtTagDictionary.'''
+    global _dictionary
+    with _dictionary_lock:
+        if _dictionary is None:
+            _dictionary = OtTagDictionary()
+    return _dictionary
@@ -0,0 +1,140 @@
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+
+class PpkStateStore:
+    '''
+    Persistent Ppk state per (SAPCode, CharId) for BackEndJobCalculateLowestCPk.
+
+    - char_state:  spec limits + LastMeasDate (watermark) per characteristic
+    - char_window: rolling window of the latest `window` measurements per characteristic
+    - material_state: time of the last full (non-incremental) fetch per material
+    '''
+
+    SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS char_state (
+        SAPCode TEXT NOT NULL,
+        CharId NOT NULL,
+        BalloonNo TEXT,
+        Description TEXT,
+        CAT,
+        LSL REAL,
+        USL REAL,
+        LastMeasDate TEXT,
+        PRIMARY KEY (SAPCode, CharId)
+    );
+    CREATE TABLE IF NOT EXISTS char_window (
+        SAPCode TEXT NOT NULL,
+        CharId NOT NULL,
+        MeasDate TEXT NOT NULL,
+        MeasVal REAL
+    );
+    CREATE INDEX IF NOT EXISTS ix_char_window ON char_window (SAPCode, CharId, MeasDate);
+    CREATE TABLE IF NOT EXISTS material_state (
+        SAPCode TEXT PRIMARY KEY,
+        LastFullRefresh TEXT
+    );
+    '''
+
+    def __init__(self, path, window=30):
+        self.path = path
+        self.window = window
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self):
+        # one connection per call, the store is used from worker / scheduler threads
+        return sqlite3.connect(self.path, timeout=30)
+
+    # ---- watermarks ----
+    def needs_full_refresh(self, sapcode, max_age_hours):
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT LastFullRefresh FROM material_state WHERE SAPCode = ?', (str(sapcode),)).fetchone()
+        if row is None or row[0] is None:
+            return True
+        return datetime.now() - datetime.fromisoformat(row[0]) > timedelta(hours=max_age_hours)
+
+    def get_watermarks(self, sapcode):
+        '''{CharId: LastMeasDate} of the material, each characteristic is complete up to its own watermark.'''
+        with closing(self._connect()) as conn:
+            rows = conn.execute('SELECT CharId, LastMeasDate FROM char_state WHERE SAPCode = ? AND LastMeasDate IS NOT NULL',
+                                (str(sapcode),)).fetchall()
+        return {charid: datetime.fromisoformat(lastMeasDate) for charid, lastMeasDate in rows}
+
+    # ---- update ----
+    def apply(self, sapcode, df_new, full=False):
+        '''
+        Merge freshly fetched measurements (get_inspection_data_bulk frame) into the state.
+        full=True replaces the material's state (spec added/removed, limits changed).
+        Returns number of new measurements stored.
+        '''
+        sapcode = str(sapcode)
+        added = 0
+        with closing(self._connect()) as conn, conn:
+            if full:
+                conn.execute('DELETE FROM char_state WHERE SAPCode = ?', (sapcode,))
+                conn.execute('DELETE FROM char_window WHERE SAPCode = ?', (sapcode,))
+                conn.execute('INSERT OR REPLACE INTO material_state (SAPCode, LastFullRefresh) VALUES (?, ?)',
+                             (sapcode, datetime.now().isoformat()))
+            if df_new.empty:
+                return 0
+
+            df_new = df_new.copy()
+            df_new['MeasDate'] = pd.to_datetime(df_new['MeasDate'])
+            for charid, df_char in df_new.groupby('CharId', sort=False):
+                charid = charid.item() if hasattr(charid, 'item') else charid
+                row = conn.execute('SELECT LastMeasDate FROM char_state WHERE SAPCode = ? AND CharId = ?', (sapcode, charid)).fetchone()
+                if row is not None and row[0] is not None:
+                    df_char = df_char[df_char['MeasDate'] > pd.Timestamp(row[0])]
+                if df_char.empty:
+                    continue
+                df_char = df_char.sort_values('MeasDate').tail(self.window)
+                conn.executemany(
+                    'INSERT INTO char_window (SAPCode, CharId, MeasDate, MeasVal) VALUES (?, ?, ?, ?)',
+                    [(sapcode, charid, measdate.isoformat(), None if pd.isna(measval) else float(measval))
+                     for measdate, measval in zip(df_char['MeasDate'], df_char['MeasVal'])],
+                )
+                # keep only the latest `window` measurements
+                conn.execute('''
+                    DELETE FROM char_window WHERE SAPCode = ? AND CharId = ? AND rowid NOT IN (
+                        SELECT rowid FROM char_window WHERE SAPCode = ? AND CharId = ? ORDER BY MeasDate DESC LIMIT ?)
+                    ''', (sapcode, charid, sapcode, charid, self.window))
+                latest = df_char.iloc[-1]
+                conn.execute('''
+                    INSERT OR REPLACE INTO char_state (SAPCode, CharId, BalloonNo, Description, CAT, LSL, USL, LastMeasDate)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (sapcode, charid, str(latest['BalloonNo']), latest['Description'], _to_sql_value(latest['CAT']),
+                          _to_float(latest['LSL']), _to_float(latest['USL']), latest['MeasDate'].isoformat()))
+                added += len(df_char)
+        return added
+
+    # ---- read ----
+    def load_window(self, sapcode):
+        '''Current rolling windows of a material, same columns as get_inspection_data_bulk.'''
+        with closing(self._connect()) as conn:
+            df = pd.read_sql_query('''
+                SELECT W.MeasDate, W.MeasVal, S.LSL, S.USL, S.Description, S.CharId, S.BalloonNo, S.CAT
+                FROM char_window W
+                INNER JOIN char_state S ON S.SAPCode = W.SAPCode AND S.CharId = W.CharId
+                WHERE W.SAPCode = ?
+                ORDER BY S.BalloonNo, S.CharId, W.MeasDate DESC
+                ''', conn, params=(str(sapcode),))
+        df['MeasDate'] = pd.to_datetime(df['MeasDate'])
+        return df
+
+
+def _to_float(value):
+    value = pd.to_numeric(value, errors='coerce')
+    return None if pd.isna(value) else float(value)
+
+
+def _to_sql_value(value):
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, 'item') else value
@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from config_loader import load_config
+
+config = load_config()
+RESULTS_STORE_PATH = config.get('results_store', {}).get('path', './data/Results.db')
+
+
+class ResultsStore:
+    '''
+    Backend job results (lowest Ppk per machine) in SQLite.
+
+    - lowest_ppk is replaced in a single transaction, readers see either the old or the new run, never half of it
+    - every run is also appended to lowest_ppk_history for trends
+    - read_lowest_ppk() only hits the database when the file (mtime) and then the store version changed
+    '''
+
+    SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS lowest_ppk (
+        MachineID TEXT PRIMARY KEY,
+        ToolNoID TEXT,
+        MaterialCode TEXT,
+        Value REAL,
+        ComputedAt TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS lowest_ppk_history (
+        RunId INTEGER NOT NULL,
+        MachineID TEXT NOT NULL,
+        ToolNoID TEXT,
+        MaterialCode TEXT,
+        Value REAL,
+        ComputedAt TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_lowest_ppk_history ON lowest_ppk_history (MachineID, ComputedAt);
+    CREATE TABLE IF NOT EXISTS store_meta (
+        Key TEXT PRIMARY KEY,
+        Value INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO store_meta (Key, Value) VALUES ('version', 0);
+    '''
+
+    COLUMNS = {'MachineID': 'object', 'ToolNoID': 'object', 'MaterialCode': 'object', 'Value': 'float64', 'ComputedAt': 'datetime64[ns]'}
+
+    def __init__(self, path=RESULTS_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')  # readers never block the job's write
+            conn.executescript(self.SCHEMA)
+
+        self._lock = threading.Lock()
+        self._cached_mtime = None
+        self._cached_version = None
+        self._cached_df = None
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # ---- write ----
+    def write_lowest_ppk(self, df):
+        '''Atomically replace the current results with df (MachineID, ToolNoID, MaterialCode, Value) and log them to history.'''
+        computed_at = datetime.now().isoformat(timespec='seconds')
+        rows = [
+            (str(row.MachineID),
+             None if pd.isna(row.ToolNoID) else str(row.ToolNoID),
+             None if pd.isna(row.MaterialCode) else str(row.MaterialCode),
+             None if pd.isna(row.Value) else float(row.Value),
+             computed_at)
+            for row in df.reindex(columns=['MachineID', 'ToolNoID', 'MaterialCode', 'Value']).itertuples(index=False)
+        ]
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                version = conn.execute("SELECT Value FROM store_meta WHERE Key = 'version'").fetchone()[0] + 1
+                conn.execute('DELETE FROM lowest_ppk')
+                conn.executemany('INSERT INTO lowest_ppk (MachineID, ToolNoID, MaterialCode, Value, ComputedAt) VALUES (?, ?, ?, ?, ?)', rows)
+                conn.executemany('INSERT INTO lowest_ppk_history (RunId, MachineID, ToolNoID, MaterialCode, Value, ComputedAt) VALUES (?, ?, ?, ?, ?, ?)',
+                                 [(version,) + row for row in rows])
+                conn.execute("UPDATE store_meta SET Value = ? WHERE Key = 'version'", (version,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return version
+
+    # ---- read ----
+    def _file_mtime(self):
+        mtimes = []
+        for path in (self.path, self.path + '-wal'):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def read_lowest_ppk(self):
+        '''Current results, reloaded only when the store changed since the last read.'''
+        with self._lock:
+            mtime = self._file_mtime()
+            if self._cached_df is not None and mtime == self._cached_mtime:
+                return self._cached_df.copy()
+            with closing(self._connect()) as conn:
+                version = conn.execute("SELECT Value FROM store_meta WHERE Key = 'version'").fetchone()[0]
+                if self._cached_df is None or version != self._cached_version:
+                    df = pd.read_sql_query('SELECT MachineID, ToolNoID, MaterialCode, Value, ComputedAt FROM lowest_ppk', conn)
+                    self._cached_df = self._typed(df)
+                    self._cached_version = version
+            self._cached_mtime = mtime
+            return self._cached_df.copy()
+
+    def read_history(self, MachineID=None, since=None):
+        '''Ppk trend: every stored run, optionally for one machine and/or after `since` (datetime).'''
+        query = 'SELECT RunId, MachineID, ToolNoID, MaterialCode, Value, ComputedAt FROM lowest_ppk_history WHERE 1=1'
+        params = []
+        if MachineID is not None:
+            query += ' AND MachineID = ?'
+            params.append(str(MachineID))
+        if since is not None:
+            query += ' AND ComputedAt >= ?'
+            params.append(since.isoformat(timespec='seconds'))
+        query += ' ORDER BY ComputedAt'
+        with closing(self._connect()) as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        return self._typed(df)
+
+    def _typed(self, df):
+        for column, dtype in self.COLUMNS.items():
+            if column not in df.columns:
+                continue
+            if dtype.startswith('datetime'):
+                df[column] = pd.to_datetime(df[column])
+            else:
+                df[column] = df[column].astype(dtype)
+        return df
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_results_store():
+    '''Process-wide ResultsStore, shared by every Streamlit session so the reader cache is shared too.'''
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultsStore()
+    return _store
@@ -0,0 +1,76 @@
+import functools
+import threading
+
+from cache_keys import make_key, copy_value
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    '''
+    In-flight deduplication: concurrent callers with the same key wait for the first caller's
+    query and share its result (or its exception) instead of each running their own.
+    Nothing is kept once the call returns, caching stays the cache's job.
+    '''
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {'leaders': 0, 'followers': 0}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['leaders'] += 1
+            else:
+                call.followers += 1
+                self._stats['followers'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy_value(call.result)
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]  # later callers start a new call
+            call.done.set()
+        # followers copy call.result, hand the leader its own copy so nobody sees another's edits
+        return copy_value(call.result) if call.followers else call.result
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
+
+
+_flight = SingleFlight()
+
+def get_single_flight():
+    '''Process-wide SingleFlight.'''
+    return _flight
+
+def single_flight(fn):
+    '''Decorator: concurrent calls with the same arguments share one execution.'''
+    name = f'{fn.__module__}.{fn.__qualname__}'
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return _flight.do(make_key(name, *args, **kwargs), lambda: fn(*args, **kwargs))
+    return wrapper
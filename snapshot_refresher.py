@@ -0,0 +1,86 @@
+import threading
+import time
+import traceback
+from collections import namedtuple
+from datetime import datetime
+
+from cache_keys import copy_value
+from config_loader import load_config
+
+config = load_config()
+# seconds between two snapshot rebuilds, defaults to the dashboard refresh
+SNAPSHOT_INTERVAL = config['refresh'].get('snapshot_interval', config['refresh']['page_refresh'])
+# seconds before retrying a failed rebuild while there is no snapshot at all, doubled per failure up to the interval
+SNAPSHOT_RETRY = config['refresh'].get('snapshot_retry', 5)
+
+Snapshot = namedtuple('Snapshot', ['df_tool_data', 'df_tool_data_all', 'refreshed_at'])
+
+
+class SnapshotRefresher:
+    '''
+    Rebuilds the tool snapshot (load_dashboard_snapshot) on one background thread every `interval`
+    seconds and publishes it in a single assignment, readers get the latest completed snapshot
+    without touching the database. A failed rebuild keeps the previous snapshot (its age keeps growing).
+    Only the very first get() waits, for the first rebuild. Until one rebuild succeeds, failures are
+    retried after `retry` seconds (doubling up to `interval`) instead of a full interval.
+    `load` returns (df_tool_data, df_tool_data_all) or, when it knows when its data was built
+    (api_client reads it from the server), (df_tool_data, df_tool_data_all, refreshed_at).
+    '''
+
+    def __init__(self, load, interval=SNAPSHOT_INTERVAL, name='snapshot', retry=SNAPSHOT_RETRY):
+        self.load = load
+        self.interval = interval
+        self.retry = retry
+        self.name = name
+        self._snapshot = None
+        self._first_attempt = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {'refreshes': 0, 'errors': 0, 'last_duration': None, 'last_error': None}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f'{self.name}-refresher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        retry = self.retry
+        while not self._stop.is_set():
+            start = time.monotonic()
+            try:
+                result = self.load()
+                self._snapshot = Snapshot(*result) if len(result) == 3 else Snapshot(*result, datetime.now())
+                self._stats['refreshes'] += 1
+            except Exception as e:
+                self._stats['errors'] += 1
+                self._stats['last_error'] = f'{type(e).__name__}: {e}'
+                print(f"{self.name} refresh failed: {e}")
+                traceback.print_exc()
+            self._stats['last_duration'] = round(time.monotonic() - start, 3)
+            self._first_attempt.set()
+            # the next rebuild starts `interval` after this one started, sooner while nothing was published yet
+            wait = self.interval
+            if self._snapshot is None:
+                wait, retry = min(retry, self.interval), retry * 2
+            self._stop.wait(max(0, wait - (time.monotonic() - start)))
+
+    def get(self):
+        '''Latest Snapshot (frames are copies, free to modify).'''
+        self.start()
+        self._first_attempt.wait()
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError(f"{self.name}: no snapshot available yet ({self._stats['last_error']})")
+        return Snapshot(copy_value(snapshot.df_tool_data), copy_value(snapshot.df_tool_data_all), snapshot.refreshed_at)
+
+    def age(self):
+        '''Seconds since the published snapshot was built, None before the first one.'''
+        snapshot = self._snapshot
+        return None if snapshot is None else (datetime.now() - snapshot.refreshed_at).total_seconds()
+
+    def stats(self):
+        return dict(self._stats, age=self.age(), interval=self.interval)
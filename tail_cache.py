@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from backend import get_tool_piece_aggregates, aggregate_sampled_by_piece, get_piece_column
+from config_loader import load_config
+
+config = load_config()
+TAIL_CACHE_CONFIG = config.get('tail_cache', {})
+MAX_ENTRIES = TAIL_CACHE_CONFIG.get('max_entries', 256)
+# a chart re-run within this many seconds reuses the cached aggregates without asking QuestDB
+MIN_REFRESH_SECONDS = TAIL_CACHE_CONFIG.get('min_refresh_seconds', 10)
+
+
+class ToolTailCache:
+    '''
+    Append-only cache of the live per-piece load aggregates (backend.get_tool_piece_aggregates).
+
+    - one entry per (MacID, Turret, ToolNo, AlarmColumn), i.e. per live chart
+    - a refresh only aggregates the samples after the last timestamp of the pieces before the latest one:
+      the latest piece is re-read whole and replaces its cached aggregate (late rows, a piece spanning two
+      refreshes), rows of earlier pieces in that window are merged in (max of maxima, means weighted by
+      their per-column counts). Rows arriving later than that window are not picked up.
+    - a new ToolNoID / StartDate (tool changed) or AlarmFilter drops the entry and starts a full load
+    '''
+
+    def __init__(self, max_entries=MAX_ENTRIES, min_refresh_seconds=MIN_REFRESH_SECONDS):
+        self.max_entries = max_entries
+        self.min_refresh_seconds = min_refresh_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'appends': 0, 'full_loads': 0, 'invalidations': 0, 'evictions': 0}
+
+    def _entry(self, slot, tool):
+        with self._lock:
+            entry = self._entries.get(slot)
+            if entry is None or entry['tool'] != tool:
+                if entry is not None:
+                    self._stats['invalidations'] += 1
+                entry = {'tool': tool, 'lock': threading.Lock(), 'df': None, 'refreshed': None}
+                self._entries[slot] = entry
+            self._entries.move_to_end(slot)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+            return entry
+
+    def get(self, MachineName, Position, ToolingStation, StartDate, AlarmColumn, AlarmFilter, ToolNoID=None):
+        '''Per-piece aggregates of the tool since StartDate, same frame as get_tool_piece_aggregates.'''
+        slot = (MachineName, Position, int(ToolingStation), AlarmColumn)
+        entry = self._entry(slot, (ToolNoID, StartDate, float(AlarmFilter)))
+
+        with entry['lock']:
+            if entry['df'] is not None and time.monotonic() - entry['refreshed'] < self.min_refresh_seconds:
+                self._count('hits')
+                return entry['df'].copy()
+
+            pieceColumn = get_piece_column(ToolingStation)
+            df = entry['df']
+            since = None
+            if df is not None and df[pieceColumn].nunique() > 1:
+                lastPiece = df[pieceColumn].max()
+                earlier = df[pieceColumn] < lastPiece
+                since = df.loc[earlier, 'LastTimestamp'].max()
+
+            df_new = get_tool_piece_aggregates(MachineName, Position, ToolingStation, StartDate, AlarmColumn, AlarmFilter, since=since)
+            if since is None:
+                self._count('full_loads')
+                entry['df'] = df_new
+            else:
+                self._count('appends')
+                if not df_new.empty:
+                    # the latest piece comes back whole, earlier pieces only with rows after `since`
+                    entry['df'] = aggregate_sampled_by_piece(pd.concat([df[earlier], df_new], ignore_index=True),
+                                                             [pieceColumn], ['ToolingStation'])
+            entry['refreshed'] = time.monotonic()
+            return entry['df'].copy()
+
+    def invalidate(self, MachineName=None):
+        '''Drop all entries, or those of one machine.'''
+        with self._lock:
+            for slot in [slot for slot in self._entries if MachineName is None or slot[0] == MachineName]:
+                del self._entries[slot]
+                self._stats['invalidations'] += 1
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_tool_tail_cache():
+    '''Process-wide ToolTailCache, shared by every Streamlit session.'''
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ToolTailCache()
+    return _cache
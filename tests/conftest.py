@@ -0,0 +1,13 @@
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# modules read config.yaml from the working directory at import time: run the tests from a scratch
+# directory holding the template settings, so ./data/... files never touch the real ones
+_workdir = tempfile.mkdtemp(prefix='tool-monitoring-tests-')
+shutil.copy(os.path.join(ROOT, 'config.template.yaml'), os.path.join(_workdir, 'config.yaml'))
+os.chdir(_workdir)
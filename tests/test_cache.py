@@ -0,0 +1,83 @@
+import sqlite3
+import time
+
+import pandas as pd
+
+from cache import DiskTier, MemoryTier, TieredCache, sizeof
+
+
+def test_memory_tier_expires_entries():
+    tier = MemoryTier(max_bytes=10_000)
+    tier.set('a', 1, time.time() + 0.05)
+    assert tier.get('a')[0] == 1
+    time.sleep(0.1)
+    assert tier.get('a') is None
+    assert tier.stats()['expirations'] == 1
+
+
+def test_memory_tier_evicts_least_recently_used():
+    value = pd.DataFrame({'x': range(100)})
+    tier = MemoryTier(max_bytes=sizeof(value) * 2)
+    expires = time.time() + 60
+    tier.set('a', value, expires)
+    tier.set('b', value, expires)
+    tier.get('a')  # b is now the least recently used
+    tier.set('c', value, expires)
+    assert tier.get('b') is None
+    assert tier.get('a') is not None and tier.get('c') is not None
+    assert tier.stats()['evictions'] == 1
+
+
+def test_memory_tier_hands_out_copies():
+    tier = MemoryTier()
+    tier.set('a', pd.DataFrame({'x': [1]}), time.time() + 60)
+    df, _ = tier.get('a')
+    df['x'] = 2
+    assert tier.get('a')[0]['x'].tolist() == [1]
+
+
+def test_disk_tier_expires_entries(tmp_path):
+    tier = DiskTier(str(tmp_path / 'Cache.db'))
+    tier.set('a', 1, time.time() + 0.05)
+    assert tier.get('a')[0] == 1
+    time.sleep(0.1)
+    assert tier.get('a') is None
+
+
+def test_disk_tier_sweep_evicts_least_recently_read(tmp_path):
+    payload = b'x' * 1000
+    tier = DiskTier(str(tmp_path / 'Cache.db'), max_bytes=3500, access_flush_seconds=3600, sweep_seconds=3600)
+    expires = time.time() + 60
+    for key in ('a', 'b', 'c'):
+        tier.set(key, payload, expires)
+    tier.get('a')  # pending read time, written by the sweep before it evicts
+    tier._last_sweep = 0  # next write sweeps
+    tier.set('d', payload, expires)
+    assert tier.get('b') is None
+    assert tier.get('a') is not None
+
+
+def test_disk_tier_batches_read_times(tmp_path):
+    path = str(tmp_path / 'Cache.db')
+    tier = DiskTier(path, access_flush_seconds=0.2)
+    tier.set('a', 1, time.time() + 60)
+
+    def last_access():
+        with sqlite3.connect(path) as conn:
+            return conn.execute("SELECT LastAccess FROM cache WHERE Key = 'a'").fetchone()[0]
+
+    written = last_access()
+    tier.get('a')
+    assert last_access() == written  # kept in memory
+    time.sleep(0.25)
+    tier.get('a')  # flush interval passed, both reads are written in one batch
+    assert last_access() > written
+    assert tier._accessed == {}
+
+
+def test_tiered_cache_promotes_lower_tier_hits(tmp_path):
+    memory, disk = MemoryTier(), DiskTier(str(tmp_path / 'Cache.db'))
+    disk.set('a', 1, time.time() + 60)
+    cache = TieredCache([memory, disk])
+    assert cache.get_or_compute('a', 60, lambda: 2) == 1
+    assert memory.get('a')[0] == 1
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    return ConnectionPool('test', connect, **kwargs), opened
+
+
+def test_reuses_idle_connections():
+    pool, opened = make_pool(max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert len(opened) == 1
+    assert pool.stats()['hits'] == 1
+
+
+def test_blocks_at_max_size_until_a_connection_is_released():
+    pool, opened = make_pool(max_size=1, acquire_timeout=2)
+    conn = pool.acquire()
+    acquired = threading.Event()
+
+    def wait_for_connection():
+        pool.release(pool.acquire())
+        acquired.set()
+
+    thread = threading.Thread(target=wait_for_connection)
+    thread.start()
+    assert not acquired.wait(0.2)  # blocked while the only connection is in use
+    pool.release(conn)
+    assert acquired.wait(1)
+    thread.join()
+    assert len(opened) == 1
+
+
+def test_times_out_when_no_connection_is_free():
+    pool, _ = make_pool(max_size=1, acquire_timeout=0.1)
+    pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_evicts_idle_connections_past_idle_timeout():
+    pool, opened = make_pool(max_size=2, idle_timeout=0.1)
+    with pool.connection():
+        pass
+    assert pool.evict_idle() == 0
+    time.sleep(0.15)
+    assert pool.evict_idle() == 1
+    assert opened[0].closed and pool.stats()['idle'] == 0
+
+
+def test_discards_connection_after_an_error():
+    pool, opened = make_pool(max_size=1)
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            raise RuntimeError('batch failed')
+    assert opened[0].closed
+    with pool.connection() as conn:
+        assert conn is not opened[0]
@@ -0,0 +1,74 @@
+import pandas as pd
+
+from ppk_state import PpkStateStore
+
+WINDOW = 5
+
+
+class FakeInspections:
+    '''InspResult rows of one material, fetched like get_inspection_data_bulk (per-CharId watermarks, latest WINDOW).'''
+
+    def __init__(self):
+        self.rows = []
+
+    def add(self, day, charid, value):
+        self.rows.append({'MeasDate': pd.Timestamp('2026-01-01') + pd.Timedelta(days=day), 'MeasVal': float(value),
+                          'LSL': 0.0, 'USL': 10.0, 'Description': f'Spec {charid}', 'CharId': charid,
+                          'BalloonNo': str(charid), 'CAT': 2})
+
+    def fetch(self, since=None):
+        df = pd.DataFrame(self.rows)
+        since = since or {}
+        watermark = pd.to_datetime(df['CharId'].map(since))
+        df = df[watermark.isna() | (df['MeasDate'] > watermark)]
+        return df.sort_values('MeasDate', ascending=False).groupby('CharId').head(WINDOW)
+
+
+def windows(store):
+    return store.load_window('MAT').sort_values(['CharId', 'MeasDate']).reset_index(drop=True)
+
+
+def test_incremental_updates_match_a_full_refresh(tmp_path):
+    inspections = FakeInspections()
+    incremental = PpkStateStore(str(tmp_path / 'incremental.db'), window=WINDOW)
+    for day in range(8):
+        inspections.add(day, 1, day)
+    inspections.add(0, 2, 5)
+    incremental.apply('MAT', inspections.fetch(), full=True)
+
+    for day in range(8, 20):
+        inspections.add(day, 1, day % 7)
+        if day % 6 == 0:
+            inspections.add(day, 2, day % 4)
+        incremental.apply('MAT', inspections.fetch(incremental.get_watermarks('MAT')))
+
+    full = PpkStateStore(str(tmp_path / 'full.db'), window=WINDOW)
+    full.apply('MAT', inspections.fetch(), full=True)
+    pd.testing.assert_frame_equal(windows(incremental), windows(full))
+
+
+def test_watermarks_are_kept_per_characteristic(tmp_path):
+    inspections = FakeInspections()
+    store = PpkStateStore(str(tmp_path / 'state.db'), window=WINDOW)
+    inspections.add(0, 1, 1)
+    inspections.add(10, 2, 1)
+    store.apply('MAT', inspections.fetch(), full=True)
+
+    watermarks = store.get_watermarks('MAT')
+    assert watermarks == {1: pd.Timestamp('2026-01-01'), 2: pd.Timestamp('2026-01-11')}
+    # a rarely measured characteristic does not make the others re-read their window
+    inspections.add(11, 2, 2)
+    df_new = inspections.fetch(watermarks)
+    assert df_new['CharId'].tolist() == [2]
+    assert store.apply('MAT', df_new) == 1
+
+
+def test_apply_skips_measurements_already_in_the_state(tmp_path):
+    inspections = FakeInspections()
+    store = PpkStateStore(str(tmp_path / 'state.db'), window=WINDOW)
+    for day in range(3):
+        inspections.add(day, 1, day)
+    store.apply('MAT', inspections.fetch(), full=True)
+    # a whole-window refetch (no watermarks) adds nothing twice
+    assert store.apply('MAT', inspections.fetch()) == 0
+    assert len(store.load_window('MAT')) == 3
@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from single_flight import SingleFlight
+
+
+def run_together(flight, key, fn, callers=4):
+    '''Start `callers` threads on the same key while the leader is still running, returns their results / exceptions.'''
+    results = [None] * callers
+
+    def call(index):
+        try:
+            results[index] = flight.do(key, fn)
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_callers_share_one_call():
+    flight, calls = SingleFlight(), []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return 42
+
+    assert run_together(flight, 'k', fetch) == [42] * 4
+    assert len(calls) == 1
+    assert flight.stats() == {'leaders': 1, 'followers': 3, 'in_flight': 0}
+
+
+def test_error_reaches_every_caller_and_is_not_kept():
+    flight = SingleFlight()
+
+    def fail():
+        time.sleep(0.2)
+        raise ValueError('db down')
+
+    results = run_together(flight, 'k', fail)
+    assert all(isinstance(result, ValueError) for result in results)
+    # nothing is remembered, the next call runs again
+    assert flight.do('k', lambda: 'ok') == 'ok'
+
+
+def test_callers_get_isolated_copies():
+    flight = SingleFlight()
+
+    def fetch():
+        time.sleep(0.2)
+        return pd.DataFrame({'x': [1, 2]})
+
+    frames = run_together(flight, 'k', fetch)
+    frames[0]['x'] = 0
+    assert all(frame['x'].tolist() == [1, 2] for frame in frames[1:])
+    assert len({id(frame) for frame in frames}) == len(frames)
+
+
+def test_leader_error_is_raised_to_the_leader():
+    with pytest.raises(KeyError):
+        SingleFlight().do('k', lambda: {}['missing'])
@@ -0,0 +1,91 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyodbc', exc_type=ImportError)  # backend needs the ODBC driver manager
+
+import tail_cache
+from backend import LOAD_COLUMNS, aggregate_raw_by_piece, get_piece_column
+
+PIECE = get_piece_column(2)
+START = pd.Timestamp('2026-01-01')
+
+
+class FakeQuestDB:
+    '''Raw MuratecStsLog samples, aggregated per piece like get_tool_piece_aggregates (since: timestamp > since).'''
+
+    def __init__(self):
+        self.rows = []
+
+    def add(self, seconds, piece, load):
+        row = {'Timestamp': START + pd.Timedelta(seconds=seconds), PIECE: piece}
+        row.update({column: float(load) for column in LOAD_COLUMNS})
+        self.rows.append(row)
+
+    def get_tool_piece_aggregates(self, MachineName, Position, ToolingStation, StartDate, AlarmColumn, AlarmFilter, since=None):
+        df = pd.DataFrame(self.rows)
+        if since is not None:
+            df = df[df['Timestamp'] > since]
+        if df.empty:
+            return pd.DataFrame()
+        df = aggregate_raw_by_piece(df, [PIECE])
+        df['ToolingStation'] = 202
+        return df
+
+
+@pytest.fixture
+def questdb(monkeypatch):
+    fake = FakeQuestDB()
+    monkeypatch.setattr(tail_cache, 'get_tool_piece_aggregates', fake.get_tool_piece_aggregates)
+    return fake
+
+
+def read(cache, ToolNoID='T1'):
+    return cache.get('M01', 'LEFT', 2, START, 'Load_X', 100, ToolNoID=ToolNoID)
+
+
+def assert_same_aggregates(cached, full):
+    columns = [f'{column}_{suffix}' for column in LOAD_COLUMNS for suffix in ('max', 'mean', 'count')] + ['Samples']
+    cached, full = cached.set_index(PIECE).sort_index(), full.set_index(PIECE).sort_index()
+    pd.testing.assert_frame_equal(cached[columns].astype('float64'), full[columns].astype('float64'))
+
+
+def test_appends_match_a_full_load(questdb):
+    cache = tail_cache.ToolTailCache(min_refresh_seconds=0)
+    for second in range(30):
+        questdb.add(second, second // 10, second)
+    read(cache)
+    for second in range(30, 45):  # finishes piece 2, starts piece 3 and 4
+        questdb.add(second, second // 10, second)
+    assert_same_aggregates(read(cache), questdb.get_tool_piece_aggregates(None, None, 2, START, None, None))
+    assert cache.stats()['appends'] == 1
+
+
+def test_late_rows_of_the_latest_piece_are_picked_up(questdb):
+    cache = tail_cache.ToolTailCache(min_refresh_seconds=0)
+    for second in range(30):
+        questdb.add(second, second // 10, second)
+    read(cache)
+    questdb.add(25.5, 2, 1000)  # arrives after the refresh, timestamped before its watermark
+    questdb.add(19.5, 1, 2000)  # previous piece, after its last cached sample
+    df = read(cache)
+    assert_same_aggregates(df, questdb.get_tool_piece_aggregates(None, None, 2, START, None, None))
+    assert df.set_index(PIECE).loc[2, 'Load_X_max'] == 1000
+
+
+def test_tool_change_starts_a_full_load(questdb):
+    cache = tail_cache.ToolTailCache(min_refresh_seconds=0)
+    for second in range(20):
+        questdb.add(second, second // 10, second)
+    read(cache, ToolNoID='T1')
+    read(cache, ToolNoID='T2')
+    assert cache.stats()['full_loads'] == 2
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_rereads_within_min_refresh_are_served_from_memory(questdb):
+    cache = tail_cache.ToolTailCache(min_refresh_seconds=60)
+    questdb.add(0, 0, 1)
+    read(cache)
+    questdb.add(1, 1, 2)
+    assert len(read(cache)) == 1
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,181 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from backend import stream_tool_piece_aggregates_history, get_tool_offset_by_piece, get_tool_offsets_by_piece_batch, get_completed_tools
+from config_loader import load_config
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # archive disabled, everything is read from the databases as before
+    pa = pq = None
+
+config = load_config()
+ARCHIVE_CONFIG = config.get('archive', {})
+ARCHIVE_PATH = ARCHIVE_CONFIG.get('path', './data/archive')
+ARCHIVE_ENABLED = ARCHIVE_CONFIG.get('enabled', True) and pq is not None
+# a tool is archived only this long after its CompletedDate, late QuestDB / OT_DataLake rows are in by then
+SETTLE_HOURS = ARCHIVE_CONFIG.get('settle_hours', 1)
+BACKFILL_DAYS = ARCHIVE_CONFIG.get('backfill_days', 7)
+BACKFILL_LIMIT = ARCHIVE_CONFIG.get('backfill_limit', 200)
+
+# LoadX/LoadZ history charts: (AlarmColumn, alarm column of get_historical_data / get_completed_tools)
+LOAD_CHARTS = [('Load_X', 'LoadX_Alm'), ('Load_Z', 'LoadZ_Alm')]
+ARCHIVE_VERSION = 2
+
+
+class ToolArchive:
+    '''
+    Local Parquet archive of completed tool lives, one file per ToolNoID and chart:
+
+    - loads/<ToolNoID>_<AlarmColumn>.parquet: per-piece load aggregates (stream_tool_piece_aggregates_history)
+    - offsets/<ToolNoID>.parquet: max OffsetX/OffsetZ per piece (get_tool_offset_by_piece)
+
+    Filled on first access or by the backfill job (backend_daemon tool_archive). Files are written to a
+    temp file and renamed, readers never see a partial file. The request (machine, turret, tool, dates,
+    alarm filter) is stored in the file metadata, a file written for a different request is recomputed.
+    '''
+
+    def __init__(self, path=ARCHIVE_PATH, enabled=ARCHIVE_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0}
+        self._lock = threading.Lock()
+
+    def _file(self, kind, ToolNoID, suffix=None):
+        name = re.sub(r'[^\w.-]', '_', str(ToolNoID)) + (f'_{suffix}' if suffix else '')
+        return os.path.join(self.path, kind, f'{name}.parquet')
+
+    def _read(self, path, meta):
+        try:
+            table = pq.read_table(path)
+        except FileNotFoundError:
+            return None
+        stored = (table.schema.metadata or {}).get(b'tool_archive')
+        if stored is None or json.loads(stored) != meta:
+            return None
+        return table.to_pandas()
+
+    def _write(self, path, df, meta):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'tool_archive': json.dumps(meta).encode()})
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+        self._count('writes')
+
+    def _cached(self, path, meta, EndDate, compute):
+        if not self.enabled:
+            return compute()
+        df = self._read(path, meta)
+        if df is not None:
+            self._count('hits')
+            return df
+        self._count('misses')
+        df = compute()
+        self._store(path, df, meta, EndDate)
+        return df
+
+    def _store(self, path, df, meta, EndDate):
+        if pd.Timestamp(EndDate) <= pd.Timestamp(datetime.now() - timedelta(hours=SETTLE_HOURS)):
+            self._write(path, df, meta)
+
+    @staticmethod
+    def _meta(MachineName, Position, ToolingStation, StartDate, EndDate, **extra):
+        meta = {'version': ARCHIVE_VERSION, 'MachineID': str(MachineName), 'Turret': str(Position), 'Tool': int(ToolingStation),
+                'StartDate': pd.Timestamp(StartDate).isoformat(), 'EndDate': pd.Timestamp(EndDate).isoformat()}
+        meta.update(extra)
+        return meta
+
+    # ---- read / fill ----
+    def get_piece_aggregates(self, ToolNoID, MachineName, Position, ToolingStation, StartDate, EndDate, AlarmColumn, AlarmFilter):
+        '''Per-piece load aggregates of a completed tool, same frame as get_tool_piece_aggregates(historyFlag=True).'''
+        meta = self._meta(MachineName, Position, ToolingStation, StartDate, EndDate, AlarmColumn=AlarmColumn, AlarmFilter=float(AlarmFilter))
+        return self._cached(self._file('loads', ToolNoID, AlarmColumn), meta, EndDate, lambda: stream_tool_piece_aggregates_history(
+            MachineName, Position, ToolingStation, StartDate, EndDate, AlarmColumn, AlarmFilter))
+
+    def get_offsets(self, ToolNoID, MachineName, Position, ToolingStation, StartDate, EndDate):
+        '''Max OffsetX_NN / OffsetZ_NN per piece of a completed tool.'''
+        meta = self._meta(MachineName, Position, ToolingStation, StartDate, EndDate)
+        return self._cached(self._file('offsets', ToolNoID), meta, EndDate, lambda: get_tool_offset_by_piece(
+            MachineName, Position, StartDate, EndDate, int(ToolingStation)))
+
+    def get_offsets_batch(self, df_tools, ToolingStation):
+        '''
+        get_offsets for every row of df_tools (MachineID, Turret, ToolNoID, StartDate, CompletedDate), keyed by df_tools index.
+        Archived tools are read from disk, the rest is fetched in one batched query per machine/turret.
+        '''
+        results, missing = {}, {}
+        for row in df_tools.itertuples():
+            meta = self._meta(row.MachineID, row.Turret, ToolingStation, row.StartDate, row.CompletedDate)
+            path = self._file('offsets', row.ToolNoID)
+            df = self._read(path, meta) if self.enabled else None
+            if df is not None:
+                self._count('hits')
+                results[row.Index] = df
+                continue
+            if self.enabled:
+                self._count('misses')
+            missing.setdefault((row.MachineID, row.Turret), {})[row.Index] = (path, meta, row.StartDate, row.CompletedDate)
+
+        for (MachineName, Position), windows in missing.items():
+            fetched = get_tool_offsets_by_piece_batch(MachineName, Position, int(ToolingStation),
+                                                      {key: (StartDate, EndDate) for key, (_, _, StartDate, EndDate) in windows.items()})
+            for key, df in fetched.items():
+                path, meta, _, EndDate = windows[key]
+                if self.enabled:
+                    self._store(path, df, meta, EndDate)
+                results[key] = df
+        return results
+
+    # ---- backfill ----
+    def backfill(self, days=BACKFILL_DAYS, limit=BACKFILL_LIMIT):
+        '''Archive tools completed in the last `days` that are settled and not archived yet. Returns number of tools processed.'''
+        if not self.enabled:
+            return 0
+        df_tools = get_completed_tools(datetime.now() - timedelta(days=days))
+        settled = datetime.now() - timedelta(hours=SETTLE_HOURS)
+        processed = 0
+        for tool in df_tools.itertuples(index=False):
+            if processed >= limit:
+                break
+            if pd.Timestamp(tool.CompletedDate) > pd.Timestamp(settled):
+                continue
+            files = [self._file('loads', tool.ToolNoID, AlarmColumn) for AlarmColumn, _ in LOAD_CHARTS] + [self._file('offsets', tool.ToolNoID)]
+            if all(os.path.exists(path) for path in files):
+                continue
+            try:
+                for AlarmColumn, AlarmFilterColumn in LOAD_CHARTS:
+                    self.get_piece_aggregates(tool.ToolNoID, tool.MachineID, tool.Turret, tool.Tool, tool.StartDate, tool.CompletedDate,
+                                              AlarmColumn, getattr(tool, AlarmFilterColumn))
+                self.get_offsets(tool.ToolNoID, tool.MachineID, tool.Turret, tool.Tool, tool.StartDate, tool.CompletedDate)
+            except Exception as e:
+                print(f"Error archiving tool {tool.ToolNoID}: {e}")
+            processed += 1
+        return processed
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, enabled=self.enabled)
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+def get_tool_archive():
+    '''Process-wide ToolArchive.'''
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = ToolArchive()
+    return _archive